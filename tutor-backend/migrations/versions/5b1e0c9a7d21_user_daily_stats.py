@@ -0,0 +1,48 @@
+"""user_daily_stats
+
+Revision ID: 5b1e0c9a7d21
+Revises: 2d3c78d5ed05
+Create Date: 2026-10-17 10:12:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c9a7d21'
+down_revision: Union[str, None] = '2d3c78d5ed05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_daily_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('correct', sa.Integer(), nullable=False),
+    sa.Column('time_sec', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    # Backfill inicial; después se mantiene en register_user_answer.
+    # El día es el de UTC, como en register_user_answer, no el de la sesión.
+    op.execute(
+        """
+        INSERT INTO user_daily_stats (user_id, day, total, correct, time_sec)
+        SELECT user_id,
+               date(created_at AT TIME ZONE 'UTC'),
+               count(*),
+               sum(CASE WHEN correct THEN 1 ELSE 0 END),
+               coalesce(sum(time_sec), 0)
+        FROM user_responses
+        GROUP BY user_id, date(created_at AT TIME ZONE 'UTC')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_daily_stats')
@@ -0,0 +1,32 @@
+"""hot_query_indexes
+
+Revision ID: 8c4f2a6e1b93
+Revises: 5b1e0c9a7d21
+Create Date: 2026-10-17 11:03:18.540271
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f2a6e1b93'
+down_revision: Union[str, None] = '5b1e0c9a7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_responses_user_created', 'user_responses', ['user_id', 'created_at'], unique=False, postgresql_include=['correct'])
+    op.create_index('ix_chat_messages_conversation_created', 'chat_messages', ['conversation_id', 'created_at'], unique=False)
+    op.create_index('ix_chat_conversations_user_exercise', 'chat_conversations', ['user_id', 'exercise_id', 'created_at'], unique=False)
+    op.create_index('ix_exercises_theme_difficulty', 'exercises', ['theme_id', 'difficulty'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_exercises_theme_difficulty', table_name='exercises')
+    op.drop_index('ix_chat_conversations_user_exercise', table_name='chat_conversations')
+    op.drop_index('ix_chat_messages_conversation_created', table_name='chat_messages')
+    op.drop_index('ix_user_responses_user_created', table_name='user_responses')
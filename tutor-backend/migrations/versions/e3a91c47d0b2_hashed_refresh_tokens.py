@@ -0,0 +1,35 @@
+"""hashed_refresh_tokens
+
+Revision ID: e3a91c47d0b2
+Revises: 8c4f2a6e1b93
+Create Date: 2026-10-17 16:42:07.913524
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91c47d0b2'
+down_revision: Union[str, None] = '8c4f2a6e1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DELETE FROM refresh_tokens WHERE expires_at < now()")
+    # Los tokens vigentes se sustituyen por su SHA-256: siguen sirviendo tal cual.
+    op.execute("UPDATE refresh_tokens SET token = encode(sha256(convert_to(token, 'UTF8')), 'hex')")
+    op.alter_column('refresh_tokens', 'token', type_=sa.CHAR(length=64), existing_type=sa.String(length=255), existing_nullable=False)
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    # Los hashes no se pueden revertir: las sesiones abiertas tendrán que volver a iniciar sesión.
+    op.execute("DELETE FROM refresh_tokens")
+    op.alter_column('refresh_tokens', 'token', type_=sa.String(length=255), existing_type=sa.CHAR(length=64), existing_nullable=False)
@@ -0,0 +1,32 @@
+"""cache_versions
+
+Revision ID: f0b6d2e84a17
+Revises: e3a91c47d0b2
+Create Date: 2026-10-17 18:05:52.331870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0b6d2e84a17'
+down_revision: Union[str, None] = 'e3a91c47d0b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('catalog', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
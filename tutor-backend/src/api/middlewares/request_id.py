@@ -1,10 +1,86 @@
+"""
+Middleware ASGI puro de identificador de petición y tiempos.
+
+* Asigna un `request_id` (o respeta el `X-Request-ID` entrante si es válido),
+  lo deja en `request.state.request_id` y lo enlaza en los contextvars de
+  structlog, así que cualquier log emitido durante la petición lo lleva.
+* Abre el acumulador de tiempos por etapa de `src.utils.metrics` y devuelve
+  `X-Request-ID` y `Server-Timing` (`app` más cada etapa registrada hasta que
+  empieza la respuesta) en las cabeceras.
+* Mide la latencia en servidor hasta el último fragmento del cuerpo, de modo
+  que las respuestas en streaming cuentan entero, y la exporta por ruta.
+
+A diferencia de `BaseHTTPMiddleware`, no crea tareas ni colas intermedias y
+no interfiere con `StreamingResponse`.
+"""
+import re
+import time
 import uuid
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request.state.request_id = rid = str(uuid.uuid4())
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = rid
-        return response
+
+import structlog
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.metrics import REGISTRY, begin_request_timings
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "tutor_http_request_duration_seconds", "Latencia en servidor de las peticiones HTTP, hasta el final del cuerpo."
+)
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+logger = structlog.get_logger(__name__)
+
+
+def _incoming_request_id(scope: Scope) -> str | None:
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-id":
+            candidate = value.decode("latin-1")
+            return candidate if _VALID_REQUEST_ID.match(candidate) else None
+    return None
+
+
+def _server_timing(app_seconds: float, stages: dict[str, float]) -> str:
+    entries = [f"app;dur={app_seconds * 1000:.1f}"]
+    entries += [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+    return ", ".join(entries)
+
+
+class RequestIDMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _incoming_request_id(scope) or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        tokens = structlog.contextvars.bind_contextvars(request_id=request_id)
+        stages = begin_request_timings()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers.append("Server-Timing", _server_timing(time.perf_counter() - started, stages))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status)
+            logger.debug(
+                "Request finished",
+                method=scope["method"],
+                route=route,
+                status=status,
+                duration_ms=round(elapsed * 1000, 1),
+            )
+            structlog.contextvars.reset_contextvars(**tokens)
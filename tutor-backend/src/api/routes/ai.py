@@ -1,22 +1,25 @@
-from json import JSONDecodeError, loads
+from json import JSONDecodeError
 from typing import Any, Dict, List
 
 import httpx
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.session import get_db
+from src.core.config import get_settings
+from src.database.session import get_async_db
 from src.api.dependencies.auth import jwt_required
 from src.api.schemas.ai import RawOllamaRequest, AIExerciseOut
 from src.models import Exercise, Theme
-from src.services.exercise_service import create_exercise_from_ai
+from src.services.exercise_service import create_exercise_from_ai, find_unseen_exercise, parse_ai_exercise
+from src.utils.llm_cache import exercise_cache, request_cache_key
 from src.utils.ollama_client import generate_with_ollama
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
+settings = get_settings()
 
 
 # ────────── Endpoint ──────────
@@ -27,42 +30,98 @@ logger = structlog.get_logger(__name__)
 )
 async def ask_ollama(
     req: RawOllamaRequest,
-    _: dict = Depends(jwt_required),
-    db: Session = Depends(get_db),
+    payload: dict = Depends(jwt_required),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    logger.info("Recibida solicitud POST en /api/ai/request", request_data=req.dict(exclude_none=True))
     logger.info("Solicitud a Ollama iniciada", model=req.model, num_messages=len(req.messages) if req.messages else 0)
-    try:
-        raw = await generate_with_ollama(req.dict())
-    except httpx.HTTPError as exc:
-        logger.error("Error de comunicación con Ollama", detail=str(exc), exc_info=exc)
-        raise HTTPException(status.HTTP_502_BAD_GATEWAY, f"Ollama: {exc}")
+    ollama_payload = req.dict()
+    cache_key = request_cache_key(ollama_payload)
+    cached = exercise_cache.get(cache_key)
+    from_cache = cached is not None
+    if from_cache:
+        raw = cached["raw"]
+        logger.info("Respuesta de Ollama servida desde caché", cache_key=cache_key[:12])
+    else:
+        try:
+            raw = await generate_with_ollama(ollama_payload)
+        except httpx.HTTPError as exc:
+            logger.error("Error de comunicación con Ollama", detail=str(exc), exc_info=exc)
+            raise HTTPException(status.HTTP_502_BAD_GATEWAY, f"Ollama: {exc}")
 
     try:
-        content_str = raw["choices"][0]["message"]["content"]
-        if content_str.startswith("```json\n"):
-            content_str = content_str[len("```json\n"):-len("\n```")]
-        elif content_str.startswith("```\n"):
-             content_str = content_str[len("```\n"):-len("\n```")]
-
-        data = loads(content_str)
+        data = parse_ai_exercise(raw)
     except (KeyError, JSONDecodeError, TypeError) as e:
         logger.error("Respuesta de Ollama inválida o malformada", raw_response=raw, error_message=str(e), exc_info=True)
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Respuesta AI inválida")
 
     tema_solicitado = data.get("tema", "N/A").strip().lower()
-    tema: Theme | None = (
-        db.query(Theme)
+    tema: Theme | None = (await db.execute(
+        select(Theme)
         .filter(func.lower(Theme.name) == tema_solicitado)
-        .first()
-    )
+    )).scalars().first()
     if not tema:
-        logger.warn("Tema no encontrado en la base de datos", tema_solicitado=tema_solicitado, available_themes=[t.name for t in db.query(Theme.name).all()])
+        available_themes = (await db.execute(select(Theme.name))).scalars().all()
+        logger.warn("Tema no encontrado en la base de datos", tema_solicitado=tema_solicitado, available_themes=list(available_themes))
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"Tema '{data.get('tema', 'N/A')}' no encontrado")
 
-    ej: Exercise = create_exercise_from_ai(data, tema, db)
-    logger.info("Ejercicio creado desde respuesta de AI", exercise_id=ej.id, theme_id=tema.id, theme_name=tema.name)
+    # Los servicios son síncronos; run_sync los ejecuta sobre la conexión asíncrona.
+    ej: Exercise | None = None
+    if from_cache and settings.ai_cache_reuse_exercises:
+        ej = await db.run_sync(
+            lambda sync_db: find_unseen_exercise(sync_db, tema.id, payload.get("user_id"), data.get("dificultad"))
+        )
+        if ej:
+            logger.info("Reutilizado ejercicio guardado no visto por el usuario", exercise_id=ej.id, theme_id=tema.id)
+
+    if ej is None and from_cache:
+        # La misma respuesta ya produjo un ejercicio: se devuelve ése en vez de duplicarlo.
+        ej = await db.get(Exercise, cached["exercise_id"])
+
+    if ej is None:
+        ej = await db.run_sync(lambda sync_db: create_exercise_from_ai(data, tema, sync_db))
+        logger.info("Ejercicio creado desde respuesta de AI", exercise_id=ej.id, theme_id=tema.id, theme_name=tema.name)
+        # Sólo se cachean respuestas que han producido un ejercicio válido, junto a ese ejercicio.
+        exercise_cache.set(cache_key, {"raw": raw, "exercise_id": ej.id})
+
+    return AIExerciseOut(
+        id=ej.id,
+        tema=tema.name,
+        enunciado=ej.statement,
+        dificultad=ej.difficulty,
+        tipo=ej.type,
+        explicacion=ej.explanation,
+    )
+
+
+@router.get(
+    "/pool/next",
+    response_model=AIExerciseOut,
+    status_code=status.HTTP_200_OK,
+)
+async def next_pool_exercise(
+    theme_id: int,
+    dificultad: str,
+    tipo: str | None = None,
+    payload: dict = Depends(jwt_required),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Sirve un ejercicio pregenerado del pool que el usuario aún no ha respondido.
+    Si el pool está vacío devuelve 404 y el front puede recurrir a `/request`.
+    """
+    user_id = payload.get("user_id")
+    tema: Theme | None = await db.get(Theme, theme_id)
+    if not tema:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Tema con ID {theme_id} no encontrado")
+
+    ej: Exercise | None = await db.run_sync(
+        lambda sync_db: find_unseen_exercise(sync_db, theme_id, user_id, dificultad, tipo)
+    )
+    if not ej:
+        logger.info("Pool de ejercicios vacío para el usuario", user_id=user_id, theme_id=theme_id, difficulty=dificultad, type=tipo)
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "No hay ejercicios pregenerados disponibles")
 
+    logger.info("Ejercicio servido desde el pool", exercise_id=ej.id, user_id=user_id, theme_id=theme_id)
     return AIExerciseOut(
         id=ej.id,
         tema=tema.name,
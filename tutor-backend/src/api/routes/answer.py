@@ -13,8 +13,7 @@ router = APIRouter()
 logger = structlog.get_logger(__name__)
 
 
-@router.post("", response_model=AnswerOut, status_code=201,
-             dependencies=[Depends(jwt_required)])
+@router.post("", response_model=AnswerOut, status_code=201)
 def answer(body:AnswerIn,
            payload:dict = Depends(jwt_required),
            db:Session  = Depends(get_db)):
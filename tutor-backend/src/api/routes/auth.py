@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import random
 import string
 
@@ -15,21 +15,27 @@ from sqlalchemy.exc import IntegrityError
 from src.api.schemas.authlog import LoginIn, RefreshIn, TokenOut
 from src.api.schemas.authlogout import LogoutIn
 from src.api.dependencies.auth import jwt_required
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 import requests
 from google.oauth2 import id_token as google_id_token
 from google.auth.transport import requests as google_requests
-from sqlalchemy  import delete
+from sqlalchemy  import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database.session import get_db
+from src.database.session import get_async_db, get_db
 from src.core.security import (
-    verify_password,
     create_access_token,
     create_refresh_token,
+    get_login_throttle,
+    get_password_service,
 )
 from src.models import User, RefreshToken
-from src.core.security import hash_password
+from src.services.token_service import (
+    refresh_token_expiry,
+    store_refresh_token,
+    store_refresh_token_sync,
+)
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -38,28 +44,49 @@ settings = get_settings()
 
 # ──────────── Endpoints ───────────
 @router.post("/login", response_model=TokenOut)
-def login(data: LoginIn, db: Session = Depends(get_db)) -> TokenOut:
-    user: User | None = (
-        db.query(User).filter(User.email == data.email.lower()).first()
-    )
-    if not user or not verify_password(data.password, user.password):
-        logger.warn("Intento de login fallido", email=data.email.lower())
+async def login(
+    data: LoginIn,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+) -> TokenOut:
+    # bcrypt se ejecuta en el pool de `PasswordService`, no en el bucle ni en el
+    # threadpool compartido; las cuentas/IPs con demasiados fallos ni lo llegan a usar.
+    email = data.email.lower()
+    client_ip = request.client.host if request.client else None
+    throttle = get_login_throttle()
+    throttle.check(email, client_ip)
+
+    user: User | None = await db.scalar(select(User).where(User.email == email))
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await get_password_service().verify_and_update(data.password, user.password)
+    if not valid:
+        throttle.record_failure(email, client_ip)
+        logger.warn("Intento de login fallido", email=email)
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Credenciales inválidas")
+    throttle.record_success(email, client_ip)
+    if new_hash:
+        # Esquema o coste antiguos: se guarda el hash nuevo con el mismo commit del refresh token.
+        user.password = new_hash
+        logger.info("Hash de contraseña actualizado", user_id=user.id)
 
     access_token = create_access_token(user.id, user.is_admin)
-    refresh_token = _store_refresh(user, db)
+    refresh_token = create_refresh_token()
+    await store_refresh_token(db, user.id, refresh_token)
     logger.info("Usuario ha iniciado sesión", user_id=user.id, email=user.email)
 
     return TokenOut(access_token=access_token, refresh_token=refresh_token)
 
 
 @router.post("/refresh", response_model=TokenOut)
-def refresh(data: RefreshIn, db: Session = Depends(get_db)) -> TokenOut:
-    stored: RefreshToken | None = (
-        db.query(RefreshToken).filter_by(token=data.refresh_token).first()
+async def refresh(data: RefreshIn, db: AsyncSession = Depends(get_async_db)) -> TokenOut:
+    token_prefix = data.refresh_token[:8] + "..."
+    # `token` guarda el hash: la comparación hashea el valor recibido.
+    stored: RefreshToken | None = await db.scalar(
+        select(RefreshToken).where(RefreshToken.token == data.refresh_token)
     )
     if not stored:
-        logger.error("Intento de refrescar token inválido", refresh_token=data.refresh_token)
+        logger.error("Intento de refrescar token inválido", refresh_token_prefix=token_prefix)
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Token inválido")
 
     exp = stored.expires_at
@@ -67,26 +94,24 @@ def refresh(data: RefreshIn, db: Session = Depends(get_db)) -> TokenOut:
         exp = exp.replace(tzinfo=timezone.utc)
 
     if exp < datetime.now(timezone.utc):
-        logger.error("Intento de refrescar token expirado", refresh_token=data.refresh_token, user_id=stored.user_id, expired_at=exp.isoformat())
-        db.execute(delete(RefreshToken).where(RefreshToken.id == stored.id))
-        db.commit()
+        logger.error("Intento de refrescar token expirado", refresh_token_prefix=token_prefix, user_id=stored.user_id, expired_at=exp.isoformat())
+        await db.execute(delete(RefreshToken).where(RefreshToken.id == stored.id))
+        await db.commit()
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Token expirado")
 
-    while True:
-        stored.token = create_refresh_token()
-        stored.expires_at = datetime.now(timezone.utc) + timedelta(days=3)
-        try:
-            db.commit()
-            break
-        except IntegrityError:
-            db.rollback()
+    # 256 bits aleatorios: una colisión con el índice único no va a ocurrir,
+    # así que se rota en un solo commit, sin reintentos.
+    new_token = create_refresh_token()
+    stored.token = new_token
+    stored.expires_at = refresh_token_expiry()
+    await db.commit()
 
-    user: User = db.get(User, stored.user_id)
-    logger.info("Token refrescado", user_id=user.id)
+    is_admin = await db.scalar(select(User.is_admin).where(User.id == stored.user_id))
+    logger.info("Token refrescado", user_id=stored.user_id)
 
     return TokenOut(
-        access_token=create_access_token(user.id, user.is_admin),
-        refresh_token=stored.token,
+        access_token=create_access_token(stored.user_id, is_admin),
+        refresh_token=new_token,
     )
 
 @router.post("/google", response_model=TokenOut)
@@ -171,7 +196,7 @@ def google_login(payload: GoogleCode, db: Session = Depends(get_db)) -> TokenOut
 
         user = User(username=username,
                     email=email,
-                    password=hash_password(generate_password()))
+                    password=get_password_service().hash_blocking(generate_password()))
         db.add(user); db.commit(); db.refresh(user)
 
         db.add(UserProvider(user_id=user.id,
@@ -183,30 +208,11 @@ def google_login(payload: GoogleCode, db: Session = Depends(get_db)) -> TokenOut
     # 4. Emitir tokens
     access  = create_access_token(user.id, user.is_admin)
     refresh = create_refresh_token()
-    db.add(RefreshToken(user_id=user.id,
-                        token=refresh,
-                        expires_at=datetime.now(timezone.utc)+timedelta(days=3)))
-    db.commit()
+    store_refresh_token_sync(db, user.id, refresh)
 
     return TokenOut(access_token=access, refresh_token=refresh)
 
 # ──────────── helpers ────────────
-def _expiry(*, days: int = 0, minutes: int = 0):
-    return datetime.now(timezone.utc) + timedelta(days=days, minutes=minutes)
-
-
-def _store_refresh(user: User, db: Session) -> str:
-    token = create_refresh_token()
-    db.add(
-        RefreshToken(
-            user_id=user.id,
-            token=token,
-            expires_at=_expiry(days=3),
-        )
-    )
-    db.commit()
-    return token
-
 def generate_password(longitud=12):
     """
     Genera una contraseña aleatoria de la longitud especificada (por defecto 12).
@@ -280,23 +286,21 @@ def logout(
     response_model=RegisterOut,
     status_code=status.HTTP_201_CREATED,
 )
-def register_user(
+async def register_user(
     body: RegisterIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RegisterOut:
     """
     Alta de usuario *self-service*.
 
     1. Comprueba duplicados (username, e-mail).
-    2. Hashea contraseña con `bcrypt`.
+    2. Hashea la contraseña con el esquema configurado (`bcrypt` o `argon2`).
     3. Devuelve DTO sin exponer el hash.
     """
     logger.info("Intento de registro de nuevo usuario", username=body.username, email=body.email)
 
-    dup = (
-        db.query(User)
-        .filter((User.username == body.username) | (User.email == body.email))
-        .first()
+    dup = await db.scalar(
+        select(User.id).where(or_(User.username == body.username, User.email == body.email))
     )
     if dup:
         raise HTTPException(
@@ -307,19 +311,19 @@ def register_user(
     new_user = User(
         username=body.username,
         email=body.email,
-        password=hash_password(body.password),
+        password=await get_password_service().hash(body.password),
     )
     db.add(new_user)
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Usuario duplicado",
         ) from None
 
-    db.refresh(new_user)
+    await db.refresh(new_user)
     logger.info("Usuario registrado exitosamente", user_id=new_user.id, username=new_user.username, email=new_user.email)
 
     return RegisterOut.model_validate(
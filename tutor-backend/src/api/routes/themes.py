@@ -1,15 +1,23 @@
 import structlog
 from src.api.schemas.themes import ThemeUpdate, ThemeCreate
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
 from src.database.session import get_db
 from src.api.dependencies.auth import admin_required
-from src.models import Subject, Theme
+from src.models import Exercise, Subject, Theme
+from src.services.catalog_service import catalog_cache, invalidate_catalog, json_response, public_etag
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
 
+# Colecciones que `delete-orphan` borra junto con un tema.
+THEME_CASCADE_LOAD = (
+    selectinload(Theme.exercises).selectinload(Exercise.responses),
+    selectinload(Theme.progress),
+)
+
 
 @router.post("", status_code=status.HTTP_201_CREATED, dependencies=[Depends(admin_required)])
 def create_theme(body: ThemeCreate, db: Session = Depends(get_db)):
@@ -30,33 +38,21 @@ def create_theme(body: ThemeCreate, db: Session = Depends(get_db)):
     )
     db.add(tema)
     db.commit()
+    invalidate_catalog(db)
     db.refresh(tema)
     logger.info("Tema creado exitosamente", theme_id=tema.id, name=tema.name, subject_id=tema.subject_id)
     return {"id": tema.id, "name": tema.name, "description": tema.description, "subject_id": tema.subject_id}
 
 
 @router.get("", summary="Lista pública de temas")
-def list_all(db: Session = Depends(get_db)):
+def list_all(request: Request, db: Session = Depends(get_db)) -> Response:
     """
     Devuelve todos los temas con `subject_id`
     para que el front pueda relacionarlos.
     """
     logger.info("Listando todos los temas")
-    themes = (
-        db.query(Theme)
-        .options(selectinload(Theme.subject))
-        .all()
-    )
-    logger.info("Temas listados", count=len(themes))
-    return [
-        {
-            "id":         t.id,
-            "title":      t.name,
-            "description": t.description,
-            "subject_id":  t.subject_id,
-        }
-        for t in themes
-    ]
+    snapshot = catalog_cache.get(db)
+    return json_response(request, public_etag(snapshot, "themes"), lambda: snapshot.themes_body)
 
 @router.put("/{theme_id}", response_model=dict, dependencies=[Depends(admin_required)])
 def update_theme(theme_id: int, body: ThemeUpdate, db: Session = Depends(get_db)):
@@ -87,6 +83,7 @@ def update_theme(theme_id: int, body: ThemeUpdate, db: Session = Depends(get_db)
 
 
     db.commit()
+    invalidate_catalog(db)
     db.refresh(theme)
     logger.info("Tema actualizado exitosamente", theme_id=theme.id, name=theme.name, subject_id=theme.subject_id)
     return {
@@ -100,10 +97,14 @@ def update_theme(theme_id: int, body: ThemeUpdate, db: Session = Depends(get_db)
 @router.delete("/{theme_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(admin_required)])
 def delete_theme(theme_id: int, db: Session = Depends(get_db)):
     logger.info("Intentando eliminar tema", theme_id=theme_id)
-    theme = db.query(Theme).get(theme_id)
+    # Lo que borra la cascada del ORM, cargado de una vez y no ejercicio a ejercicio.
+    theme = db.scalars(
+        select(Theme).where(Theme.id == theme_id).options(*THEME_CASCADE_LOAD)
+    ).one_or_none()
     if not theme:
         logger.warn("Tema no encontrado al intentar eliminar", theme_id=theme_id)
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Tema no encontrado")
     db.delete(theme)
     db.commit()
+    invalidate_catalog(db)
     logger.info("Tema eliminado exitosamente", theme_id=theme_id)
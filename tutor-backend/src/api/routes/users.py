@@ -1,5 +1,6 @@
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from src.database.session import get_db
@@ -22,21 +23,14 @@ def me(payload: dict = Depends(jwt_required), db: Session = Depends(get_db)):
     return {"id": user.id, "username": user.username, "email": user.email, "is_admin": user.is_admin}
 
 
-@router.get("/all", dependencies=[Depends(admin_required)])
-def list_users(db: Session = Depends(get_db), payload: dict = Depends(jwt_required)):
+@router.get("/all")
+def list_users(db: Session = Depends(get_db), payload: dict = Depends(admin_required)):
     admin_user_id = payload["user_id"]
     logger.info("Listando todos los usuarios (admin)", admin_user_id=admin_user_id)
-    users = db.query(User).all()
+    # Sólo las columnas que se devuelven: una consulta, sin instanciar el ORM.
+    users = db.execute(select(User.id, User.username, User.email, User.is_admin)).mappings().all()
     logger.info("Usuarios listados (admin)", count=len(users), admin_user_id=admin_user_id)
-    return [
-        {
-            "id": u.id,
-            "username": u.username,
-            "email": u.email,
-            "is_admin": u.is_admin,
-        }
-        for u in users
-    ]
+    return [dict(u) for u in users]
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -32,6 +32,13 @@ class ChatConversationResponse(ChatConversationBase):
     class Config:
         from_attributes = True
 
+class ChatConversationPage(ChatConversationResponse):
+    """
+    Una página del historial, en orden cronológico. Para la página anterior
+    se pide `before_id=messages[0].id` mientras `has_more` sea True.
+    """
+    has_more: bool = False
+
 from typing import Optional
 
 class UserMessageInput(BaseModel):
@@ -1,8 +1,8 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import EmailStr, Field, HttpUrl, PositiveInt, PostgresDsn
+from pydantic import EmailStr, Field, HttpUrl, PositiveFloat, PositiveInt, PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -28,7 +28,33 @@ class Settings(BaseSettings):
     jwt_algorithm:   str           = "HS256"
     jwt_access_minutes: PositiveInt = 30
     jwt_refresh_days:   PositiveInt = 3
+    # Refresh tokens activos por usuario (se descartan los más antiguos) y purga de caducados.
+    refresh_tokens_per_user:      PositiveInt = Field(10, env="REFRESH_TOKENS_PER_USER")
+    refresh_token_sweep_interval: PositiveInt = Field(3600, env="REFRESH_TOKEN_SWEEP_INTERVAL")
+    refresh_token_sweep_batch:    PositiveInt = Field(1000, env="REFRESH_TOKEN_SWEEP_BATCH")
+    # Invalidación de cachés entre workers: sondeo de `cache_versions` cuando no hay
+    # LISTEN/NOTIFY y, con él, sondeo de respaldo por si se pierde alguna notificación.
+    cache_poll_interval:        PositiveFloat = Field(2.0, env="CACHE_POLL_INTERVAL")
+    cache_poll_safety_interval: PositiveFloat = Field(60.0, env="CACHE_POLL_SAFETY_INTERVAL")
+    # Tokens de acceso ya verificados que se recuerdan hasta su `exp` (0 = sin caché).
+    jwt_cache_size:     int         = Field(4096, ge=0, env="JWT_CACHE_SIZE")
     bcrypt_rounds:      PositiveInt = 12
+    # Esquema para hashes nuevos ("bcrypt" o "argon2", este último necesita argon2-cffi).
+    # Los hashes con otro esquema o coste se rehacen en el siguiente login correcto.
+    password_scheme:    str         = Field("bcrypt", pattern="^(bcrypt|argon2)$", env="PASSWORD_SCHEME")
+    # argon2id; memoria en KiB. Ajustar con `python -m src.scripts.bench_passwords`.
+    argon2_time_cost:   PositiveInt = Field(2, env="ARGON2_TIME_COST")
+    argon2_memory_cost: PositiveInt = Field(19456, env="ARGON2_MEMORY_COST")
+    argon2_parallelism: PositiveInt = Field(1, env="ARGON2_PARALLELISM")
+    # Pool propio para hashear/verificar contraseñas y límite de operaciones en espera.
+    password_hash_workers:   PositiveInt = Field(2, env="PASSWORD_HASH_WORKERS")
+    password_hash_max_queue: PositiveInt = Field(16, env="PASSWORD_HASH_MAX_QUEUE")
+    # Intentos fallidos de login permitidos por ventana deslizante (segundos):
+    # por cuenta desde una misma IP, por cuenta desde cualquier IP y por IP.
+    login_max_failures_per_account:        PositiveInt = Field(5, env="LOGIN_MAX_FAILURES_PER_ACCOUNT")
+    login_max_failures_per_account_global: PositiveInt = Field(100, env="LOGIN_MAX_FAILURES_PER_ACCOUNT_GLOBAL")
+    login_max_failures_per_ip:             PositiveInt = Field(50, env="LOGIN_MAX_FAILURES_PER_IP")
+    login_failure_window:           PositiveInt = Field(300, env="LOGIN_FAILURE_WINDOW")
 
     # ── Google OAuth ─────────────────────────────────────────
     google_client_id:     str      = Field("", env="GOOGLE_CLIENT_ID")
@@ -37,11 +63,59 @@ class Settings(BaseSettings):
 
     # ── Ollama / RAG ─────────────────────────────────────────
     ollama_url:      str           = Field("http://localhost:11434", env="OLLAMA_URL")
+    # Varios nodos (JSON, p. ej. '["http://gpu1:8080","http://gpu2:8080"]'); si está vacío se usa OLLAMA_URL.
+    ollama_urls:     List[str]     = Field(default_factory=list, env="OLLAMA_URLS")
     api_key:         Optional[str] = Field(None, env="API_KEY")
     ollama_history_messages_window: PositiveInt = Field(6, env="OLLAMA_HISTORY_MESSAGES_WINDOW")
     ollama_model:     str           = Field("profesor", env="OLLAMA_MODEL")
     ollama_warmup_retries: PositiveInt = Field(5, env="OLLAMA_WARMUP_RETRIES")
     ollama_warmup_delay:   PositiveInt = Field(10, env="OLLAMA_WARMUP_DELAY")
+    ollama_coalesce_requests: bool     = Field(True, env="OLLAMA_COALESCE_REQUESTS")
+    ollama_max_concurrency:   PositiveInt = Field(4, env="OLLAMA_MAX_CONCURRENCY")
+    ollama_max_queue:         PositiveInt = Field(32, env="OLLAMA_MAX_QUEUE")
+    ollama_queue_timeout:     PositiveInt = Field(30, env="OLLAMA_QUEUE_TIMEOUT")
+    ollama_breaker_failure_rate: float     = Field(0.5, gt=0, le=1, env="OLLAMA_BREAKER_FAILURE_RATE")
+    ollama_breaker_window:       PositiveInt = Field(60, env="OLLAMA_BREAKER_WINDOW")
+    ollama_breaker_min_calls:    PositiveInt = Field(5, env="OLLAMA_BREAKER_MIN_CALLS")
+    ollama_breaker_open_seconds: PositiveInt = Field(30, env="OLLAMA_BREAKER_OPEN_SECONDS")
+    ollama_health_probe_interval: PositiveInt = Field(10, env="OLLAMA_HEALTH_PROBE_INTERVAL")
+    # Pool HTTP por backend: conectar y esperar conexión libre fallan rápido; leer admite generaciones largas.
+    ollama_connect_timeout:    float       = Field(5.0, gt=0, env="OLLAMA_CONNECT_TIMEOUT")
+    ollama_read_timeout:       float       = Field(120.0, gt=0, env="OLLAMA_READ_TIMEOUT")
+    ollama_write_timeout:      float       = Field(10.0, gt=0, env="OLLAMA_WRITE_TIMEOUT")
+    ollama_pool_timeout:       float       = Field(5.0, gt=0, env="OLLAMA_POOL_TIMEOUT")
+    ollama_max_connections:    PositiveInt = Field(20, env="OLLAMA_MAX_CONNECTIONS")
+    ollama_max_keepalive:      PositiveInt = Field(10, env="OLLAMA_MAX_KEEPALIVE")
+    ollama_keepalive_expiry:   float       = Field(60.0, gt=0, env="OLLAMA_KEEPALIVE_EXPIRY")
+    ollama_http2:              bool        = Field(True, env="OLLAMA_HTTP2")
+
+    # ── Observabilidad ───────────────────────────────────────
+    # `/metrics` no pasa por el login: desactivado por defecto y, si se define
+    # METRICS_TOKEN, exige `Authorization: Bearer <token>` (el del scraper).
+    metrics_enabled:          bool          = Field(False, env="METRICS_ENABLED")
+    metrics_token:            Optional[str] = Field(None, env="METRICS_TOKEN")
+    log_level:                str         = Field("INFO", env="LOG_LEVEL")
+    log_queue_enabled:        bool        = Field(True, env="LOG_QUEUE_ENABLED")
+    log_queue_size:           PositiveInt = Field(10_000, env="LOG_QUEUE_SIZE")
+    log_max_field_length:     PositiveInt = Field(2_000, env="LOG_MAX_FIELD_LENGTH")
+    # Fracción que se conserva de cada evento INFO/DEBUG muy frecuente (JSON: {"evento": 0.1}).
+    log_sample_rates:         Dict[str, float] = Field(
+        default_factory=lambda: {"Payload a enviar a Ollama": 0.1},
+        env="LOG_SAMPLE_RATES",
+    )
+
+    # ── Caché de ejercicios IA ───────────────────────────────
+    ai_cache_enabled:         bool        = Field(True, env="AI_CACHE_ENABLED")
+    ai_cache_ttl_seconds:     PositiveInt = Field(600, env="AI_CACHE_TTL_SECONDS")
+    ai_cache_max_entries:     PositiveInt = Field(256, env="AI_CACHE_MAX_ENTRIES")
+    ai_cache_reuse_exercises: bool        = Field(False, env="AI_CACHE_REUSE_EXERCISES")
+
+    # ── Pool de ejercicios pregenerados ──────────────────────
+    exercise_pool_enabled:         bool        = Field(False, env="EXERCISE_POOL_ENABLED")
+    exercise_pool_size:            PositiveInt = Field(5, env="EXERCISE_POOL_SIZE")
+    exercise_pool_difficulties:    List[str]   = Field(default_factory=lambda: ["fácil", "intermedia", "difícil"])
+    exercise_pool_refill_interval: PositiveInt = Field(300, env="EXERCISE_POOL_REFILL_INTERVAL")
+    exercise_pool_max_per_cycle:   PositiveInt = Field(10, env="EXERCISE_POOL_MAX_PER_CYCLE")
 
     # ── Misc ─────────────────────────────────────────────────
     env:             str           = Field("dev", env="ENV")
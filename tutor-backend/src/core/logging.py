@@ -1,33 +1,251 @@
+"""
+Configuración del logging de la aplicación (stdlib + structlog).
+
+Por defecto todo se escribe de forma síncrona en stdout. Con `use_queue=True`
+el hilo que atiende la petición sólo deja el registro en una cola acotada, y un
+hilo aparte (`AsyncLogHandler`) hace el formateo final y escribe por lotes. Si
+la cola se llena, los registros se descartan en vez de bloquear.
+
+Además, en la cadena de structlog:
+
+* `EventSampler` deja pasar sólo una fracción de los eventos INFO/DEBUG muy
+  frecuentes, configurados por nombre de evento.
+* `FieldTruncator` recorta los textos largos (prompts, respuestas del LLM) a
+  `max_field_length` caracteres.
+* El JSON se serializa con `orjson` si está instalado.
+"""
+import atexit
+import json
 import logging
+import random
 import sys
+import threading
+from collections import deque
+from typing import IO, Any, Callable, Mapping
 
 import structlog
 
-def setup_logging(level_name: str = "INFO") -> None:
+try:
+    import orjson
+except ImportError:  # dependencia opcional: se usa `json` de la stdlib
+    orjson = None
+
+LOG_FORMAT = "%(levelname)s %(asctime)s %(name)s: %(message)s"
+SAMPLED_LEVELS = frozenset({"debug", "info"})
+# Claves que nunca se recortan: el nombre del evento y las trazas de error.
+UNTRUNCATED_KEYS = frozenset({"event", "exception", "exc_info", "stack"})
+
+_async_handler: "AsyncLogHandler | None" = None
+
+
+def json_dumps(obj: Any, default: Callable[[Any], Any] | None = None, **_: Any) -> str:
+    """Serializador para `JSONRenderer`: `orjson` si está disponible, si no `json`."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # p. ej. enteros de más de 64 bits: se deja a `json`
+    return json.dumps(obj, default=default, ensure_ascii=False)
+
+
+class EventSampler:
+    """
+    Procesador de structlog que muestrea los eventos INFO/DEBUG indicados en
+    `rates` (`{evento: fracción que se conserva}`). Los avisos y errores pasan
+    siempre.
+    """
+
+    def __init__(self, rates: Mapping[str, float] | None = None, rng: Callable[[], float] = random.random):
+        self.rates = dict(rates or {})
+        self._rng = rng
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is not None and method_name in SAMPLED_LEVELS and self._rng() >= rate:
+            raise structlog.DropEvent
+        return event_dict
+
+
+def _truncate(value: Any, limit: int, depth: int = 0) -> Any:
+    """Devuelve el mismo objeto si no hay nada que recortar; si lo hay, una copia (nunca se muta el original)."""
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value
+        return f"{value[:limit]}…[+{len(value) - limit}]"
+    if depth >= 4:
+        return value
+    if isinstance(value, dict):
+        copy = None
+        for k, v in value.items():
+            t = _truncate(v, limit, depth + 1)
+            if t is not v:
+                copy = copy if copy is not None else dict(value)
+                copy[k] = t
+        return value if copy is None else copy
+    if isinstance(value, (list, tuple)):
+        copy = None
+        for i, v in enumerate(value):
+            t = _truncate(v, limit, depth + 1)
+            if t is not v:
+                copy = copy if copy is not None else list(value)
+                copy[i] = t
+        return value if copy is None else copy
+    return value
+
+
+class FieldTruncator:
+    """Recorta los textos de más de `max_length` caracteres, también dentro de dicts y listas."""
+
+    def __init__(self, max_length: int | None = None):
+        self.max_length = max_length
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        if not self.max_length:
+            return event_dict
+        for key, value in event_dict.items():
+            if key in UNTRUNCATED_KEYS or not isinstance(value, (str, dict, list, tuple)):
+                continue
+            truncated = _truncate(value, self.max_length)
+            if truncated is not value:
+                event_dict[key] = truncated
+        return event_dict
+
+
+class AsyncLogHandler(logging.Handler):
+    """
+    Handler no bloqueante: `emit` sólo añade el registro a una cola acotada
+    (una `deque`, sin locks ni avisos entre hilos) y un hilo de escritura la
+    vacía cada `flush_interval` segundos en una sola escritura. Con la cola
+    llena, los registros nuevos se descartan y se cuentan en `dropped`.
+
+    Acepta también líneas ya renderizadas por structlog (`enqueue_line`), que
+    se escriben tal cual.
+    """
+
+    def __init__(self, stream: IO[str], maxsize: int = 10_000, flush_interval: float = 0.05):
+        super().__init__()
+        self.stream = stream
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pending: deque[logging.LogRecord | str] = deque()
+        self._stopping = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._writer.start()
+
+    def enqueue_line(self, line: str | logging.LogRecord) -> None:
+        if self._stopping.is_set():
+            # Ya parado (apagado o reconfiguración): se escribe directamente.
+            self._pending.append(line)
+            self.flush()
+            return
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            return
+        self._pending.append(line)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Se fija el mensaje ya: los argumentos podrían cambiar antes de escribirse.
+        record.msg, record.args = record.getMessage(), None
+        self.enqueue_line(record)
+
+    def flush(self) -> None:
+        lines = []
+        while self._pending:
+            item = self._pending.popleft()
+            lines.append(item if isinstance(item, str) else self.format(item))
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._writer.is_alive() and self._writer is not threading.current_thread():
+            self._writer.join()
+        self.flush()
+        super().close()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # el hilo de escritura no puede morir por un registro
+                self.handleError(logging.makeLogRecord({"msg": "log writer error"}))
+
+
+class _QueuedLogger:
+    """Logger final de structlog: deja la línea ya renderizada en la cola de `AsyncLogHandler`."""
+
+    def __init__(self, handler: AsyncLogHandler):
+        self._handler = handler
+
+    def msg(self, message: str) -> None:
+        self._handler.enqueue_line(message)
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+def stop_logging() -> None:
+    """Escribe lo pendiente y para el hilo de escritura (si se arrancó uno)."""
+    global _async_handler
+    if _async_handler is not None:
+        _async_handler.close()
+        _async_handler = None
+
+
+atexit.register(stop_logging)
+
+
+def setup_logging(
+    level_name: str = "INFO",
+    *,
+    use_queue: bool = False,
+    queue_size: int = 10_000,
+    sample_rates: Mapping[str, float] | None = None,
+    max_field_length: int | None = None,
+) -> None:
     """
     Configura el logger raíz de Python y structlog.
     - force=True: elimina handlers previos (pytest, etc.) y reaplica el nuestro.
     - level_name: nombre de nivel ("INFO","DEBUG",…)
+    - use_queue: escritura en un hilo aparte a través de una cola de `queue_size` registros.
+    - sample_rates / max_field_length: ver `EventSampler` y `FieldTruncator`.
     """
     numeric_level = logging.getLevelName(level_name.upper())
     if not isinstance(numeric_level, int):
         logging.warning(f"Invalid log level name '{level_name}'. Defaulting to INFO.")
         numeric_level = logging.INFO
 
+    stop_logging()
+    if use_queue:
+        global _async_handler
+        _async_handler = handler = AsyncLogHandler(sys.stdout, maxsize=queue_size)
+        handlers: list[logging.Handler] = [handler]
+        logger_factory = lambda *args: _QueuedLogger(handler)
+    else:
+        handlers = [logging.StreamHandler(sys.stdout)]
+        logger_factory = structlog.PrintLoggerFactory()
+
     logging.basicConfig(
         level=numeric_level,
-        format="%(levelname)s %(asctime)s %(name)s: %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)],
+        format=LOG_FORMAT,
+        handlers=handlers,
         force=True,
     )
 
     structlog.configure(
         wrapper_class=structlog.make_filtering_bound_logger(numeric_level),
+        logger_factory=logger_factory,
         processors=[
+            # `request_id` y demás valores enlazados por el middleware de petición.
+            structlog.contextvars.merge_contextvars,
+            # Muestreo y recorte antes de formatear: lo descartado no cuesta nada más.
+            EventSampler(sample_rates),
+            FieldTruncator(max_field_length),
             structlog.processors.TimeStamper(fmt="ISO"),
             structlog.processors.add_log_level,
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
-            structlog.processors.JSONRenderer(),
+            structlog.processors.JSONRenderer(serializer=json_dumps),
         ],
     )
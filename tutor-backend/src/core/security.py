@@ -1,27 +1,258 @@
 from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
+import math
 import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, TypeVar
+import importlib.util
 
 import jwt
+import structlog
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
 from src.core.config import get_settings
 
-# Creamos el contexto de bcrypt sólo una vez
-_pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+logger = structlog.get_logger(__name__)
+
+
+def argon2_available() -> bool:
+    return importlib.util.find_spec("argon2") is not None
+
+
+@lru_cache(maxsize=4)
+def _build_context(
+    scheme: str, bcrypt_rounds: int, argon2_time_cost: int, argon2_memory_cost: int, argon2_parallelism: int
+) -> CryptContext:
+    if scheme == "argon2" and not argon2_available():
+        logger.warning("argon2-cffi no está instalado; se sigue usando bcrypt para los hashes nuevos")
+        scheme = "bcrypt"
+    schemes = [scheme] + [s for s in ("bcrypt", "argon2") if s != scheme and (s != "argon2" or argon2_available())]
+    return CryptContext(
+        schemes=schemes,
+        # Todo lo que no sea el esquema preferido con los parámetros actuales
+        # queda obsoleto: `needs_update` lo marca y se rehace en el login.
+        deprecated=schemes[1:],
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+def _pwd() -> CryptContext:
+    """Contexto de passlib con el esquema y el coste configurados (se construye una vez por configuración)."""
+    cfg = get_settings()
+    return _build_context(
+        cfg.password_scheme, cfg.bcrypt_rounds, cfg.argon2_time_cost, cfg.argon2_memory_cost, cfg.argon2_parallelism
+    )
 
 
 def hash_password(password: str) -> str:
     """
-    Hashea con bcrypt la contraseña en claro.
+    Hashea la contraseña en claro con el esquema y coste configurados.
     """
-    return _pwd.hash(password)
+    return _pwd().hash(password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
     """
-    Verifica que `password` coincide con el hash.
+    Verifica que `password` coincide con el hash (sea cual sea su esquema).
+    """
+    return _pwd().verify(password, hashed)
+
+
+def verify_and_update_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    Como `verify_password`, pero si la contraseña es correcta y el hash usa otro
+    esquema u otro coste que los configurados, devuelve también el hash nuevo
+    para guardarlo (si no, `None`).
+    """
+    return _pwd().verify_and_update(password, hashed)
+
+
+class PasswordServiceBusyError(HTTPException):
+    """Demasiados hashes de contraseña pendientes; la petición no se ha encolado."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="El servicio de autenticación está saturado. Inténtalo de nuevo en unos segundos.",
+            headers={"Retry-After": "2"},
+        )
+
+
+class LoginThrottledError(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail="Demasiados intentos de inicio de sesión. Inténtalo más tarde.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class PasswordService:
+    """
+    Hash y verificación de contraseñas fuera del bucle de eventos y del
+    threadpool de FastAPI, en un pool propio de `max_workers` hilos (bcrypt y
+    argon2 liberan el GIL mientras calculan). Como mucho `max_queue` operaciones
+    esperan a un hilo libre; a partir de ahí se responde 503 al momento, así una
+    ráfaga de logins no acapara la CPU del resto de la API.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        return await self._run(verify_and_update_password, password, hashed)
+
+    def hash_blocking(self, password: str) -> str:
+        """Para rutas síncronas: mismo pool y mismo límite, esperando en el hilo actual."""
+        self._reserve()
+        try:
+            return self._executor.submit(hash_password, password).result()
+        finally:
+            self._release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        self._reserve()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._release()
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordServiceBusyError()
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+class LoginThrottle:
+    """
+    Limita los intentos fallidos de login en una ventana deslizante de
+    `window_seconds`. El límite estricto (`max_per_account`) se aplica a cada
+    par cuenta + IP, de modo que quien prueba contraseñas desde otra IP no
+    bloquea al alumno legítimo. Además hay un techo global por cuenta
+    (`max_per_account_global`, mucho más alto, contra ataques repartidos entre
+    muchas IPs) y otro por IP (`max_per_ip`, alto: un aula entera puede salir
+    por la misma IP). Mientras una clave está bloqueada se rechaza sin
+    calcular ningún hash.
     """
-    return _pwd.verify(password, hashed)
+
+    def __init__(
+        self,
+        max_per_account: int,
+        max_per_ip: int,
+        window_seconds: float,
+        max_per_account_global: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = {
+            "account_ip": max_per_account,
+            "account": max_per_account_global or 20 * max_per_account,
+            "ip": max_per_ip,
+        }
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._failures: dict[tuple[str, str], deque[float]] = {}
+
+    def check(self, email: str, ip: str | None) -> None:
+        """Lanza `LoginThrottledError` si la cuenta, la IP o el par han agotado sus intentos."""
+        now = self._clock()
+        wait = max(self._retry_after(key, now) for key in self._keys(email, ip))
+        if wait > 0:
+            raise LoginThrottledError(wait)
+
+    def record_failure(self, email: str, ip: str | None) -> None:
+        now = self._clock()
+        for key in self._keys(email, ip):
+            self._failures.setdefault(key, deque()).append(now)
+        if len(self._failures) > 10_000:
+            self._sweep(now)
+
+    def record_success(self, email: str, ip: str | None) -> None:
+        self._failures.pop(("account_ip", f"{email}|{ip or ''}"), None)
+        self._failures.pop(("account", email), None)
+
+    def clear(self) -> None:
+        self._failures.clear()
+
+    @staticmethod
+    def _keys(email: str, ip: str | None) -> list[tuple[str, str]]:
+        keys = [("account_ip", f"{email}|{ip or ''}"), ("account", email)]
+        return keys + ([("ip", ip)] if ip else [])
+
+    def _retry_after(self, key: tuple[str, str], now: float) -> float:
+        failures = self._failures.get(key)
+        if not failures:
+            return 0.0
+        while failures and now - failures[0] >= self.window_seconds:
+            failures.popleft()
+        if len(failures) < self.limits[key[0]]:
+            return 0.0
+        # Bloqueada hasta que el fallo que agota el cupo salga de la ventana.
+        return failures[-self.limits[key[0]]] + self.window_seconds - now
+
+    def _sweep(self, now: float) -> None:
+        for key in [k for k, f in self._failures.items() if not f or now - f[-1] >= self.window_seconds]:
+            del self._failures[key]
+
+
+_password_service: PasswordService | None = None
+_login_throttle: LoginThrottle | None = None
+
+
+def get_password_service() -> PasswordService:
+    global _password_service
+    if _password_service is None:
+        cfg = get_settings()
+        _password_service = PasswordService(cfg.password_hash_workers, cfg.password_hash_max_queue)
+    return _password_service
+
+
+def get_login_throttle() -> LoginThrottle:
+    global _login_throttle
+    if _login_throttle is None:
+        cfg = get_settings()
+        _login_throttle = LoginThrottle(
+            cfg.login_max_failures_per_account,
+            cfg.login_max_failures_per_ip,
+            cfg.login_failure_window,
+            cfg.login_max_failures_per_account_global,
+        )
+    return _login_throttle
 
 
 def _expiry(minutes: int) -> datetime:
@@ -46,18 +277,102 @@ def create_access_token(user_id: int, is_admin: bool) -> str:
     return jwt.encode(payload, cfg.jwt_secret, algorithm=cfg.jwt_algorithm)
 
 
+class TokenCache:
+    """
+    LRU acotado de JWT ya verificados → payload. Un acierto se sirve sin volver
+    a comprobar la firma mientras el `exp` del propio token no haya pasado, y
+    una entrada caducada se descarta al consultarla. Las claves son el token
+    completo (firma incluida), así que un token alterado nunca acierta.
+    """
+
+    def __init__(self, maxsize: int, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, exp = entry
+            if exp <= self._clock():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+        # Copia: quien lo reciba puede modificarlo sin tocar la entrada cacheada.
+        return dict(payload)
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or self.maxsize <= 0:
+            return  # sin `exp` no sabríamos cuándo deja de ser válido
+        with self._lock:
+            self._entries[token] = (dict(payload), float(exp))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# (secreto, algoritmo) → material de verificación preparado una sola vez y su
+# propia caché: al rotar el secreto no se sirve nada verificado con el anterior.
+_verifiers: dict[tuple[str, str], tuple[bytes, list[str], TokenCache]] = {}
+
+
+def _verifier(secret: str, algorithm: str) -> tuple[bytes, list[str], TokenCache]:
+    verifier = _verifiers.get((secret, algorithm))
+    if verifier is None:
+        verifier = (secret.encode(), [algorithm], TokenCache(get_settings().jwt_cache_size))
+        _verifiers.clear()
+        _verifiers[(secret, algorithm)] = verifier
+    return verifier
+
+
 def decode_token(token: str, secret: str | None = None) -> dict | None:
     """
     Decodifica un JWT. Si se pasa `secret`, se usa ese en lugar del de configuración.
-    - Si está expirado → propaga jwt.ExpiredSignatureError
-    - Si falla por otro motivo → devuelve None
+    - Si está expirado o falla por otro motivo → devuelve None
+    Con el secreto de configuración, los tokens ya verificados salen de `TokenCache`.
     """
     cfg = get_settings()
+    if secret is not None:
+        try:
+            return jwt.decode(token, secret, algorithms=[cfg.jwt_algorithm])
+        except jwt.PyJWTError:
+            return None
 
+    key, algorithms, cache = _verifier(cfg.jwt_secret, cfg.jwt_algorithm)
+    payload = cache.get(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, cfg.jwt_secret, algorithms=[cfg.jwt_algorithm])
+        payload = jwt.decode(token, key, algorithms=algorithms)
     except jwt.PyJWTError:
         return None
+    cache.put(token, payload)
+    return payload
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    SHA-256 en hexadecimal (64 caracteres) del refresh token: es lo único que
+    se guarda en BBDD. El token tiene 256 bits aleatorios, así que no hace falta
+    sal ni un hash lento.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 def create_refresh_token() -> str:
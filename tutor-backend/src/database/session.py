@@ -1,8 +1,10 @@
 """Gestión de la sesión de SQLAlchemy para FastAPI."""
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from src.core.config import get_settings
@@ -27,6 +29,32 @@ def get_engine(db_url: str | None = None, pool_size: int | None = None):
     return create_engine(url, pool_size=size, echo=False, future=True)
 
 
+def get_async_url(db_url: str | None = None) -> str:
+    """
+    Traduce la URL síncrona de PostgreSQL (psycopg/psycopg2) al driver `asyncpg`.
+    Otras bases de datos se devuelven tal cual.
+    """
+    url = make_url(str(db_url or _settings.database_url))
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine(db_url: str | None = None, pool_size: int | None = None) -> AsyncEngine:
+    """
+    Crea el motor asíncrono de SQLAlchemy (asyncpg) para las rutas `async def`.
+
+    Args:
+        db_url: URL de la base de datos; por defecto la del .env.
+        pool_size: Tamaño del pool; por defecto el configurado.
+
+    Returns:
+        sqlalchemy.ext.asyncio.AsyncEngine
+    """
+    size = pool_size or _settings.pool_size
+    return create_async_engine(get_async_url(db_url), pool_size=size, echo=False)
+
+
 SessionLocal = sessionmaker(
     bind=get_engine(),
     autocommit=False,
@@ -34,6 +62,14 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+async_engine = get_async_engine()
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Dependencia para FastAPI
 # ────────────────────────────────────────────────────────────────────────────────
@@ -48,3 +84,17 @@ def get_db() -> Generator[Session, None, None]:
         raise
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Versión asíncrona de `get_db` para rutas `async def`: las consultas se
+    esperan con `await` y no bloquean el event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
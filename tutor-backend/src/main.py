@@ -20,11 +20,17 @@ import httpx
 from src.api.dependencies.settings import get_settings, Settings
 from src.core.logging      import setup_logging
 from src.core.security     import hash_password
+from src.api.middlewares.request_id import RequestIDMiddleware
 from src.api.routes        import api_router
+from src.api.routes.metrics import router as metrics_router
 from src.database.base     import Base
-from src.database.session  import SessionLocal, get_engine
+from src.database.session  import SessionLocal, async_engine, get_engine
 from src.models.user       import User
+from src.utils.admission import Priority
 from src.utils.ollama_client import ollama_client, OllamaNotAvailableError
+from src.services.exercise_pool import exercise_pool_worker
+from src.services.token_service import refresh_token_sweeper
+from src.services.cache_invalidation import invalidation_bus
 
 
 APP_ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -147,11 +153,48 @@ async def lifespan(app: FastAPI, settings_obj: Settings):
     logger.info("Creando tarea en segundo plano para el calentamiento de Ollama.")
     asyncio.create_task(_ollama_warmup_task(settings_obj))
 
+    probe_task = None
+    if ollama_client.is_configured:
+        probe_task = asyncio.create_task(ollama_client.run_health_probe(settings_obj.ollama_health_probe_interval))
+
+    pool_task = None
+    if settings_obj.exercise_pool_enabled:
+        logger.info("Creando tarea en segundo plano para el pool de ejercicios.")
+        pool_task = asyncio.create_task(exercise_pool_worker(settings_obj))
+
+    sweeper_task = asyncio.create_task(refresh_token_sweeper(settings_obj))
+    invalidation_task = asyncio.create_task(invalidation_bus.run(settings_obj))
+
     yield
 
     logger.info("Apagando aplicación...")
+    invalidation_task.cancel()
+    try:
+        await invalidation_task
+    except asyncio.CancelledError:
+        pass
+    sweeper_task.cancel()
+    try:
+        await sweeper_task
+    except asyncio.CancelledError:
+        pass
+    if pool_task:
+        pool_task.cancel()
+        try:
+            await pool_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Worker del pool de ejercicios detenido.")
+    if probe_task:
+        probe_task.cancel()
+        try:
+            await probe_task
+        except asyncio.CancelledError:
+            pass
     await ollama_client.close()
     logger.info("Cliente Ollama cerrado.")
+    await async_engine.dispose()
+    logger.info("Motor asíncrono de base de datos cerrado.")
 
 
 async def _ollama_warmup_task(settings: Settings):
@@ -167,8 +210,6 @@ async def _ollama_warmup_task(settings: Settings):
     for attempt in range(1, max_retries + 1):
         logger.info(f"Intento de calentamiento de Ollama (background) {attempt}/{max_retries}...")
         try:
-            ollama_client.is_enabled = True
-            
             available = await ollama_client.check_availability()
             if available:
                 logger.info("Ollama service check OK (background). Procediendo a generar ejercicio de prueba.")
@@ -183,7 +224,7 @@ async def _ollama_warmup_task(settings: Settings):
                 }
                 
                 logger.debug("Payload de calentamiento para Ollama (background):", payload=warmup_payload)
-                response_data = await ollama_client.generate_chat_completion(payload=warmup_payload)
+                response_data = await ollama_client.generate_chat_completion(payload=warmup_payload, priority=Priority.BACKGROUND)
                 logger.info("Respuesta del ejercicio de prueba de calentamiento de Ollama recibida (background).")
                 logger.debug("Respuesta completa de Ollama (background):", response_data=response_data)
 
@@ -223,9 +264,15 @@ async def _ollama_warmup_task(settings: Settings):
 
 
 def create_app() -> FastAPI:
-    setup_logging()
-    logger.info("Logging configurado.")
     settings = get_settings()
+    setup_logging(
+        settings.log_level,
+        use_queue=settings.log_queue_enabled,
+        queue_size=settings.log_queue_size,
+        sample_rates=settings.log_sample_rates,
+        max_field_length=settings.log_max_field_length,
+    )
+    logger.info("Logging configurado.")
     logger.info("Configuración cargada.", settings=settings)
 
     app = FastAPI(
@@ -238,10 +285,16 @@ def create_app() -> FastAPI:
     _configure_cors(app, settings)
     logger.info("CORS configurado.")
 
+    # El último en añadirse es el más externo: así mide también CORS.
+    app.add_middleware(RequestIDMiddleware)
+
     # Rutas ------------------------------------------------------------------
     app.include_router(api_router, prefix="/api")
     logger.info("Rutas de API incluidas con prefijo /api.")
 
+    if settings.metrics_enabled:
+        app.include_router(metrics_router, tags=["health"])
+
     @app.get("/", tags=["health"])
     def health():
         logger.debug("Health check endpoint llamado.")
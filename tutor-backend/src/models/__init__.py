@@ -7,6 +7,8 @@ from src.models.subject import Subject
 from src.models.theme import Theme
 from src.models.exercise import Exercise
 from src.models.user_theme_progress import UserThemeProgress
+from src.models.user_daily_stats import UserDailyStats
 from src.models.user_response import UserResponse
 from src.models.chat import ChatConversation, ChatMessage
+from src.models.cache_version import CacheVersion
 from src.models import associations
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database.base import Base
+
+
+class CacheVersion(Base):
+    """
+    Versión de cada caché en proceso que comparten todos los workers
+    (p. ej. `catalog`). La sube quien modifica los datos; los demás la
+    reciben por LISTEN/NOTIFY o la leen periódicamente. Ver
+    `src.services.cache_invalidation`.
+    """
+    __tablename__ = "cache_versions"
+
+    name:       Mapped[str]      = mapped_column(String(64), primary_key=True)
+    version:    Mapped[int]      = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from src.database.base import Base
 
@@ -14,6 +14,11 @@ class ChatConversation(Base):
     exercise = relationship("Exercise")
     messages = relationship("ChatMessage", back_populates="conversation", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Búsqueda de la conversación de un usuario para un ejercicio (más reciente primero).
+        Index("ix_chat_conversations_user_exercise", "user_id", "exercise_id", "created_at"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -24,3 +29,8 @@ class ChatMessage(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     conversation = relationship("ChatConversation", back_populates="messages")
+
+    __table_args__ = (
+        # Historial de una conversación en orden cronológico.
+        Index("ix_chat_messages_conversation_created", "conversation_id", "created_at"),
+    )
@@ -23,11 +23,13 @@ class Course(Base):
         lazy="selectin",
     )
 
-    # Estudiantes con acceso general a este curso
+    # Estudiantes con acceso general a este curso (sólo con carga explícita,
+    # ver `User.courses`)
     students: Mapped[List["User"]] = relationship(
         secondary=user_courses,
         back_populates="courses",
-        lazy="selectin",
+        lazy="raise",
+        passive_deletes=True,
     )
 
     # Estudiantes matriculados en al menos una asignatura de este curso
@@ -35,5 +37,5 @@ class Course(Base):
         secondary=user_enrollments,
         back_populates="enrolled_in_courses",
         viewonly=True,
-        lazy="selectin"
+        lazy="raise",
     )
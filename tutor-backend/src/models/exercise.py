@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database.base import Base
@@ -26,3 +26,6 @@ class Exercise(Base):
 
     theme:       Mapped["Theme"]             = relationship(back_populates="exercises")
     responses:   Mapped[List["UserResponse"]] = relationship(back_populates="exercise", cascade="all, delete-orphan")
+
+    # Ejercicios de un tema, opcionalmente por dificultad (reutilización y pool).
+    __table_args__ = (Index("ix_exercises_theme_difficulty", "theme_id", "difficulty"),)
@@ -23,11 +23,12 @@ class Subject(Base):
         lazy="selectin",
     )
 
-    # Usuarios matriculados en esta asignatura (a través de un curso específico)
+    # Usuarios matriculados en esta asignatura (a través de un curso específico;
+    # sólo con carga explícita, ver `User.courses`)
     enrolled_users: Mapped[List["User"]] = relationship(
         secondary=user_enrollments,
         viewonly=True,
-        lazy="selectin"
+        lazy="raise",
     )
 
     themes: Mapped[List["Theme"]] = relationship(back_populates="subject", cascade="all, delete-orphan")
@@ -3,9 +3,11 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import Boolean, CheckConstraint, DateTime, ForeignKey, String, func
+from sqlalchemy import CHAR, Boolean, CheckConstraint, DateTime, ForeignKey, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.types import TypeDecorator
 
+from src.core.security import hash_refresh_token
 from src.database.base import Base
 from src.models.associations import user_courses, user_enrollments
 
@@ -24,23 +26,28 @@ class User(Base):
     respuestas:      Mapped[List["UserResponse"]]        = relationship(back_populates="user", cascade="all, delete-orphan")
     progress:        Mapped[List["UserThemeProgress"]]   = relationship(cascade="all, delete-orphan")
     
+    # Colecciones que pueden ser enormes: nunca se cargan implícitamente. Quien
+    # las necesite lo pide en la consulta (`joinedload(User.courses)`, ...);
+    # acceder sin cargarlas lanza un error en vez de lanzar otra consulta. Las
+    # filas de las tablas de asociación las borra la BBDD (ON DELETE CASCADE).
     courses: Mapped[List["Course"]] = relationship(
         secondary=user_courses, 
         back_populates="students", 
-        lazy="selectin"
+        lazy="raise",
+        passive_deletes=True,
     )
     
     enrolled_subjects: Mapped[List["Subject"]] = relationship(
         secondary=user_enrollments,
         viewonly=True,
-        lazy="selectin"
+        lazy="raise",
     )
 
     enrolled_in_courses: Mapped[List["Course"]] = relationship(
         secondary=user_enrollments,
         back_populates="enrolled_students",
         viewonly=True,
-        lazy="selectin"
+        lazy="raise",
     )
 
     __table_args__ = (
@@ -64,13 +71,27 @@ class UserProvider(Base):
     )
 
 
+class HashedToken(TypeDecorator):
+    """
+    Columna de ancho fijo con el SHA-256 del token. Todo valor que se escribe o
+    con el que se compara (`filter_by(token=...)`) se hashea al enviarlo a la
+    BBDD, así que se consulta con el token en claro; al leer se obtiene el hash.
+    """
+
+    impl = CHAR(64)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else hash_refresh_token(value)
+
+
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id: Mapped[int]        = mapped_column(primary_key=True)
-    user_id: Mapped[int]   = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    token: Mapped[str]     = mapped_column(String(255), nullable=False, unique=True, index=True)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    user_id: Mapped[int]   = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token: Mapped[str]     = mapped_column(HashedToken, nullable=False, unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     user: Mapped[User] = relationship(back_populates="refresh_tokens")
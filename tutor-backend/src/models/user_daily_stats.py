@@ -0,0 +1,22 @@
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database.base import Base
+
+
+class UserDailyStats(Base):
+    """
+    Agregado diario de `user_responses` por usuario. Se mantiene de forma
+    incremental en `register_user_answer` y se reconstruye con
+    `python -m src.scripts.backfill_stats`.
+    """
+    __tablename__ = "user_daily_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day:     Mapped[date] = mapped_column(Date, primary_key=True)
+
+    total:    Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    correct:  Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    time_sec: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
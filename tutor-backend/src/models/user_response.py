@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Text, UniqueConstraint, func
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database.base import Base
@@ -22,4 +22,9 @@ class UserResponse(Base):
     exercise: Mapped["Exercise"] = relationship(back_populates="responses")
     user:     Mapped["User"]     = relationship(back_populates="respuestas")
 
-    __table_args__ = (UniqueConstraint("user_id", "exercise_id", name="uq_user_exercise"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "exercise_id", name="uq_user_exercise"),
+        # Estadísticas por ventana temporal; en Postgres `correct` va incluido
+        # para que la consulta se resuelva solo con el índice.
+        Index("ix_user_responses_user_created", "user_id", "created_at", postgresql_include=["correct"]),
+    )
@@ -0,0 +1,34 @@
+"""
+Backfill de `user_daily_stats` desde `user_responses`.
+
+    python -m src.scripts.backfill_stats              # todos los usuarios
+    python -m src.scripts.backfill_stats --user-id 7  # solo uno
+
+Es idempotente: borra y recalcula las filas afectadas en una transacción.
+"""
+import argparse
+
+import structlog
+
+from src.core.logging import setup_logging
+from src.database.session import SessionLocal
+from src.services.stats_service import rebuild_daily_stats
+
+logger = structlog.get_logger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstruye las estadísticas diarias por usuario.")
+    parser.add_argument("--user-id", type=int, default=None, help="Limita el backfill a un usuario.")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    with SessionLocal() as db:
+        rows = rebuild_daily_stats(db, args.user_id)
+        db.commit()
+    logger.info("Backfill de estadísticas diarias completado", rows=rows, user_id=args.user_id)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Coste de la autenticación JWT por petición.
+
+    python -m src.scripts.bench_auth                  # 5000 decodificaciones, 3000 peticiones por ruta
+    python -m src.scripts.bench_auth --requests 500
+
+Dos medidas:
+
+* `decode` aislado: `jwt.decode` con la configuración leída en cada llamada
+  (`antes`) frente a `decode_token` con la caché de tokens verificados (`después`).
+* Petición completa contra una app mínima en proceso (ASGI, sin red). `antes`
+  es la dependencia síncrona original (se ejecuta en el threadpool y verifica
+  la firma siempre), declarada en `dependencies=` y como parámetro; `después`
+  es `jwt_required` actual. Las rutas se piden alternándose y a cada mediana se
+  le resta la de la misma ruta sin autenticación: queda el coste de autenticar.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-" + "x" * 32)
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from src.api.dependencies.auth import jwt_required, security
+from src.core.config import get_settings
+from src.core.security import create_access_token, decode_token
+
+
+def _decode_antes(token: str) -> dict | None:
+    cfg = get_settings()
+    try:
+        return jwt.decode(token, cfg.jwt_secret, algorithms=[cfg.jwt_algorithm])
+    except jwt.PyJWTError:
+        return None
+
+
+def _jwt_required_antes(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = _decode_antes(credentials.credentials) if credentials else None
+    if payload is None:
+        raise HTTPException(401, "Invalid or expired token")
+    return payload
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/antes", dependencies=[Depends(_jwt_required_antes)])
+    def antes(payload: dict = Depends(_jwt_required_antes)):
+        return {"user_id": payload["user_id"]}
+
+    @app.get("/despues")
+    def despues(payload: dict = Depends(jwt_required)):
+        return {"user_id": payload["user_id"]}
+
+    @app.get("/sin-auth")
+    def sin_auth():
+        return {"user_id": 1}
+
+    return app
+
+
+def _per_call_us(fn, token: str, n: int) -> float:
+    fn(token)
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(token)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def _requests_us(token: str, n: int) -> dict[str, float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = ("/sin-auth", "/antes", "/despues")
+    samples: dict[str, list[float]] = {path: [] for path in paths}
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(n + 50):
+            for path in paths:
+                start = time.perf_counter()
+                r = await client.get(path, headers=headers)
+                if i >= 50:  # las primeras vueltas son calentamiento
+                    samples[path].append(time.perf_counter() - start)
+                assert r.status_code == 200, r.text
+    base = statistics.median(samples["/sin-auth"])
+    return {
+        "antes": (statistics.median(samples["/antes"]) - base) * 1e6,
+        "después": (statistics.median(samples["/despues"]) - base) * 1e6,
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Mide el coste de la autenticación JWT por petición.")
+    parser.add_argument("--decodes", type=int, default=5000, help="Decodificaciones por escenario.")
+    parser.add_argument("--requests", type=int, default=3000, help="Peticiones por ruta.")
+    args = parser.parse_args(argv)
+
+    token = create_access_token(user_id=1, is_admin=False)
+    decode = {
+        "antes": _per_call_us(_decode_antes, token, args.decodes),
+        "después": _per_call_us(decode_token, token, args.decodes),
+    }
+    requests = asyncio.run(_requests_us(token, args.requests))
+
+    print(f"{'escenario':<10} {'decode µs':>10} {'auth µs/petición':>17}")
+    for name in ("antes", "después"):
+        print(f"{name:<10} {decode[name]:>10.1f} {requests[name]:>17.1f}")
+    return {"decode": decode, "requests": requests}
+
+
+if __name__ == "__main__":
+    main()
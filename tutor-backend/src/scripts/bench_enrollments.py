@@ -0,0 +1,123 @@
+"""
+Coste de marcar `enrolled` al serializar el catálogo completo (`/courses/all`).
+
+    python -m src.scripts.bench_enrollments                       # 500 cursos × 50 asignaturas
+    python -m src.scripts.bench_enrollments --courses 100 --enrolled 0.5
+
+Catálogo sintético en memoria (sin BBDD), serializado con `_course_to_schema`:
+
+* `antes`: las matrículas del usuario como conjunto de tuplas
+  `(subject_id, course_id)` que se recorre entero por cada curso,
+  O(cursos × matrículas).
+* `después`: el índice `course_id → frozenset(subject_id)` que devuelve
+  `user_enrollments_by_course`, construido una vez y consultado en O(1) por curso.
+* `instantánea`: lo que sirve hoy la ruta, `CatalogSnapshot.render_courses`
+  sobre los fragmentos JSON ya serializados, con el mismo índice.
+"""
+import argparse
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("JWT_SECRET", "bench-" + "x" * 32)
+
+from src.api.routes.courses import _course_to_schema, _subject_to_schema
+from src.api.schemas.courses import CourseOut
+from src.services.catalog_service import CatalogSnapshot, CourseEntry, _dumps
+
+
+def _course_to_schema_antes(course, subject_enrollments_for_user: set[tuple[int, int]]) -> CourseOut:
+    enrolled_subject_ids_for_this_course = {
+        s_id for s_id, c_id in subject_enrollments_for_user if c_id == course.id
+    }
+    return CourseOut(
+        id=course.id,
+        title=course.title,
+        description=course.description,
+        subjects=[_subject_to_schema(s, enrolled_subject_ids_for_this_course) for s in course.subjects],
+    )
+
+
+def _catalog(n_courses: int, n_subjects: int, enrolled_ratio: float):
+    courses = []
+    pairs: set[tuple[int, int]] = set()
+    for cid in range(1, n_courses + 1):
+        subjects = []
+        for j in range(n_subjects):
+            sid = cid * n_subjects + j
+            subjects.append(SimpleNamespace(id=sid, name=f"Asignatura {sid}", description="…", themes=[]))
+            if j < n_subjects * enrolled_ratio and cid % 2:  # la mitad de los cursos, parcialmente
+                pairs.add((sid, cid))
+        courses.append(SimpleNamespace(id=cid, title=f"Curso {cid}", description="…", subjects=subjects))
+    return courses, pairs
+
+
+def _index(pairs: set[tuple[int, int]]) -> dict[int, frozenset[int]]:
+    grouped: dict[int, set[int]] = {}
+    for sid, cid in pairs:
+        grouped.setdefault(cid, set()).add(sid)
+    return {cid: frozenset(ids) for cid, ids in grouped.items()}
+
+
+def _snapshot(courses) -> CatalogSnapshot:
+    entries = {}
+    for c in courses:
+        fragments = []
+        for s in c.subjects:
+            base = {"id": s.id, "name": s.name, "description": s.description}
+            fragments.append((s.id, _dumps({**base, "enrolled": False, "themes": []}),
+                              _dumps({**base, "enrolled": True, "themes": []})))
+        head = _dumps({"id": c.id, "title": c.title, "description": c.description})[:-1] + b',"subjects":['
+        entries[c.id] = CourseEntry(id=c.id, head=head, subjects=tuple(fragments))
+    return CatalogSnapshot(version=0, digest="", courses=entries, subjects_body=b"[]", themes_body=b"[]")
+
+
+def _median_ms(fn, repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Mide el marcado de matrículas al serializar el catálogo.")
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=50, help="Asignaturas por curso.")
+    parser.add_argument("--enrolled", type=float, default=0.2,
+                        help="Fracción de asignaturas matriculadas en los cursos del usuario.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    courses, pairs = _catalog(args.courses, args.subjects, args.enrolled)
+    snapshot = _snapshot(courses)
+
+    def antes():
+        return [_course_to_schema_antes(c, pairs) for c in courses]
+
+    def despues():
+        index = _index(pairs)
+        return [_course_to_schema(c, index) for c in courses]
+
+    def instantanea():
+        return snapshot.render_courses(snapshot.courses, _index(pairs))
+
+    assert [c.model_dump() for c in antes()] == [c.model_dump() for c in despues()]
+    results = {
+        "antes": _median_ms(antes, args.repeat),
+        "después": _median_ms(despues, args.repeat),
+        "instantánea": _median_ms(instantanea, args.repeat),
+    }
+
+    print(f"{args.courses} cursos × {args.subjects} asignaturas, {len(pairs)} matrículas")
+    print(f"{'escenario':<12} {'ms/petición':>12}")
+    for name, ms in results.items():
+        print(f"{name:<12} {ms:>12.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
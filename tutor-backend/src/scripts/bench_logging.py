@@ -0,0 +1,127 @@
+"""
+Coste del logging por petición, antes y después de la cadena optimizada.
+
+    python -m src.scripts.bench_logging                 # 2000 peticiones
+    python -m src.scripts.bench_logging --requests 500
+
+Cada "petición" emite los eventos de un turno de chat típico: el payload
+completo que se manda a Ollama, la línea de éxito del cliente, los tiempos del
+turno, un log de stdlib de la ruta y un par de DEBUG que el nivel descarta.
+Sólo se mide el tiempo en el hilo que atiende la petición. La salida va a
+`os.devnull`, así que en producción (stdout a un pipe) la diferencia es mayor.
+
+* `antes`   – `StreamHandler` síncrono + `JSONRenderer` con `json`, sin muestreo ni recorte.
+* `después` – `setup_logging` con cola, serializador rápido, muestreo y recorte.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+import structlog
+
+from src.core.logging import LOG_FORMAT, json_dumps, orjson, setup_logging, stop_logging
+
+SAMPLE_RATES = {"Payload a enviar a Ollama": 0.1}
+
+
+def _payload() -> dict:
+    system = "Contexto del Ejercicio (ID: 42):\nEnunciado: " + "Resuelve la ecuación paso a paso. " * 60
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "Explícame el siguiente paso, por favor. " * 25}
+        for i in range(6)
+    ]
+    return {"model": "profesor", "messages": [{"role": "system", "content": system}] + history, "temperature": 0.7}
+
+
+def _one_request(slog, stdlib_log, payload: dict) -> None:
+    stdlib_log.info("Procesando mensaje del usuario")
+    slog.debug("Attempting OpenAI-compatible chat completion with Open WebUI", url="http://gpu1/api/chat/completions")
+    slog.info("Payload a enviar a Ollama", ollama_payload_to_send=payload)
+    slog.info(
+        "OpenAI-compatible chat completion successful via Open WebUI",
+        status=200, url="http://gpu1/api/chat/completions", attempt=1, model="profesor",
+        retries=0, duration=1.234, prompt_tokens=812, completion_tokens=164,
+    )
+    slog.debug("Precisión P1", precision=87.5, user_id=7)
+    slog.info(
+        "Chat turn timings", request_id="5d0c1f9e-8a3b-4c8e-9f0a-1b2c3d4e5f60", conversation_id=99,
+        ai_ok=True, stages={"chat_prepare": 0.0123, "llm_queue": 0.0, "llm_generate": 1.234, "chat_save": 0.0041},
+    )
+
+
+def _configure_before() -> None:
+    stop_logging()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=[logging.StreamHandler(sys.stdout)], force=True)
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+        logger_factory=structlog.PrintLoggerFactory(),
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.TimeStamper(fmt="ISO"),
+            structlog.processors.add_log_level,
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(serializer=json.dumps),
+        ],
+    )
+
+
+def _configure_after() -> None:
+    setup_logging("INFO", use_queue=True, sample_rates=SAMPLE_RATES, max_field_length=2000)
+
+
+def _measure(configure, requests: int) -> tuple[list[float], float]:
+    payload = _payload()
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        configure()
+        slog = structlog.get_logger("bench")
+        stdlib_log = logging.getLogger("bench.route")
+        for _ in range(50):  # calentamiento
+            _one_request(slog, stdlib_log, payload)
+
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            _one_request(slog, stdlib_log, payload)
+            samples.append(time.perf_counter() - start)
+
+        drain_start = time.perf_counter()
+        stop_logging()
+        drain = time.perf_counter() - drain_start
+    return samples, drain
+
+
+def _summary(samples: list[float]) -> tuple[float, float]:
+    ordered = sorted(samples)
+    return statistics.fmean(ordered) * 1e6, ordered[int(len(ordered) * 0.99) - 1] * 1e6
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Mide el coste del logging por petición.")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones simuladas por escenario.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, configure in (("antes", _configure_before), ("después", _configure_after)):
+        samples, drain = _measure(configure, args.requests)
+        results[name] = (*_summary(samples), drain)
+
+    print(f"serializador rápido: {'orjson' if orjson else 'json (orjson no instalado)'}; "
+          f"tamaño de una línea de payload: {len(json_dumps(_payload()))} bytes")
+    print(f"{'escenario':<10} {'media µs/pet.':>14} {'p99 µs/pet.':>12} {'vaciado cola s':>15}")
+    for name, (mean, p99, drain) in results.items():
+        print(f"{name:<10} {mean:>14.1f} {p99:>12.1f} {drain:>15.3f}")
+    before, after = results["antes"][0], results["después"][0]
+    print(f"reducción media: {100 * (1 - after / before):.0f}%")
+
+    setup_logging()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Latencia de verificación de contraseñas por esquema y coste, en esta máquina.
+
+    python -m src.scripts.bench_passwords                    # objetivo 250 ms
+    python -m src.scripts.bench_passwords --target-ms 150 --samples 10
+
+Para cada candidato (bcrypt con varios `rounds`, argon2id con varias
+combinaciones de memoria/iteraciones si argon2-cffi está instalado) mide la
+mediana y el máximo de `verify` sobre un hash ya creado, que es lo que paga
+cada login. Recomienda, por esquema, el coste más alto cuya mediana no supera
+el objetivo; los valores se llevan a `BCRYPT_ROUNDS` o a
+`ARGON2_TIME_COST`/`ARGON2_MEMORY_COST`/`ARGON2_PARALLELISM`.
+
+Conviene ejecutarlo en la máquina de despliegue, con la carga habitual, y
+recordar que `PASSWORD_HASH_WORKERS` logins se verifican en paralelo.
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import argon2, bcrypt
+
+from src.core.security import argon2_available
+
+BCRYPT_ROUNDS = (10, 11, 12, 13, 14)
+# (time_cost, memory_cost KiB, parallelism): de las recomendaciones de OWASP a RFC 9106.
+ARGON2_PARAMS = ((3, 12288, 1), (2, 19456, 1), (2, 47104, 1), (3, 65536, 1), (3, 65536, 4))
+
+
+def _candidates() -> list[tuple[str, str, object]]:
+    candidates = [("bcrypt", f"rounds={r}", bcrypt.using(rounds=r)) for r in BCRYPT_ROUNDS]
+    if argon2_available():
+        candidates += [
+            ("argon2", f"t={t} m={m} p={p}", argon2.using(type="ID", time_cost=t, memory_cost=m, parallelism=p))
+            for t, m, p in ARGON2_PARAMS
+        ]
+    return candidates
+
+
+def _verify_times(handler, samples: int) -> list[float]:
+    password = "Contraseña-de-prueba-123"
+    hashed = handler.hash(password)
+    handler.verify(password, hashed)  # calentamiento
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.verify(password, hashed)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Mide la latencia de verificación de contraseñas.")
+    parser.add_argument("--target-ms", type=float, default=250, help="Latencia de verificación objetivo.")
+    parser.add_argument("--samples", type=int, default=5, help="Verificaciones por candidato.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'esquema':<8} {'parámetros':<18} {'mediana ms':>11} {'máx. ms':>9}")
+    for scheme, params, handler in _candidates():
+        times = _verify_times(handler, args.samples)
+        median, worst = statistics.median(times) * 1000, max(times) * 1000
+        results[(scheme, params)] = median
+        print(f"{scheme:<8} {params:<18} {median:>11.1f} {worst:>9.1f}")
+
+    if not argon2_available():
+        print("argon2-cffi no está instalado: sólo se ha medido bcrypt.")
+    for scheme in ("bcrypt", "argon2"):
+        # Los candidatos de cada esquema van de menor a mayor coste.
+        fitting = [params for (s, params), ms in results.items() if s == scheme and ms <= args.target_ms]
+        if fitting:
+            print(f"recomendado {scheme} (≤ {args.target_ms:g} ms): {fitting[-1]}")
+        elif any(s == scheme for s, _ in results):
+            print(f"ningún candidato de {scheme} cumple {args.target_ms:g} ms")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Invalidación de cachés en proceso entre workers y pods.
+
+Cada caché compartida tiene un nombre (`catalog`, ...) y un contador en la
+tabla `cache_versions`. Quien modifica los datos llama a
+`invalidation_bus.publish(db, nombre)`, que, en una transacción corta:
+
+1. sube el contador y
+2. en PostgreSQL, emite `NOTIFY` por `CHANNEL` con `nombre:versión`
+   (se entrega al hacer commit, nunca antes de que los datos sean visibles).
+
+Cada worker ejecuta `invalidation_bus.run()` desde `lifespan`: escucha el canal
+con una conexión asyncpg propia y, como red de seguridad, relee los contadores
+cada `cache_poll_safety_interval` segundos. Si no puede escuchar (otra BBDD, un
+pgbouncer en modo transacción, la conexión se ha caído), relee cada
+`cache_poll_interval` segundos y vuelve a intentar el LISTEN más tarde.
+
+Cuando la versión de un nombre cambia respecto a la última vista, se llama a
+las funciones suscritas con `subscribe(nombre, callback)`.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable
+
+import structlog
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from src.core.config import Settings
+from src.database.session import AsyncSessionLocal
+from src.models import CacheVersion
+
+try:
+    import asyncpg
+except ImportError:  # sin asyncpg sólo queda el sondeo periódico
+    asyncpg = None
+
+CHANNEL = "tutor_cache_invalidation"
+LISTEN_RETRY_SECONDS = 60
+
+logger = structlog.get_logger(__name__)
+
+
+def listen_dsn(database_url: str) -> str | None:
+    """DSN para asyncpg si la BBDD es PostgreSQL; `None` en otro caso."""
+    url = make_url(str(database_url))
+    if url.get_backend_name() != "postgresql":
+        return None
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class InvalidationBus:
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self._subscribers: dict[str, list[Callable[[int], None]]] = {}
+        self._seen: dict[str, int] = {}
+        self.listening = False
+
+    def subscribe(self, name: str, callback: Callable[[int], None]) -> None:
+        self._subscribers.setdefault(name, []).append(callback)
+
+    def apply(self, name: str, version: int) -> bool:
+        """Avisa a los suscriptores si `version` no es la última vista para `name`."""
+        if self._seen.get(name) == version:
+            return False
+        self._fire(name, version)
+        return True
+
+    def _fire(self, name: str, version: int) -> None:
+        self._seen[name] = version
+        for callback in self._subscribers.get(name, []):
+            callback(version)
+
+    def reset(self) -> None:
+        self._seen.clear()
+
+    def publish(self, db: Session, name: str) -> int:
+        """Sube la versión de `name`, la notifica a los demás workers y la aplica en este."""
+        bumped = db.execute(
+            update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        )
+        if bumped.rowcount == 0:
+            db.execute(insert(CacheVersion).values(name=name, version=1))
+        version = db.scalar(select(CacheVersion.version).where(CacheVersion.name == name))
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(select(func.pg_notify(self.channel, f"{name}:{version}")))
+        db.commit()
+        self._fire(name, version)  # en este worker siempre, aunque la versión coincida con la vista
+        logger.debug("Versión de caché publicada", cache=name, version=version)
+        return version
+
+    async def poll_once(self, session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal) -> int:
+        """Lee todos los contadores y aplica los que han cambiado. Devuelve cuántos."""
+        async with session_factory() as db:
+            rows = (await db.execute(select(CacheVersion.name, CacheVersion.version))).all()
+        return sum(self.apply(name, version) for name, version in rows)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        name, _, version = payload.rpartition(":")
+        try:
+            self.apply(name, int(version))
+        except ValueError:
+            logger.warn("Notificación de caché con formato inválido", payload=payload)
+
+    async def _listen(self, dsn: str | None):
+        if dsn is None or asyncpg is None:
+            return None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(self.channel, self._on_notify)
+        except Exception as e:
+            logger.warn("No se pudo escuchar el canal de invalidación; se usará sondeo", error=str(e))
+            return None
+        logger.info("Escuchando invalidaciones de caché", channel=self.channel)
+        return connection
+
+    async def run(
+        self,
+        settings: Settings,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ) -> None:
+        """Tarea en segundo plano: LISTEN con sondeo de respaldo, hasta que se cancela."""
+        dsn = listen_dsn(settings.database_url)
+        connection = None
+        next_listen_attempt = 0.0
+        try:
+            while True:
+                if (connection is None or connection.is_closed()) and time.monotonic() >= next_listen_attempt:
+                    connection = await self._listen(dsn)
+                    next_listen_attempt = time.monotonic() + LISTEN_RETRY_SECONDS
+                self.listening = connection is not None and not connection.is_closed()
+                try:
+                    await self.poll_once(session_factory)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error("Error leyendo versiones de caché", error=str(e), exc_info=True)
+                await asyncio.sleep(
+                    settings.cache_poll_safety_interval if self.listening else settings.cache_poll_interval
+                )
+        finally:
+            self.listening = False
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+
+invalidation_bus = InvalidationBus()
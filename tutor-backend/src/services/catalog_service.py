@@ -0,0 +1,232 @@
+"""
+Catálogo materializado: cursos → asignaturas → temas.
+
+El catálogo sólo cambia cuando un administrador lo edita, así que no se
+reconstruye en cada petición. `catalog_cache` guarda una instantánea por
+versión con los cuerpos JSON ya serializados; cada escritura de administración
+llama a `invalidate_catalog(db)` tras su commit, que publica la nueva versión
+en `cache_versions` para que todos los workers (éste incluido) descarten su
+instantánea, y la siguiente lectura la reconstruye con cuatro consultas planas,
+sin cargar el grafo ORM.
+
+Lo único que depende del usuario es el flag `enrolled` de cada asignatura:
+cada asignatura se serializa dos veces (matriculado / no matriculado) y la
+respuesta se compone concatenando fragmentos según las matrículas del usuario,
+que se leen con una sola consulta a `user_enrollments`.
+
+Las respuestas llevan un `ETag` derivado del contenido (no del número de
+versión, que se reinicia con el proceso), y con `If-None-Match` se devuelve
+304 sin cuerpo.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import structlog
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import Course, Subject, Theme
+from src.models.associations import course_subjects, user_courses, user_enrollments
+from src.services.cache_invalidation import invalidation_bus
+
+logger = structlog.get_logger(__name__)
+
+# `course_id → {subject_id}` con las matrículas de un usuario: se construye una vez
+# por petición y cada curso consulta el suyo en O(1).
+EnrollmentIndex = dict[int, frozenset[int]]
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _digest(*parts: bytes) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class CourseEntry:
+    id: int
+    head: bytes
+    # (subject_id, fragmento con enrolled=false, fragmento con enrolled=true)
+    subjects: tuple[tuple[int, bytes, bytes], ...]
+
+    def render(self, enrolled_subject_ids: frozenset[int] = frozenset()) -> bytes:
+        parts = [on if sid in enrolled_subject_ids else off for sid, off, on in self.subjects]
+        return self.head + b",".join(parts) + b"]}"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    digest: str
+    courses: dict[int, CourseEntry]
+    subjects_body: bytes
+    themes_body: bytes
+
+    def render_courses(self, course_ids: Iterable[int], enrollments: EnrollmentIndex) -> bytes:
+        empty: frozenset[int] = frozenset()
+        bodies = [self.courses[cid].render(enrollments.get(cid, empty)) for cid in course_ids]
+        return b"[" + b",".join(bodies) + b"]"
+
+
+def build_snapshot(db: Session, version: int) -> CatalogSnapshot:
+    courses = db.execute(select(Course.id, Course.title, Course.description).order_by(Course.id)).all()
+    links = db.execute(
+        select(course_subjects.c.course_id, course_subjects.c.subject_id)
+        .order_by(course_subjects.c.course_id, course_subjects.c.subject_id)
+    ).all()
+    subjects = db.execute(select(Subject.id, Subject.name, Subject.description).order_by(Subject.id)).all()
+    themes = db.execute(
+        select(Theme.id, Theme.name, Theme.description, Theme.subject_id).order_by(Theme.id)
+    ).all()
+
+    themes_by_subject: dict[int, list] = {}
+    for t in themes:
+        if t.subject_id is not None:
+            themes_by_subject.setdefault(t.subject_id, []).append(t)
+
+    subject_fragments: dict[int, tuple[bytes, bytes]] = {}
+    subjects_list = []
+    for s in subjects:
+        subject_themes = themes_by_subject.get(s.id, [])
+        base = {"id": s.id, "name": s.name, "description": s.description}
+        course_themes = [
+            {"id": t.id, "title": t.name, "description": t.description, "subject_id": t.subject_id}
+            for t in subject_themes
+        ]
+        subject_fragments[s.id] = (
+            _dumps({**base, "enrolled": False, "themes": course_themes}),
+            _dumps({**base, "enrolled": True, "themes": course_themes}),
+        )
+        subjects_list.append(
+            {**base, "themes": [{"id": t.id, "title": t.name, "description": t.description} for t in subject_themes]}
+        )
+
+    subjects_by_course: dict[int, list[int]] = {}
+    for course_id, subject_id in links:
+        subjects_by_course.setdefault(course_id, []).append(subject_id)
+
+    entries = {}
+    for c in courses:
+        head = _dumps({"id": c.id, "title": c.title, "description": c.description})[:-1] + b',"subjects":['
+        entries[c.id] = CourseEntry(
+            id=c.id,
+            head=head,
+            subjects=tuple((sid, *subject_fragments[sid]) for sid in subjects_by_course.get(c.id, [])),
+        )
+
+    subjects_body = _dumps(subjects_list)
+    themes_body = _dumps([
+        {"id": t.id, "title": t.name, "description": t.description, "subject_id": t.subject_id} for t in themes
+    ])
+    all_courses = b",".join(entry.render() for entry in entries.values())
+    return CatalogSnapshot(
+        version=version,
+        digest=_digest(all_courses, subjects_body, themes_body),
+        courses=entries,
+        subjects_body=subjects_body,
+        themes_body=themes_body,
+    )
+
+
+class CatalogCache:
+    """
+    Instantánea del catálogo por proceso. `invalidate()` sube la versión; la
+    siguiente lectura reconstruye una sola vez (las demás esperan al lock y
+    reutilizan el resultado). La versión se toma antes de consultar, de modo
+    que una instantánea construida durante una escritura queda ya obsoleta.
+    """
+
+    def __init__(self, builder: Callable[[Session, int], CatalogSnapshot] = build_snapshot):
+        self._builder = builder
+        self._version = 0
+        self._snapshot: CatalogSnapshot | None = None
+        self._build_lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self.rebuilds = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self._version:
+                return snapshot
+            version = self._version
+            snapshot = self._builder(db, version)
+            self._snapshot = snapshot
+            self.rebuilds += 1
+        logger.info("Catálogo reconstruido", version=version, courses=len(snapshot.courses))
+        return snapshot
+
+    def invalidate(self) -> None:
+        with self._version_lock:
+            self._version += 1
+
+    def clear(self) -> None:
+        self.invalidate()
+        self._snapshot = None
+
+
+catalog_cache = CatalogCache()
+invalidation_bus.subscribe("catalog", lambda version: catalog_cache.invalidate())
+
+
+def invalidate_catalog(db: Session) -> None:
+    """Tras el commit de una escritura del catálogo: lo invalida en todos los workers."""
+    invalidation_bus.publish(db, "catalog")
+
+
+def user_enrollments_by_course(db: Session, user_id: int) -> EnrollmentIndex:
+    """`course_id → {subject_id}` de las matrículas del usuario, en una consulta."""
+    grouped: dict[int, set[int]] = {}
+    rows = db.execute(
+        select(user_enrollments.c.course_id, user_enrollments.c.subject_id)
+        .where(user_enrollments.c.user_id == user_id)
+    )
+    for course_id, subject_id in rows:
+        grouped.setdefault(course_id, set()).add(subject_id)
+    return {course_id: frozenset(ids) for course_id, ids in grouped.items()}
+
+
+def user_course_ids(db: Session, user_id: int) -> set[int]:
+    return set(db.scalars(select(user_courses.c.course_id).where(user_courses.c.user_id == user_id)))
+
+
+def enrollment_etag(snapshot: CatalogSnapshot, view: str, enrollments: EnrollmentIndex, *extra) -> str:
+    key = repr((view, sorted((cid, sorted(sids)) for cid, sids in enrollments.items()), extra))
+    return f'"{_digest(snapshot.digest.encode(), key.encode())}"'
+
+
+def public_etag(snapshot: CatalogSnapshot, view: str) -> str:
+    return f'"{_digest(snapshot.digest.encode(), view.encode())}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def json_response(request: Request, etag: str, render: Callable[[], bytes]) -> Response:
+    """Cuerpo JSON ya serializado con `ETag`; 304 sin cuerpo si el cliente ya lo tiene."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=render(), media_type="application/json", headers=headers)
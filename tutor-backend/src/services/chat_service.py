@@ -1,10 +1,16 @@
-from sqlalchemy.orm import Session
+from typing import AsyncIterator
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from src.models.chat import ChatConversation, ChatMessage
 from src.models.user import User
 from src.models.exercise import Exercise
-from src.api.schemas.chat import ChatMessageCreate, UserMessageInput 
-from src.utils.ollama_client import generate_with_ollama, OllamaNotAvailableError, ollama_client as global_ollama_client
+from src.api.schemas.chat import ChatMessageCreate, ChatMessageResponse, UserMessageInput 
+from src.utils.admission import Priority
+from src.utils.metrics import request_timings, timed_stage
+from src.utils.ollama_client import generate_with_ollama, stream_with_ollama, OllamaNotAvailableError, ollama_client as global_ollama_client
 from fastapi import Request, HTTPException
 import structlog
 
@@ -14,28 +20,32 @@ from src.core.config import get_settings
 settings = get_settings()
 logger = structlog.get_logger(__name__)
 
-async def get_or_create_conversation(db: Session, user_id: int, exercise_id: int) -> ChatConversation:
+AI_UNAVAILABLE_MESSAGE = "Lo siento, no puedo generar una respuesta en este momento. El servicio de IA no está disponible."
+
+async def get_or_create_conversation(db: AsyncSession, user_id: int, exercise_id: int) -> ChatConversation:
     """
     Retrieves an existing chat conversation or creates a new one
     if it doesn't exist.
     """
-    conversation = db.query(ChatConversation).filter_by(user_id=user_id, exercise_id=exercise_id).first()
+    conversation = (await db.execute(
+        select(ChatConversation).filter_by(user_id=user_id, exercise_id=exercise_id)
+    )).scalars().first()
     if not conversation:
-        user = db.query(User).get(user_id)
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        exercise = db.query(Exercise).get(exercise_id)
+        exercise = await db.get(Exercise, exercise_id)
         if not exercise:
             raise HTTPException(status_code=404, detail="Exercise not found")
 
         conversation = ChatConversation(user_id=user_id, exercise_id=exercise_id)
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        await db.commit()
+        await db.refresh(conversation)
     return conversation
 
 async def add_message_to_conversation(
-    db: Session, 
+    db: AsyncSession, 
     conversation_id: int,
     sender_type: str, 
     message_text: str
@@ -49,26 +59,37 @@ async def add_message_to_conversation(
         message=message_text
     )
     db.add(chat_message)
-    db.commit()
-    db.refresh(chat_message)
+    await db.commit()
+    await db.refresh(chat_message)
     return chat_message
 
-async def process_user_message(
-    db: Session, 
+async def get_recent_messages(db: AsyncSession, conversation_id: int, limit: int) -> list[ChatMessage]:
+    """
+    Returns the last `limit` messages of a conversation in chronological order.
+    Only the window is read (DESC + LIMIT over the conversation index), so the
+    cost does not grow with the length of the conversation.
+    """
+    recent = (await db.execute(
+        select(ChatMessage)
+        .filter(ChatMessage.conversation_id == conversation_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit)
+    )).scalars().all()
+    return list(reversed(recent))
+
+async def prepare_user_turn(
+    db: AsyncSession,
     user_message_input: UserMessageInput,
     user_id: int,
-    request: Request
-) -> tuple[ChatMessage, ChatMessage, ChatConversation]:
+) -> tuple[ChatMessage, ChatConversation, dict]:
     """
-    Processes a user's message:
+    Prepares a chat turn before asking the AI:
     1. Gets or creates a conversation.
     2. Saves the user's message.
-    3. Gets a response from the AI.
-    4. Saves the AI's message.
-    5. Returns both messages and the conversation.
+    3. Builds the Ollama payload (exercise context + history window).
     """
     if user_message_input.conversation_id:
-        conversation = db.query(ChatConversation).get(user_message_input.conversation_id)
+        conversation = await db.get(ChatConversation, user_message_input.conversation_id)
         if not conversation or conversation.user_id != user_id or conversation.exercise_id != user_message_input.exercise_id:
             raise HTTPException(status_code=403, detail="Invalid conversation ID or access denied.")
     else:
@@ -81,19 +102,13 @@ async def process_user_message(
         message_text=user_message_input.message
     )
 
-    exercise = db.query(Exercise).get(conversation.exercise_id)
+    exercise = await db.get(Exercise, conversation.exercise_id)
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found for this conversation.")
 
-    all_messages_in_conversation = db.query(ChatMessage)\
-        .filter(ChatMessage.conversation_id == conversation.id)\
-        .order_by(ChatMessage.created_at.asc())\
-        .all()
+    windowed_messages = await get_recent_messages(db, conversation.id, settings.ollama_history_messages_window)
 
     messages_for_ollama = []
-    start_index = max(0, len(all_messages_in_conversation) - settings.ollama_history_messages_window)
-    windowed_messages = all_messages_in_conversation[start_index:]
-
     for msg in windowed_messages:
         role = msg.sender_type
         if role == "ai": 
@@ -124,13 +139,34 @@ async def process_user_message(
     }
 
     logger.info("Payload a enviar a Ollama", ollama_payload_to_send=ollama_payload)
+    return user_chat_message, conversation, ollama_payload
+
+
+async def process_user_message(
+    db: AsyncSession, 
+    user_message_input: UserMessageInput,
+    user_id: int,
+    request: Request
+) -> tuple[ChatMessage, ChatMessage, ChatConversation]:
+    """
+    Processes a user's message:
+    1. Prepares the turn (conversation + user's message + payload).
+    2. Gets a response from the AI.
+    3. Saves the AI's message.
+    4. Returns both messages and the conversation.
+
+    Each stage's duration (DB, LLM queue, generation) is logged together with
+    the request ID and exported to the `/metrics` histograms.
+    """
+    with timed_stage("chat_prepare"):
+        user_chat_message, conversation, ollama_payload = await prepare_user_turn(db, user_message_input, user_id)
 
-    ai_message_text = "Lo siento, no puedo generar una respuesta en este momento. El servicio de IA no está disponible."
+    ai_message_text = AI_UNAVAILABLE_MESSAGE
     ai_response_successful = False
 
     if global_ollama_client.is_enabled:
         try:
-            ai_response_data = await generate_with_ollama(ollama_payload, request)
+            ai_response_data = await generate_with_ollama(ollama_payload, request, priority=Priority.CHAT)
             
             if not ai_response_data.get("choices") or \
                not isinstance(ai_response_data["choices"], list) or \
@@ -153,34 +189,125 @@ async def process_user_message(
     else:
         logger.warn("Ollama is disabled. Skipping AI response generation.")
 
-    ai_chat_message = await add_message_to_conversation(
-        db,
-        conversation_id=conversation.id,
-        sender_type="ai",
-        message_text=ai_message_text.strip()
+    with timed_stage("chat_save"):
+        ai_chat_message = await add_message_to_conversation(
+            db,
+            conversation_id=conversation.id,
+            sender_type="ai",
+            message_text=ai_message_text.strip()
+        )
+
+    _log_turn_timings(request, conversation.id, ai_response_successful)
+    return user_chat_message, ai_chat_message, conversation
+
+
+def _log_turn_timings(request: Request | None, conversation_id: int, ai_ok: bool) -> None:
+    request_id = getattr(getattr(request, "state", None), "request_id", "n/a")
+    logger.info(
+        "Chat turn timings",
+        request_id=request_id,
+        conversation_id=conversation_id,
+        ai_ok=ai_ok,
+        stages={stage: round(seconds, 4) for stage, seconds in request_timings().items()},
     )
 
-    db.refresh(conversation) 
 
-    return user_chat_message, ai_chat_message, conversation
+async def stream_ai_reply(
+    db: AsyncSession,
+    conversation: ChatConversation,
+    ollama_payload: dict,
+    request: Request | None = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Streams the AI's reply for an already prepared turn as `(event, data)` pairs:
+
+    * `token` – one per text fragment received from Ollama.
+    * `error` – the stream could not be completed (the fallback text is saved).
+    * `done`  – the persisted AI message, once the stream has finished.
+    """
+    parts: list[str] = []
+    error_text: str | None = None
+
+    try:
+        async for delta in stream_with_ollama(ollama_payload, request):
+            parts.append(delta)
+            yield "token", {"content": delta}
+    except OllamaNotAvailableError as e:
+        logger.warn("Ollama not available while streaming AI response.", detail=str(e.detail))
+        error_text = AI_UNAVAILABLE_MESSAGE
+    except Exception as e:
+        logger.error("Unexpected error streaming AI response", error=str(e), exc_info=True)
+        error_text = "Lo siento, ocurrió un error inesperado al intentar obtener una respuesta del asistente de IA."
+
+    ai_message_text = "".join(parts)
+    if error_text is not None:
+        yield "error", {"detail": error_text}
+        if not ai_message_text.strip():
+            ai_message_text = error_text
+    elif not ai_message_text.strip():
+        logger.error("Empty streamed AI response from Ollama.", conversation_id=conversation.id)
+        ai_message_text = "Lo siento, la respuesta del asistente de IA no tuvo el formato esperado. Por favor, inténtalo de nuevo."
 
+    with timed_stage("chat_save"):
+        ai_chat_message = await add_message_to_conversation(
+            db,
+            conversation_id=conversation.id,
+            sender_type="ai",
+            message_text=ai_message_text.strip()
+        )
+    _log_turn_timings(request, conversation.id, error_text is None)
+    yield "done", ChatMessageResponse.model_validate(ai_chat_message).model_dump(mode="json")
 
-async def get_conversation_history(db: Session, conversation_id: int, user_id: int) -> ChatConversation:
+
+async def get_conversation_history(
+    db: AsyncSession,
+    conversation_id: int,
+    user_id: int,
+    before_id: int | None = None,
+    limit: int | None = None,
+) -> tuple[ChatConversation, list[ChatMessage], bool]:
     """
-    Retrieves the full history of a specific conversation for a user.
+    Retrieves a conversation's history for a user, in chronological order.
+
+    Without `limit` the whole history is returned. With it, one page (keyset
+    pagination on `(created_at, id)`, the same order and index as
+    `get_recent_messages`): the `limit` most recent messages older than
+    `before_id`, and whether older ones remain.
     """
-    conversation = db.query(ChatConversation).filter_by(id=conversation_id, user_id=user_id).first()
+    conversation = (await db.execute(
+        select(ChatConversation).filter_by(id=conversation_id, user_id=user_id)
+    )).scalars().first()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found or access denied.")
-    return conversation
 
-async def get_user_conversations_for_exercise(db: Session, user_id: int, exercise_id: int) -> list[ChatConversation]:
+    query = select(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if before_id is not None:
+        cursor = (
+            select(ChatMessage.created_at)
+            .where(ChatMessage.id == before_id, ChatMessage.conversation_id == conversation_id)
+            .scalar_subquery()
+        )
+        query = query.filter(or_(
+            ChatMessage.created_at < cursor,
+            and_(ChatMessage.created_at == cursor, ChatMessage.id < before_id),
+        ))
+    query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    page = (await db.execute(query)).scalars().all()
+
+    has_more = limit is not None and len(page) > limit
+    return conversation, list(reversed(page[:limit])), has_more
+
+async def get_user_conversations_for_exercise(db: AsyncSession, user_id: int, exercise_id: int) -> list[ChatConversation]:
     """
     Retrieves all conversations a user has had for a specific exercise.
     Typically, there should be only one, but this allows for flexibility.
     """
-    conversations = db.query(ChatConversation)\
-        .filter_by(user_id=user_id, exercise_id=exercise_id)\
-        .order_by(ChatConversation.created_at.desc())\
-        .all()
-    return conversations
+    conversations = (await db.execute(
+        select(ChatConversation)
+        .filter_by(user_id=user_id, exercise_id=exercise_id)
+        .options(selectinload(ChatConversation.messages))
+        .order_by(ChatConversation.created_at.desc())
+    )).scalars().all()
+    return list(conversations)
@@ -0,0 +1,120 @@
+"""
+Pool de ejercicios pregenerados.
+
+Un worker en segundo plano (arrancado desde `lifespan`) mantiene, para cada
+(tema, dificultad), al menos `exercise_pool_size` ejercicios que nadie ha
+respondido todavía, generándolos por la misma vía que `/api/ai/request`.
+`GET /api/ai/pool/next` sirve después uno que el usuario no haya respondido
+con una consulta a la BBDD, sin esperar al LLM.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Iterable
+
+import structlog
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import Settings
+from src.database.session import AsyncSessionLocal
+from src.models import Exercise, Theme, UserResponse
+from src.services.exercise_service import create_exercise_from_ai, parse_ai_exercise
+from src.utils.admission import LLMOverloadedError, Priority
+from src.utils.ollama_client import OllamaNotAvailableError, generate_with_ollama
+
+logger = structlog.get_logger(__name__)
+
+
+def build_exercise_request(theme_name: str, difficulty: str, model: str) -> dict:
+    """Misma petición que envía el front (StudyPage) para generar un ejercicio."""
+    return {
+        "model": model,
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {
+                "role": "user",
+                "content": f'Genera un ejercicio sobre "{theme_name}" en dificultad {difficulty}',
+            }
+        ],
+    }
+
+
+async def pool_levels(db: AsyncSession, difficulties: Iterable[str]) -> dict[tuple[int, str], int]:
+    """Cuenta, por (theme_id, dificultad), los ejercicios que nadie ha respondido aún."""
+    answered = exists().where(UserResponse.exercise_id == Exercise.id)
+    rows = (await db.execute(
+        select(Exercise.theme_id, Exercise.difficulty, func.count())
+        .where(~answered)
+        .where(Exercise.difficulty.in_(list(difficulties)))
+        .group_by(Exercise.theme_id, Exercise.difficulty)
+    )).all()
+    return {(theme_id, difficulty): count for theme_id, difficulty, count in rows}
+
+
+async def generate_pool_exercise(db: AsyncSession, theme: Theme, difficulty: str, model: str) -> Exercise:
+    """Genera y guarda un ejercicio para el pool de (theme, difficulty)."""
+    raw = await generate_with_ollama(
+        build_exercise_request(theme.name, difficulty, model), priority=Priority.BACKGROUND
+    )
+    data = parse_ai_exercise(raw)
+    # El modelo puede devolver la dificultad con otra grafía; el pool se indexa por la pedida.
+    data["dificultad"] = difficulty
+    ej = await db.run_sync(lambda sync_db: create_exercise_from_ai(data, theme, sync_db))
+    await db.commit()
+    return ej
+
+
+async def refill_exercise_pool(
+    settings: Settings,
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+) -> int:
+    """
+    Una pasada de reposición del pool. Genera como mucho
+    `exercise_pool_max_per_cycle` ejercicios y devuelve cuántos ha creado.
+    """
+    created = 0
+    async with session_factory() as db:
+        themes = (await db.execute(select(Theme).order_by(Theme.id))).scalars().all()
+        levels = await pool_levels(db, settings.exercise_pool_difficulties)
+
+        for theme in themes:
+            for difficulty in settings.exercise_pool_difficulties:
+                missing = settings.exercise_pool_size - levels.get((theme.id, difficulty), 0)
+                for _ in range(missing):
+                    if created >= settings.exercise_pool_max_per_cycle:
+                        return created
+                    try:
+                        ej = await generate_pool_exercise(db, theme, difficulty, settings.ollama_model)
+                    except (OllamaNotAvailableError, LLMOverloadedError) as e:
+                        logger.warn("Ollama no disponible o saturado, se interrumpe la reposición del pool", detail=e.detail)
+                        return created
+                    except (KeyError, TypeError, ValueError) as e:
+                        await db.rollback()
+                        logger.warn("Respuesta de IA inválida al reponer el pool", theme_id=theme.id, difficulty=difficulty, error=str(e))
+                        break
+                    created += 1
+                    logger.debug("Ejercicio añadido al pool", exercise_id=ej.id, theme_id=theme.id, difficulty=difficulty)
+    return created
+
+
+async def exercise_pool_worker(settings: Settings) -> None:
+    """
+    Tarea en segundo plano: repone el pool cada `exercise_pool_refill_interval`
+    segundos hasta que se cancela al apagar la aplicación.
+    """
+    logger.info(
+        "Worker del pool de ejercicios iniciado",
+        size=settings.exercise_pool_size,
+        difficulties=settings.exercise_pool_difficulties,
+        interval=settings.exercise_pool_refill_interval,
+    )
+    while True:
+        try:
+            created = await refill_exercise_pool(settings)
+            logger.info("Reposición del pool de ejercicios completada", created=created)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error inesperado reponiendo el pool de ejercicios", error=str(e), exc_info=True)
+        await asyncio.sleep(settings.exercise_pool_refill_interval)
@@ -1,11 +1,33 @@
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from src.models.exercise import Exercise
 from src.models.user_response import UserResponse
 from src.models.user_theme_progress import UserThemeProgress
+from src.models.user_daily_stats import UserDailyStats
 from src.utils.utils import strip_and_lower
 
 
+def parse_ai_exercise(raw: dict) -> dict:
+    """
+    Extrae el dict del ejercicio de una respuesta de chat completion de la IA,
+    quitando el bloque ```json``` si el modelo lo ha añadido.
+
+    Propaga KeyError / TypeError / JSONDecodeError si la respuesta no es válida.
+    """
+    content_str = raw["choices"][0]["message"]["content"]
+    if content_str.startswith("```json\n"):
+        content_str = content_str[len("```json\n"):-len("\n```")]
+    elif content_str.startswith("```\n"):
+        content_str = content_str[len("```\n"):-len("\n```")]
+
+    return json.loads(content_str)
+
+
 def create_exercise_from_ai(data: dict, tema, db: Session) -> Exercise:
     """
     Crea un Exercise a partir del dict que viene de la IA, asociándolo al tema dado.
@@ -25,6 +47,30 @@ def create_exercise_from_ai(data: dict, tema, db: Session) -> Exercise:
     return ej
 
 
+def find_unseen_exercise(
+    db: Session,
+    theme_id: int,
+    user_id: int,
+    difficulty: str | None = None,
+    exercise_type: str | None = None,
+) -> Exercise | None:
+    """
+    Devuelve un Exercise ya guardado del tema que el usuario aún no ha
+    respondido (opcionalmente de la dificultad y tipo dados), o None si no hay.
+    """
+    answered = select(UserResponse.exercise_id).where(UserResponse.user_id == user_id)
+    query = (
+        db.query(Exercise)
+        .filter(Exercise.theme_id == theme_id)
+        .filter(Exercise.id.not_in(answered))
+    )
+    if difficulty:
+        query = query.filter(Exercise.difficulty == difficulty)
+    if exercise_type:
+        query = query.filter(Exercise.type == exercise_type)
+    return query.order_by(Exercise.id).first()
+
+
 def register_user_answer(
     user_id: int,
     ej: Exercise,
@@ -34,9 +80,11 @@ def register_user_answer(
 ) -> bool:
     """
     Registra la respuesta de un usuario a un ejercicio, actualiza su progreso
-    y devuelve True/False según si fue correcta.
+    por tema y su agregado diario, y devuelve True/False según si fue correcta.
     """
     correcto = strip_and_lower(answer) == strip_and_lower(ej.answer)
+    # Fijamos la hora aquí para que la fila diaria coincida con `created_at`.
+    answered_at = datetime.now(timezone.utc)
 
     resp = UserResponse(
         user_id      = user_id,
@@ -44,6 +92,7 @@ def register_user_answer(
         answer       = answer,
         correct      = correcto,
         time_sec     = time_sec,
+        created_at   = answered_at,
     )
     db.add(resp)
 
@@ -60,5 +109,35 @@ def register_user_answer(
         prog.completed += 1
         prog.correct   += 1 if correcto else 0
 
+    _increment_daily_stats(db, user_id, answered_at.date(), correcto, time_sec or 0)
+
     # db.commit()
     return correcto
+
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _increment_daily_stats(db: Session, user_id: int, day, correcto: bool, time_sec: int) -> None:
+    """
+    Suma una respuesta al agregado diario con un único
+    `INSERT ... ON CONFLICT (user_id, day) DO UPDATE`: dos respuestas
+    simultáneas del mismo usuario no pueden leer el mismo total ni chocar
+    al crear la fila del día.
+    """
+    insert = _UPSERT_DIALECTS[db.get_bind().dialect.name]
+    stmt = insert(UserDailyStats).values(
+        user_id  = user_id,
+        day      = day,
+        total    = 1,
+        correct  = 1 if correcto else 0,
+        time_sec = time_sec,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+        set_={
+            "total":    UserDailyStats.total + stmt.excluded.total,
+            "correct":  UserDailyStats.correct + stmt.excluded.correct,
+            "time_sec": UserDailyStats.time_sec + stmt.excluded.time_sec,
+        },
+    ))
@@ -1,8 +1,19 @@
-from sqlalchemy import func, case
+from sqlalchemy import func, case, delete, insert, select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 
-from src.models import UserResponse, Exercise, Theme
+from src.models import UserResponse, UserDailyStats, Exercise, Theme
+
+
+def utc_day(column, dialect_name: str):
+    """
+    Día (UTC) de una marca temporal, el mismo que usa `register_user_answer`
+    (`answered_at.date()` en UTC). En PostgreSQL `date()` de un `timestamptz`
+    seguiría la `TimeZone` de la sesión; en SQLite se guarda ya el valor UTC.
+    """
+    if dialect_name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
 
 
 def _correct_expr():
@@ -14,7 +25,7 @@ logger = structlog.get_logger(__name__)
 
 def _calculate_precision_for_period(db: Session, user_id: int, end_time: datetime, start_time: datetime):
     """Calcula el total de respuestas y las correctas para un período dado."""
-    logger.debug("Calculando precisión para período", user_id=user_id, start_time=start_time.isoformat(), end_time=end_time.isoformat())
+    logger.debug("Calculando precisión para período", user_id=user_id, start_time=start_time, end_time=end_time)
     query = (
         db.query(
             func.count().label("total"),
@@ -27,12 +38,12 @@ def _calculate_precision_for_period(db: Session, user_id: int, end_time: datetim
     )
     total = query.total or 0
     correct = query.correct or 0
-    logger.debug("Resultados del período", total=total, correct=correct, user_id=user_id, start_time=start_time.isoformat(), end_time=end_time.isoformat())
+    logger.debug("Resultados del período", total=total, correct=correct, user_id=user_id, start_time=start_time, end_time=end_time)
     if total == 0:
-        logger.debug("Período sin datos", user_id=user_id, start_time=start_time.isoformat(), end_time=end_time.isoformat())
+        logger.debug("Período sin datos", user_id=user_id, start_time=start_time, end_time=end_time)
         return None
     precision = (correct * 100.0 / total)
-    logger.debug("Precisión calculada para el período", precision=precision, user_id=user_id, start_time=start_time.isoformat(), end_time=end_time.isoformat())
+    logger.debug("Precisión calculada para el período", precision=precision, user_id=user_id, start_time=start_time, end_time=end_time)
     return {"total": total, "correct": correct, "precision": precision}
 
 
@@ -43,14 +54,18 @@ def overview(db: Session, user_id: int):
       - correctos: número de respuestas correctas (global)
       - porcentaje: ratio correctos/hechos en % (global)
       - trend24h: diferencia de precisión entre las últimas 24h y las 24h anteriores.
+
+    La tendencia usa ventanas móviles de 24h, que no encajan en días naturales,
+    así que se calcula sobre `user_responses` acotado a las últimas 48h.
     """
     logger.info("Iniciando overview para usuario", user_id=user_id)
+    # Totales globales desde el agregado diario: O(días) en vez de O(respuestas).
     q_global = (
         db.query(
-            func.count().label("total"),
-            _correct_expr(),
+            func.sum(UserDailyStats.total).label("total"),
+            func.sum(UserDailyStats.correct).label("correct"),
         )
-        .filter(UserResponse.user_id == user_id)
+        .filter(UserDailyStats.user_id == user_id)
         .first()
     )
     total_global = q_global.total or 0
@@ -64,9 +79,9 @@ def overview(db: Session, user_id: int):
     end_P0 = start_P1
     start_P0 = start_P1 - timedelta(days=1)
 
-    logger.debug("Calculando estadísticas P1 (últimas 24h)", user_id=user_id, start_time=start_P1.isoformat(), end_time=end_P1.isoformat())
+    logger.debug("Calculando estadísticas P1 (últimas 24h)", user_id=user_id, start_time=start_P1, end_time=end_P1)
     stats_P1 = _calculate_precision_for_period(db, user_id, end_P1, start_P1)
-    logger.debug("Calculando estadísticas P0 (24h anteriores a P1)", user_id=user_id, start_time=start_P0.isoformat(), end_time=end_P0.isoformat())
+    logger.debug("Calculando estadísticas P0 (24h anteriores a P1)", user_id=user_id, start_time=start_P0, end_time=end_P0)
     stats_P0 = _calculate_precision_for_period(db, user_id, end_P0, start_P0)
 
     trend24h = 0.0
@@ -103,13 +118,12 @@ def timeline(db: Session, user_id: int):
     logger.info("Generando timeline para usuario", user_id=user_id)
     rows = (
         db.query(
-            func.date(UserResponse.created_at).label("date"),
-            func.count().label("total"),
-            _correct_expr(),
+            UserDailyStats.day.label("date"),
+            UserDailyStats.total,
+            UserDailyStats.correct,
         )
-        .filter(UserResponse.user_id == user_id)
-        .group_by("date")
-        .order_by("date")
+        .filter(UserDailyStats.user_id == user_id)
+        .order_by(UserDailyStats.day)
         .all()
     )
 
@@ -160,3 +174,36 @@ def by_theme(db: Session, user_id: int):
         }
         for r in rows
     ]
+
+
+def rebuild_daily_stats(db: Session, user_id: int | None = None) -> int:
+    """
+    Reconstruye `user_daily_stats` a partir de `user_responses` (de un usuario
+    o de todos). Sirve de backfill para las respuestas anteriores al agregado.
+    Devuelve el número de filas diarias generadas; no hace commit.
+    """
+    logger.info("Reconstruyendo estadísticas diarias", user_id=user_id)
+    day = utc_day(UserResponse.created_at, db.get_bind().dialect.name)
+    source = (
+        select(
+            UserResponse.user_id,
+            day,
+            func.count(),
+            func.sum(case((UserResponse.correct, 1), else_=0)),
+            func.coalesce(func.sum(UserResponse.time_sec), 0),
+        )
+        .group_by(UserResponse.user_id, day)
+    )
+    wipe = delete(UserDailyStats)
+    if user_id is not None:
+        source = source.where(UserResponse.user_id == user_id)
+        wipe = wipe.where(UserDailyStats.user_id == user_id)
+
+    db.execute(wipe)
+    result = db.execute(
+        insert(UserDailyStats).from_select(
+            ["user_id", "day", "total", "correct", "time_sec"], source
+        )
+    )
+    logger.info("Estadísticas diarias reconstruidas", user_id=user_id, rows=result.rowcount)
+    return result.rowcount
@@ -0,0 +1,99 @@
+"""
+Almacén de refresh tokens.
+
+* En BBDD sólo se guarda el SHA-256 del token (`HashedToken`, ancho fijo e
+  indexado); las consultas se hacen con el token en claro.
+* Cada usuario conserva como mucho `refresh_tokens_per_user` tokens: al emitir
+  uno nuevo se borran los más antiguos y los ya caducados de ese usuario.
+* Un worker en segundo plano (arrancado desde `lifespan`) borra los caducados
+  de todos los usuarios en lotes de `refresh_token_sweep_batch` filas, con un
+  commit por lote para no bloquear la tabla.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import Delete, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from src.core.config import Settings, get_settings
+from src.database.session import AsyncSessionLocal
+from src.models import RefreshToken
+
+logger = structlog.get_logger(__name__)
+
+
+def refresh_token_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=get_settings().jwt_refresh_days)
+
+
+def _prune_user_tokens(user_id: int, keep: int) -> Delete:
+    """Borra los tokens caducados del usuario y los que sobran por encima de los `keep` más recientes."""
+    newest = (
+        select(RefreshToken.id)
+        .where(RefreshToken.user_id == user_id)
+        .order_by(RefreshToken.id.desc())
+        .limit(keep)
+    )
+    return delete(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        or_(RefreshToken.id.not_in(newest), RefreshToken.expires_at < datetime.now(timezone.utc)),
+    )
+
+
+async def store_refresh_token(db: AsyncSession, user_id: int, token: str) -> None:
+    """Guarda `token` para el usuario y aplica el tope por usuario, en la misma transacción."""
+    db.add(RefreshToken(user_id=user_id, token=token, expires_at=refresh_token_expiry()))
+    await db.flush()
+    await db.execute(_prune_user_tokens(user_id, get_settings().refresh_tokens_per_user))
+    await db.commit()
+
+
+def store_refresh_token_sync(db: Session, user_id: int, token: str) -> None:
+    """`store_refresh_token` para rutas síncronas."""
+    db.add(RefreshToken(user_id=user_id, token=token, expires_at=refresh_token_expiry()))
+    db.flush()
+    db.execute(_prune_user_tokens(user_id, get_settings().refresh_tokens_per_user))
+    db.commit()
+
+
+async def purge_expired_refresh_tokens(
+    batch_size: int,
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+) -> int:
+    """Borra todos los refresh tokens caducados, `batch_size` filas por commit. Devuelve cuántos."""
+    purged = 0
+    now = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        while True:
+            batch = select(RefreshToken.id).where(RefreshToken.expires_at < now).limit(batch_size)
+            result = await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(batch)))
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
+            await asyncio.sleep(0)  # deja pasar a las peticiones entre lotes
+
+
+async def refresh_token_sweeper(settings: Settings) -> None:
+    """
+    Tarea en segundo plano: purga los refresh tokens caducados cada
+    `refresh_token_sweep_interval` segundos hasta que se cancela al apagar.
+    """
+    logger.info(
+        "Barrido de refresh tokens iniciado",
+        interval=settings.refresh_token_sweep_interval,
+        batch_size=settings.refresh_token_sweep_batch,
+    )
+    while True:
+        try:
+            purged = await purge_expired_refresh_tokens(settings.refresh_token_sweep_batch)
+            logger.info("Refresh tokens caducados eliminados", purged=purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error inesperado purgando refresh tokens", error=str(e), exc_info=True)
+        await asyncio.sleep(settings.refresh_token_sweep_interval)
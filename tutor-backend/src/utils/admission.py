@@ -0,0 +1,140 @@
+"""
+Control de admisión de las llamadas al LLM.
+
+El servidor de modelos sólo atiende `max_concurrency` peticiones a la vez; el
+resto espera en una cola con prioridad (chat interactivo antes que generación
+de ejercicios, y ésta antes que el calentamiento o el pool). Cuando la cola
+está llena se rechaza al momento con 429, y si una petición espera más de
+`queue_timeout` segundos se devuelve 503, en lugar de dejar que todo acabe en
+timeouts contra el servidor.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Callable
+
+from fastapi import HTTPException
+
+
+class Priority(IntEnum):
+    """Menor valor = se atiende antes."""
+    CHAT = 0
+    GENERATION = 1
+    BACKGROUND = 2
+
+
+class LLMOverloadedError(HTTPException):
+    """El servicio de IA está saturado; la petición no llegó a enviarse."""
+
+
+class LLMQueueFullError(LLMOverloadedError):
+    def __init__(self, detail: str = "El servicio de IA está saturado. Inténtalo de nuevo en unos segundos."):
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": "5"})
+
+
+class LLMQueueTimeoutError(LLMOverloadedError):
+    def __init__(self, detail: str = "El servicio de IA no ha podido atender la petición a tiempo."):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+
+class AdmissionController:
+    """
+    Semáforo acotado con cola de espera por prioridad (FIFO dentro de cada
+    prioridad). Al liberar un hueco se cede directamente al siguiente en la
+    cola, así una petición nueva no puede colarse delante de las que esperan.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._clock = clock
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.GENERATION) -> AsyncIterator[float]:
+        """Ocupa un hueco durante el bloque; devuelve los segundos esperados en cola."""
+        waited = await self.acquire(priority)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    async def acquire(self, priority: Priority = Priority.GENERATION) -> float:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._record_wait(0.0)
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise LLMQueueFullError()
+
+        start = self._clock()
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(entry)
+            self.timed_out += 1
+            raise LLMQueueTimeoutError()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # El hueco llegó justo antes de la cancelación: se devuelve.
+                self.release()
+            else:
+                self._discard(entry)
+            raise
+
+        waited = self._clock() - start
+        self._record_wait(waited)
+        return waited
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # el hueco pasa al siguiente sin liberarse
+                return
+        self._active -= 1
+
+    def _discard(self, entry: tuple[int, int, asyncio.Future]) -> None:
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+
+    def _record_wait(self, waited: float) -> None:
+        self.admitted += 1
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
@@ -0,0 +1,129 @@
+"""
+Circuit breaker para el servicio de IA.
+
+* **closed**    – se deja pasar todo y se anota el resultado de cada llamada en
+  una ventana móvil de `window_seconds`. Si hay al menos `min_calls` y la tasa
+  de fallos alcanza `failure_rate_threshold`, el circuito se abre.
+* **open**      – se falla al instante, sin tocar la red, durante
+  `open_seconds` (o hasta que la sonda de salud vea el servicio de nuevo).
+* **half_open** – se deja pasar una llamada de prueba: si va bien se cierra,
+  si falla se vuelve a abrir.
+
+No gestiona conexiones: el cliente HTTP y su pool siguen vivos en todo momento.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window_seconds: float = 60,
+        min_calls: int = 5,
+        open_seconds: float = 30,
+        name: str = "ollama",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.name = name
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._trial_started_at: float | None = None
+        self._calls: deque[tuple[float, bool]] = deque()
+        self.trips = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state is CircuitState.OPEN
+
+    def allow_request(self) -> bool:
+        """True si la llamada puede salir; en half-open sólo una a la vez."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.OPEN:
+            return False
+
+        now = self._clock()
+        # Una prueba que no informó de su resultado (p. ej. cancelada) no bloquea para siempre.
+        if self._trial_started_at is None or now - self._trial_started_at >= self.open_seconds:
+            self._trial_started_at = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state is CircuitState.HALF_OPEN:
+            self._transition(CircuitState.CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state is CircuitState.HALF_OPEN:
+            self._trip()
+            return
+        if self._state is CircuitState.OPEN:
+            return
+        self._record(False)
+        failures = sum(1 for _, ok in self._calls if not ok)
+        if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate_threshold:
+            self._trip()
+
+    def probe_succeeded(self) -> None:
+        """La sonda de salud ha visto el servicio: se pasa a half-open sin esperar."""
+        if self._state is CircuitState.OPEN:
+            self._transition(CircuitState.HALF_OPEN)
+
+    def failure_rate(self) -> float:
+        self._prune(self._clock())
+        if not self._calls:
+            return 0.0
+        return sum(1 for _, ok in self._calls if not ok) / len(self._calls)
+
+    def _record(self, ok: bool) -> None:
+        now = self._clock()
+        self._calls.append((now, ok))
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _trip(self) -> None:
+        self._opened_at = self._clock()
+        self.trips += 1
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, new_state: CircuitState) -> None:
+        old_state, self._state = self._state, new_state
+        self._trial_started_at = None
+        if new_state is not CircuitState.HALF_OPEN:
+            self._calls.clear()
+        if old_state is not new_state:
+            log = logger.warn if new_state is CircuitState.OPEN else logger.info
+            log("Circuit breaker state changed", breaker=self.name, old=old_state.value, new=new_state.value)
@@ -0,0 +1,94 @@
+"""
+Cliente HTTP de larga vida para cada nodo del LLM.
+
+Hay un solo `httpx.AsyncClient` por upstream y se construye siempre aquí. Los
+timeouts van por separado: conectar y esperar un hueco del pool deben fallar
+rápido, mientras que leer una generación larga puede tardar minutos. Las
+conexiones ociosas se cierran pasados `keepalive_expiry` segundos, y se usa
+HTTP/2 con el paquete `h2` (en requirements.txt); si falta, se avisa y se
+sigue con HTTP/1.1.
+
+`PoolStats` cuenta las peticiones enviadas y las conexiones TCP abiertas a
+partir de los eventos `trace` de httpcore. Así se mide la rotación de
+conexiones: con el pool bien reutilizado, `connections_opened` se queda en
+unas pocas mientras `requests` no para de crecer.
+"""
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+
+import httpx
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Fracción de peticiones servidas por una conexión ya abierta."""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.connections_opened / self.requests)
+
+
+def build_http_client(
+    base_url: str,
+    stats: PoolStats,
+    *,
+    connect_timeout: float,
+    read_timeout: float,
+    write_timeout: float,
+    pool_timeout: float,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    http2: bool = True,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    async def _trace(event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            stats.connections_opened += 1
+
+    async def _on_request(request: httpx.Request) -> None:
+        stats.requests += 1
+        request.extensions.setdefault("trace", _trace)
+
+    if http2 and not http2_available():
+        logger.warn("HTTP/2 pedido pero el paquete h2 no está instalado; se usa HTTP/1.1", base_url=base_url)
+        http2 = False
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=http2,
+        timeout=httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout
+        ),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        event_hooks={"request": [_on_request]},
+        transport=transport,
+    )
+
+
+def pool_usage(client: httpx.AsyncClient | None) -> tuple[int, int]:
+    """
+    Conexiones (en uso, ociosas) del pool de httpcore. (0, 0) si aún no hay
+    cliente o si el transporte no expone su pool (p. ej. `MockTransport`).
+    """
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", None) or [])
+    idle = sum(1 for c in connections if c.is_idle())
+    return len(connections) - idle, idle
@@ -0,0 +1,100 @@
+"""
+Reparto de las llamadas al LLM entre varios nodos Ollama / Open WebUI.
+
+Cada `Backend` lleva su propio estado de salud (circuit breaker), el número de
+peticiones en curso, una media móvil exponencial (EWMA) de su latencia y los
+modelos que anuncia en `/tags`. `LoadBalancer.pick` elige, entre los nodos que
+sirven el modelo pedido y tienen el circuito cerrado, el de menos peticiones
+en curso y, a igualdad, el de menor latencia.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import httpx
+
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.http_pool import PoolStats
+
+
+def _model_aliases(name: str) -> set[str]:
+    """`profesor:latest` también responde como `profesor`."""
+    return {name, name.split(":", 1)[0]}
+
+
+def parse_tags(data: dict) -> frozenset[str]:
+    """
+    Nombres de modelo de una respuesta de `/tags` (formato Ollama `models[].name`
+    o el de Open WebUI / OpenAI `data[].id`).
+    """
+    names: set[str] = set()
+    for entry in (data.get("models") or []) + (data.get("data") or []):
+        for key in ("name", "model", "id"):
+            if entry.get(key):
+                names |= _model_aliases(entry[key])
+    return frozenset(names)
+
+
+class Backend:
+    def __init__(self, url: str, breaker: CircuitBreaker, ewma_alpha: float = 0.3):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.ewma_alpha = ewma_alpha
+        self.outstanding = 0
+        self.ewma_latency: float | None = None
+        # None = aún no se ha consultado `/tags`; se asume que sirve cualquier modelo.
+        self.models: frozenset[str] | None = None
+        # Cliente HTTP de larga vida del nodo (ver `src.utils.http_pool`).
+        self.http: httpx.AsyncClient | None = None
+        self.pool = PoolStats()
+
+    def __repr__(self) -> str:
+        return f"Backend({self.url!r}, state={self.breaker.state.value}, outstanding={self.outstanding})"
+
+    def serves(self, model: str | None) -> bool:
+        if model is None or self.models is None:
+            return True
+        return bool(_model_aliases(model) & self.models)
+
+    def load(self) -> tuple[int, float]:
+        return self.outstanding, self.ewma_latency or 0.0
+
+    def observe_latency(self, seconds: float) -> None:
+        if self.ewma_latency is None:
+            self.ewma_latency = seconds
+        else:
+            self.ewma_latency = self.ewma_alpha * seconds + (1 - self.ewma_alpha) * self.ewma_latency
+
+
+class NoBackendAvailable(Exception):
+    def __init__(self, model: str | None, reason: str):
+        super().__init__(reason)
+        self.model = model
+        self.reason = reason
+
+
+class LoadBalancer:
+    def __init__(self, backends: Iterable[Backend]):
+        self.backends = list(backends)
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    @property
+    def any_available(self) -> bool:
+        return any(not b.breaker.is_open for b in self.backends)
+
+    def pick(self, model: str | None, exclude: Iterable[Backend] = ()) -> Backend:
+        """
+        Backend con menos carga que sirve `model`. Reserva el intento en su
+        breaker (en half-open sólo deja pasar una petición de prueba).
+        """
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if id(b) not in excluded and b.serves(model)]
+        if not candidates:
+            raise NoBackendAvailable(model, "ningún backend anuncia el modelo")
+
+        for backend in sorted(candidates, key=Backend.load):
+            if backend.breaker.allow_request():
+                return backend
+        raise NoBackendAvailable(model, "todos los backends del modelo están caídos")
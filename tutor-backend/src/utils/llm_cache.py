@@ -0,0 +1,130 @@
+"""
+Caché de respuestas del LLM.
+
+La clave es un hash canónico de la petición (modelo + mensajes + formato de
+respuesta), de modo que dos peticiones idénticas del front comparten entrada
+aunque sus diccionarios lleguen con otro orden de claves.
+
+`LLMResponseCache` es la interfaz; `InMemoryLRUCache` la implementación por
+defecto (por proceso, con TTL y expulsión LRU) y `NullLLMCache` la que se usa
+cuando la caché está desactivada.
+
+La ruta `/ai/request` guarda `{"raw": respuesta, "exercise_id": id}`: un acierto
+devuelve el ejercicio ya creado con esa respuesta en lugar de insertar otro.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable
+
+from src.core.config import get_settings
+
+settings = get_settings()
+
+CACHE_KEY_FIELDS = ("model", "messages", "response_format")
+
+
+def payload_hash(payload: dict) -> str:
+    """Hash SHA-256 del JSON canónico de `payload` (claves ordenadas, sin espacios)."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def request_cache_key(payload: dict) -> str:
+    """
+    Hash SHA-256 de los campos de `payload` que determinan la respuesta.
+    """
+    return payload_hash({field: payload.get(field) for field in CACHE_KEY_FIELDS})
+
+
+class LLMResponseCache(ABC):
+    """Interfaz mínima de una caché de respuestas del LLM."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @abstractmethod
+    def get(self, key: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: dict) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class NullLLMCache(LLMResponseCache):
+    """Caché desactivada: nunca guarda nada."""
+
+    def get(self, key: str) -> dict | None:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        pass
+
+    def clear(self) -> None:
+        self.hits = self.misses = 0
+
+
+class InMemoryLRUCache(LLMResponseCache):
+    """
+    Caché en memoria con caducidad (`ttl_seconds`) y expulsión LRU cuando se
+    superan `max_entries` entradas.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+def build_exercise_cache() -> LLMResponseCache:
+    if not settings.ai_cache_enabled:
+        return NullLLMCache()
+    return InMemoryLRUCache(
+        max_entries=settings.ai_cache_max_entries,
+        ttl_seconds=settings.ai_cache_ttl_seconds,
+    )
+
+
+exercise_cache: LLMResponseCache = build_exercise_cache()
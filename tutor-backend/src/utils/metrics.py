@@ -0,0 +1,187 @@
+"""
+Métricas de proceso en formato de texto de Prometheus (`GET /metrics`).
+
+Sin dependencias: contadores e histogramas con etiquetas, más métricas
+calculadas en el momento del scrape (`CallbackMetric`), que leen el estado vivo
+de la admisión, el single-flight, los breakers o los pools HTTP.
+
+Además, cada petición puede llevar sus propios tiempos por etapa
+(`begin_request_timings`/`timed_stage`). Se acumulan en una `ContextVar`, así
+que cualquier capa (ruta, servicio, cliente de Ollama) añade etapas sin tener
+que pasarse nada. Esos tiempos van al log con el `request_id` de la petición;
+los histogramas sólo llevan etiquetas de baja cardinalidad (etapa, modelo).
+"""
+from __future__ import annotations
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(**labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(**labels), 0)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        for labels, value in self._values.items():
+            yield f"{self.name}_total", labels, value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # por etiquetas: [conteo por cubo (no acumulado)..., suma, total]
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        series = self._series.setdefault(_labels(**labels), [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_labels(**labels))
+        return int(series[-1]) if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(_labels(**labels))
+        return series[-2] if series else 0.0
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, series[-2]
+            yield f"{self.name}_count", labels, series[-1]
+
+
+class CallbackMetric:
+    """Gauge o contador cuyo valor se lee en cada scrape: `fn()` → [(etiquetas, valor)]."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Iterable[tuple[dict, float]]], type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.type = type
+        self._fn = fn
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        suffix = "_total" if self.type == "counter" else ""
+        for labels, value in self._fn():
+            yield f"{self.name}{suffix}", _labels(**labels), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | CallbackMetric] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def callback(self, name: str, help: str, fn, type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, fn, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "tutor_stage_duration_seconds", "Duración de cada etapa de una petición (cola, BD, LLM...)."
+)
+
+
+# ── Tiempos por petición ────────────────────────────────────
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def begin_request_timings() -> dict[str, float]:
+    """Empieza a acumular etapas para la petición en curso, desde cero."""
+    timings: dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def request_timings() -> dict[str, float]:
+    """Copia de los segundos por etapa acumulados en la petición en curso."""
+    return dict(_request_timings.get() or {})
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
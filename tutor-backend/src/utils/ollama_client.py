@@ -1,72 +1,293 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+
 import httpx
 import structlog
 from fastapi import Request, HTTPException
 
 from src.core.config import get_settings
+from src.utils.admission import AdmissionController, Priority
+from src.utils.circuit_breaker import CircuitBreaker, CircuitState
+from src.utils.http_pool import build_http_client, pool_usage
+from src.utils.llm_balancer import Backend, LoadBalancer, NoBackendAvailable, parse_tags
+from src.utils.llm_cache import payload_hash
+from src.utils.metrics import REGISTRY, TOKEN_BUCKETS, record_stage
+from src.utils.single_flight import SingleFlight
 
 settings = get_settings()
 logger = structlog.get_logger("ollama")
 
+
+def configured_upstreams() -> list[str]:
+    """`OLLAMA_URLS` si está definida; si no, el `OLLAMA_URL` de siempre."""
+    if settings.ollama_urls:
+        return list(settings.ollama_urls)
+    return [settings.ollama_url] if settings.ollama_url else []
+
+
+# Compartido por todas las instancias: el límite es de los servidores de modelos
+# (`OLLAMA_MAX_CONCURRENCY` por backend).
+llm_admission = AdmissionController(
+    max_concurrency=settings.ollama_max_concurrency * max(1, len(configured_upstreams())),
+    max_queue=settings.ollama_max_queue,
+    queue_timeout=settings.ollama_queue_timeout,
+)
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "tutor_llm_request_duration_seconds", "Duración de las llamadas al LLM tras la admisión, con reintentos."
+)
+LLM_TOKENS = REGISTRY.histogram(
+    "tutor_llm_tokens", "Tokens por llamada al LLM según el campo `usage`.", TOKEN_BUCKETS
+)
+LLM_RETRIES = REGISTRY.counter("tutor_llm_retries", "Reintentos de llamadas al LLM.")
+
+
+def _record_usage(model: str, usage: dict | None) -> dict:
+    """Anota los tokens de `usage` (formato OpenAI) y los devuelve para el log."""
+    tokens = {}
+    for kind in ("prompt", "completion"):
+        value = (usage or {}).get(f"{kind}_tokens")
+        if isinstance(value, int):
+            LLM_TOKENS.observe(value, model=model, kind=kind)
+            tokens[f"{kind}_tokens"] = value
+    return tokens
+
+
 class OllamaNotAvailableError(HTTPException):
     def __init__(self, detail: str = "Ollama service is not available or not configured."):
         super().__init__(status_code=503, detail=detail)
 
+def _build_breaker(name: str = "ollama") -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_rate_threshold=settings.ollama_breaker_failure_rate,
+        window_seconds=settings.ollama_breaker_window,
+        min_calls=settings.ollama_breaker_min_calls,
+        open_seconds=settings.ollama_breaker_open_seconds,
+        name=name,
+    )
+
 class OllamaClient:
-    def __init__(self, base_url: str | None, api_key: str | None = None):
-        self.base_url = base_url
+    """
+    Cliente de uno o varios nodos Ollama / Open WebUI. Cada petición se envía
+    al backend menos cargado que sirve el modelo pedido; cada backend tiene su
+    propio circuit breaker, de modo que uno caído no afecta a los demás.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        admission: AdmissionController | None = None,
+        breaker: CircuitBreaker | None = None,
+        base_urls: list[str] | None = None,
+    ):
+        urls = list(base_urls or ([base_url] if base_url else []))
+        self.base_url = urls[0] if urls else None
         self.api_key = api_key
-        self.is_enabled = bool(base_url)
-        self._client: httpx.AsyncClient | None = None
+        self.admission = admission or llm_admission
+        # Un breaker explícito sólo tiene sentido con un único backend (tests).
+        self.balancer = LoadBalancer(
+            Backend(url, breaker if breaker and len(urls) == 1 else _build_breaker(url))
+            for url in urls
+        )
+        # Peticiones idénticas concurrentes comparten una sola llamada a la IA.
+        self._single_flight: SingleFlight[dict] = SingleFlight()
 
-        if self.is_enabled:
-            logger.info("Ollama client enabled", url=self.base_url)
+        if self.is_configured:
+            logger.info("Ollama client enabled", urls=[b.url for b in self.backends])
         else:
             logger.warn("Ollama client disabled: OLLAMA_URL not configured.")
 
-    async def _get_client(self) -> httpx.AsyncClient:
-        if not self.is_enabled or not self.base_url:
-            raise OllamaNotAvailableError("Ollama client is not enabled.")
-        if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(
-                base_url=self.base_url.rstrip("/") + "/api",
-                timeout=httpx.Timeout(15, connect=20),
-                limits=httpx.Limits(max_connections=20, max_keepalive_connections=15),
+    @property
+    def backends(self) -> list[Backend]:
+        return self.balancer.backends
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Breaker del primer backend (el único en despliegues de un solo nodo)."""
+        return self.backends[0].breaker
+
+    def _model_label(self, model: str | None) -> str:
+        """
+        Etiqueta `model` de las métricas. El modelo llega del cliente, así que
+        sólo se conserva si es el configurado o uno que anuncia algún backend
+        en `/tags`; el resto se agrupa en "other" para acotar la cardinalidad.
+        """
+        if model == settings.ollama_model:
+            return model
+        if model and any(b.models is not None and model in b.models for b in self.backends):
+            return model
+        return "other"
+
+    @property
+    def is_configured(self) -> bool:
+        return len(self.balancer) > 0
+
+    @property
+    def is_enabled(self) -> bool:
+        """Configurado y con al menos un backend con el circuito no abierto."""
+        return self.is_configured and self.balancer.any_available
+
+    def _admit_or_fail(self) -> None:
+        if not self.is_configured:
+            raise OllamaNotAvailableError("Ollama URL not configured.")
+        if not self.balancer.any_available:
+            logger.warn("Every Ollama circuit is open; failing fast.")
+            raise OllamaNotAvailableError("Ollama service is temporarily unavailable.")
+
+    def _pick_backend(self, model: str | None, exclude: list[Backend] = ()) -> Backend:
+        try:
+            return self.balancer.pick(model, exclude)
+        except NoBackendAvailable as e:
+            logger.warn("No Ollama backend available", model=model, reason=e.reason)
+            raise OllamaNotAvailableError(f"Ollama service is temporarily unavailable: {e.reason}.")
+
+    def _http(self, backend: Backend) -> httpx.AsyncClient:
+        """Único cliente del backend; sólo se crea de nuevo tras `close()`."""
+        if backend.http is None or backend.http.is_closed:
+            backend.http = build_http_client(
+                backend.url,
+                backend.pool,
+                connect_timeout=settings.ollama_connect_timeout,
+                read_timeout=settings.ollama_read_timeout,
+                write_timeout=settings.ollama_write_timeout,
+                pool_timeout=settings.ollama_pool_timeout,
+                max_connections=settings.ollama_max_connections,
+                max_keepalive_connections=settings.ollama_max_keepalive,
+                keepalive_expiry=settings.ollama_keepalive_expiry,
+                http2=settings.ollama_http2,
             )
-        return self._client
+        return backend.http
+
+    def pool_stats(self) -> list[dict]:
+        """Uso del pool de conexiones de cada backend."""
+        stats = []
+        for backend in self.backends:
+            in_use, idle = pool_usage(backend.http)
+            stats.append({
+                "url": backend.url,
+                "outstanding": backend.outstanding,
+                "connections_in_use": in_use,
+                "connections_idle": idle,
+                "max_connections": settings.ollama_max_connections,
+                "requests": backend.pool.requests,
+                "connections_opened": backend.pool.connections_opened,
+                "reuse_ratio": round(backend.pool.reuse_ratio, 3),
+            })
+        return stats
 
     async def close(self):
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        for backend in self.backends:
+            if backend.http:
+                await backend.http.aclose()
+                backend.http = None
+
+    def _build_headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
 
     async def check_availability(self, request: Request | None = None) -> bool:
-        if not self.is_enabled:
+        """
+        Sondea `/tags` en todos los backends: actualiza los modelos que sirve
+        cada uno y pasa a half-open los que tenían el circuito abierto y ya
+        responden. True si alguno está disponible.
+        """
+        if not self.is_configured:
             return False
-        
-        log = logger.bind(request_id=getattr(request.state, "request_id", "n/a") if request else "n/a")
+        # Un backend que falla de forma inesperada no corta el sondeo de los demás.
+        results = await asyncio.gather(*(self._probe(b, request) for b in self.backends), return_exceptions=True)
+        for backend, result in zip(self.backends, results):
+            if isinstance(result, Exception):
+                logger.error("Unexpected error probing Ollama backend", ollama_url=backend.url, error=str(result), exc_info=result)
+        return any(result is True for result in results)
+
+    async def _probe(self, backend: Backend, request: Request | None = None) -> bool:
+        log = logger.bind(
+            request_id=getattr(request.state, "request_id", "n/a") if request else "n/a",
+            ollama_url=backend.url,
+        )
         try:
-            client = await self._get_client()
-            response = await client.get("/tags")
+            response = await self._http(backend).get("/api/tags", headers=self._build_headers())
             response.raise_for_status()
-            log.info("Ollama service is available and responding.")
-            return True
-        except (httpx.ConnectError, httpx.HTTPStatusError, httpx.ReadTimeout) as e:
-            log.warn("Ollama service check failed.", error=str(e), ollama_url=self.base_url)
-            self.is_enabled = False
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            log.warn("Ollama service check failed.", error=str(e))
             return False
-        except OllamaNotAvailableError:
-             self.is_enabled = False
-             return False
 
+        try:
+            # Un listado vacío o irreconocible no restringe el enrutado (modelos desconocidos).
+            backend.models = parse_tags(response.json()) or None
+        except (ValueError, AttributeError, TypeError):
+            log.warn("Unexpected /tags payload; keeping previous model list.")
+        log.info("Ollama service is available and responding.", models=sorted(backend.models or []))
+        backend.breaker.probe_succeeded()
+        return True
 
-    async def generate_chat_completion(self, payload: dict, request: Request | None = None) -> dict:
-        if not self.is_enabled:
-            logger.warn("Attempted to use Ollama when client is disabled.")
-            raise OllamaNotAvailableError()
+    async def run_health_probe(self, interval: float) -> None:
+        """
+        Tarea en segundo plano (arrancada desde `lifespan`): cada `interval`
+        segundos refresca los modelos de cada backend y recupera los caídos.
+        Un error en una vuelta se registra y no detiene la tarea: sin sondeo,
+        un breaker abierto nunca pasaría a half-open.
+        """
+        while True:
+            try:
+                await self.check_availability()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ollama health probe failed", error=str(e), exc_info=True)
+            await asyncio.sleep(interval)
 
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
+
+    @property
+    def coalesced_requests(self) -> int:
+        """Peticiones servidas esperando a una idéntica que ya estaba en vuelo."""
+        return self._single_flight.coalesced
+
+    async def generate_chat_completion(
+        self,
+        payload: dict,
+        request: Request | None = None,
+        priority: Priority = Priority.GENERATION,
+    ) -> dict:
+        if not settings.ollama_coalesce_requests:
+            return await self._admitted_chat_completion(payload, request, priority)
+
+        # La prioridad forma parte de la clave: una llamada sólo espera a otra
+        # que se admite con su misma prioridad (un CHAT no se queda detrás de
+        # un BACKGROUND del pool con el mismo prompt).
+        key = f"{priority.name}:{payload_hash(payload)}"
+        if key in self._single_flight:
+            logger.debug("Coalescing identical in-flight chat completion", key=key[:12])
+        return await self._single_flight.do(
+            key, lambda: self._admitted_chat_completion(payload, request, priority)
+        )
+
+    async def _admitted_chat_completion(self, payload: dict, request: Request | None, priority: Priority) -> dict:
+        self._admit_or_fail()
+
+        async with self.admission.slot(priority) as waited:
+            if waited:
+                logger.debug("LLM request admitted after queueing", priority=priority.name, queue_wait=round(waited, 3))
+            record_stage("llm_queue", waited)
+
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await self._generate_chat_completion(payload, request)
+                outcome = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                record_stage("llm_generate", elapsed)
+                LLM_REQUEST_SECONDS.observe(elapsed, model=self._model_label(payload.get("model")), outcome=outcome)
+
+    async def _generate_chat_completion(self, payload: dict, request: Request | None = None) -> dict:
+        headers = self._build_headers()
 
         req_id = getattr(request.state, "request_id", "n/a") if request and hasattr(request, "state") else "n/a"
         log = logger.bind(request_id=req_id)
@@ -74,47 +295,62 @@ class OllamaClient:
         final_payload = payload.copy()
         if "stream" not in final_payload:
             final_payload["stream"] = False
+        model = final_payload.get("model")
 
         target_openai_endpoint = "/api/chat/completions"
-        full_url = self.base_url.rstrip("/") + target_openai_endpoint
+        unreachable: list[Backend] = []
         
         for attempt in range(1, 4):
+            if attempt > 1:
+                LLM_RETRIES.inc(model=self._model_label(model))
+            backend = self._pick_backend(model, exclude=unreachable)
+            full_url = backend.url + target_openai_endpoint
+            backend.outstanding += 1
+            started = time.monotonic()
             try:
-                if self._client is None or self._client.is_closed:
-                    self._client = httpx.AsyncClient(
-                        timeout=httpx.Timeout(15, connect=20),
-                        limits=httpx.Limits(max_connections=20, max_keepalive_connections=15),
-                    )
-                
                 log.debug(
                     "Attempting OpenAI-compatible chat completion with Open WebUI", 
                     url=full_url, 
                     attempt=attempt, 
-                    model=final_payload.get("model")
+                    model=model
                 )
                 
-                r = await self._client.post(full_url, json=final_payload, headers=headers)
+                r = await self._http(backend).post(target_openai_endpoint, json=final_payload, headers=headers)
                 r.raise_for_status()
+                data = r.json()
 
                 log.info(
                     "OpenAI-compatible chat completion successful via Open WebUI", 
                     status=r.status_code, 
                     url=full_url,
-                    attempt=attempt
+                    attempt=attempt,
+                    model=model,
+                    retries=attempt - 1,
+                    duration=round(time.monotonic() - started, 3),
+                    **_record_usage(self._model_label(model), data.get("usage") if isinstance(data, dict) else None),
                 )
-                return r.json()
+                backend.observe_latency(time.monotonic() - started)
+                backend.breaker.record_success()
+                return data
 
-            except httpx.ReadTimeout:
-                log.warning("Open WebUI chat completion timeout", attempt=attempt, url=full_url if 'full_url' in locals() else "api/chat/completions")
+            except httpx.PoolTimeout:
+                # Pool local agotado: el backend no ha fallado, no cuenta en su breaker.
+                log.warning("No free connection in the Open WebUI pool", attempt=attempt, url=full_url)
                 if attempt == 3:
-                    self.is_enabled = False
-                    log.error("Open WebUI disabled due to persistent timeout.")
-                    raise OllamaNotAvailableError("Open WebUI service timed out after several attempts.")
+                    raise OllamaNotAvailableError("Open WebUI connection pool exhausted.")
+            except httpx.ReadTimeout:
+                # Tras `ollama_read_timeout` (minutos) no se reintenta: cada intento
+                # retendría otra vez el hueco de admisión y sumaría otro fallo al breaker.
+                log.error("Open WebUI chat completion timeout", attempt=attempt, url=full_url)
+                backend.breaker.record_failure()
+                raise OllamaNotAvailableError("Open WebUI service timed out.")
             except httpx.ConnectError:
-                log.error("Open WebUI chat completion connection error", attempt=attempt, url=full_url if 'full_url' in locals() else "api/chat/completions")
-                self.is_enabled = False
-                log.error("Open WebUI disabled due to connection error.")
-                raise OllamaNotAvailableError("Failed to connect to Ollama service.")
+                log.error("Open WebUI chat completion connection error", attempt=attempt, url=full_url)
+                backend.breaker.record_failure()
+                # Se reintenta sólo en otro backend; si no queda ninguno, se falla ya.
+                unreachable.append(backend)
+                if attempt == 3 or len(unreachable) == len(self.backends):
+                    raise OllamaNotAvailableError("Failed to connect to Ollama service.")
             except httpx.HTTPStatusError as exc:
                 error_body = None
                 try:
@@ -129,38 +365,208 @@ class OllamaClient:
                     ollama_response_body=error_body,
                     attempt=attempt
                 )
+                if exc.response.status_code >= 500:
+                    backend.breaker.record_failure()
+                else:
+                    # El servidor responde: un 4xx no cuenta como caída.
+                    backend.breaker.record_success()
                 if attempt == 3:
-                    if exc.response.status_code >= 500:
-                        self.is_enabled = False
-                        log.error("Ollama disabled due to persistent server-side HTTP error.")
                     raise OllamaNotAvailableError(f"Ollama service returned an error: {error_body}")
             except OllamaNotAvailableError:
                 raise
             except Exception as e:
                 log.error("Unexpected error during Ollama request", error=str(e), attempt=attempt, exc_info=True)
+                backend.breaker.record_failure()
                 if attempt == 3:
-                    self.is_enabled = False
-                    log.error("Ollama disabled due to persistent unexpected error.")
+                    log.error("Ollama request failed with an unexpected error on every attempt.")
                     raise OllamaNotAvailableError(f"An unexpected error occurred with Ollama: {str(e)}")
+            finally:
+                backend.outstanding -= 1
         
-        self.is_enabled = False 
         raise OllamaNotAvailableError("Ollama request failed after multiple retries.")
 
+    async def stream_chat_completion(
+        self,
+        payload: dict,
+        request: Request | None = None,
+        priority: Priority = Priority.CHAT,
+    ) -> AsyncIterator[str]:
+        """
+        Variante en streaming de `generate_chat_completion`.
+
+        Open WebUI emite la respuesta como Server-Sent Events con el formato de
+        OpenAI (`data: {...}` por fragmento y `data: [DONE]` al final); aquí se
+        devuelven sólo los fragmentos de texto (`choices[0].delta.content`).
+        No hay reintentos: una vez enviado el primer token no se puede repetir.
+        El hueco de admisión se mantiene mientras dura el stream.
+        """
+        self._admit_or_fail()
+
+        req_id = getattr(request.state, "request_id", "n/a") if request and hasattr(request, "state") else "n/a"
+        log = logger.bind(request_id=req_id)
+
+        final_payload = {**payload, "stream": True}
+        model = final_payload.get("model")
+        endpoint = "/api/chat/completions"
+
+        async with self.admission.slot(priority) as waited:
+            record_stage("llm_queue", waited)
+            backend = self._pick_backend(model)
+            full_url = backend.url + endpoint
+            log.debug("Starting streamed chat completion with Open WebUI", url=full_url, model=model)
+
+            backend.outstanding += 1
+            started = time.monotonic()
+            first_chunk = True
+            usage = None
+            outcome = "error"
+            try:
+                async with self._http(backend).stream("POST", endpoint, json=final_payload, headers=self._build_headers()) as r:
+                    r.raise_for_status()
+                    async for line in r.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                        except ValueError:
+                            log.warn("Skipping malformed stream chunk from Open WebUI", chunk=data[:200])
+                            continue
+                        # Con `stream_options.include_usage` el último fragmento trae `usage` sin `choices`.
+                        usage = chunk.get("usage") or usage
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            if first_chunk:
+                                # En streaming, la latencia que importa es la del primer token.
+                                ttft = time.monotonic() - started
+                                backend.observe_latency(ttft)
+                                record_stage("llm_ttft", ttft)
+                                first_chunk = False
+                            yield content
+                outcome = "ok"
+            except httpx.ConnectError:
+                backend.breaker.record_failure()
+                log.error("Open WebUI connection error while streaming.", url=full_url)
+                raise OllamaNotAvailableError("Failed to connect to Ollama service.")
+            except httpx.PoolTimeout:
+                log.warning("No free connection in the Open WebUI pool while streaming", url=full_url)
+                raise OllamaNotAvailableError("Open WebUI connection pool exhausted.")
+            except httpx.TimeoutException:
+                backend.breaker.record_failure()
+                log.warning("Open WebUI streamed chat completion timeout", url=full_url)
+                raise OllamaNotAvailableError("Open WebUI service timed out while streaming.")
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code >= 500:
+                    backend.breaker.record_failure()
+                else:
+                    backend.breaker.record_success()
+                log.error("Open WebUI streamed chat completion HTTP error", status=exc.response.status_code, url=full_url)
+                raise OllamaNotAvailableError(f"Ollama service returned an error: {exc.response.status_code}")
+            finally:
+                backend.outstanding -= 1
+                elapsed = time.monotonic() - started
+                record_stage("llm_stream", elapsed)
+                LLM_REQUEST_SECONDS.observe(elapsed, model=self._model_label(model), outcome=outcome)
+
+            backend.breaker.record_success()
+            log.info(
+                "Streamed chat completion finished via Open WebUI",
+                url=full_url,
+                model=model,
+                duration=round(elapsed, 3),
+                **_record_usage(self._model_label(model), usage),
+            )
+
+
+ollama_client = OllamaClient(base_urls=configured_upstreams(), api_key=settings.api_key)
 
-ollama_client = OllamaClient(base_url=settings.ollama_url, api_key=settings.api_key)
 
+def _register_metrics(client: OllamaClient) -> None:
+    """Estado vivo de la admisión, el single-flight, los breakers y los pools, leído en cada scrape."""
+    admission = client.admission
 
-async def generate_with_ollama(payload: dict, request: Request | None = None) -> dict:
+    REGISTRY.callback("tutor_llm_in_flight", "Llamadas al LLM en curso.", lambda: [({}, admission.in_flight)])
+    REGISTRY.callback("tutor_llm_queued", "Llamadas al LLM esperando hueco.", lambda: [({}, admission.queued)])
+    REGISTRY.callback(
+        "tutor_llm_admission", "Resultado de la admisión de llamadas al LLM.",
+        lambda: [
+            ({"result": "admitted"}, admission.admitted),
+            ({"result": "rejected"}, admission.rejected),
+            ({"result": "timed_out"}, admission.timed_out),
+        ],
+        type="counter",
+    )
+    REGISTRY.callback(
+        "tutor_llm_queue_wait_seconds", "Segundos acumulados esperando en la cola de admisión.",
+        lambda: [({}, admission.queue_wait_total)], type="counter",
+    )
+    REGISTRY.callback(
+        "tutor_llm_single_flight", "Llamadas ejecutadas (leader) y servidas por otra idéntica (coalesced).",
+        lambda: [
+            ({"role": "leader"}, client._single_flight.leaders),
+            ({"role": "coalesced"}, client._single_flight.coalesced),
+        ],
+        type="counter",
+    )
+    REGISTRY.callback(
+        "tutor_llm_breaker_state", "Estado del circuit breaker de cada backend (1 = estado actual).",
+        lambda: [
+            ({"backend": b.url, "state": state.value}, int(b.breaker.state is state))
+            for b in client.backends for state in CircuitState
+        ],
+    )
+    REGISTRY.callback(
+        "tutor_llm_breaker_trips", "Veces que se ha abierto el circuito de cada backend.",
+        lambda: [({"backend": b.url}, b.breaker.trips) for b in client.backends], type="counter",
+    )
+    REGISTRY.callback(
+        "tutor_llm_backend_outstanding", "Peticiones en curso por backend.",
+        lambda: [({"backend": b.url}, b.outstanding) for b in client.backends],
+    )
+    REGISTRY.callback(
+        "tutor_llm_pool_connections", "Conexiones del pool HTTP de cada backend.",
+        lambda: [
+            ({"backend": s["url"], "state": state}, s[f"connections_{state}"])
+            for s in client.pool_stats() for state in ("in_use", "idle")
+        ],
+    )
+    REGISTRY.callback(
+        "tutor_llm_pool_connections_opened", "Conexiones TCP abiertas hacia cada backend.",
+        lambda: [({"backend": b.url}, b.pool.connections_opened) for b in client.backends], type="counter",
+    )
+    REGISTRY.callback(
+        "tutor_llm_pool_requests", "Peticiones HTTP enviadas a cada backend.",
+        lambda: [({"backend": b.url}, b.pool.requests) for b in client.backends], type="counter",
+    )
+
+
+_register_metrics(ollama_client)
+
+
+async def generate_with_ollama(
+    payload: dict,
+    request: Request | None = None,
+    priority: Priority = Priority.GENERATION,
+) -> dict:
     """
     Legacy wrapper for OllamaClient.generate_chat_completion.
     Prefer using the OllamaClient instance directly.
     """
-    global ollama_client
-    if not ollama_client.is_enabled:
-        if settings.ollama_url:
-            logger.info("Re-initializing Ollama client as it was previously disabled but URL is set.")
-            ollama_client = OllamaClient(base_url=settings.ollama_url, api_key=settings.api_key)
-        else:
-            raise OllamaNotAvailableError("Ollama URL not configured.")
+    return await ollama_client.generate_chat_completion(payload, request, priority)
+
 
-    return await ollama_client.generate_chat_completion(payload, request)
+async def stream_with_ollama(
+    payload: dict,
+    request: Request | None = None,
+    priority: Priority = Priority.CHAT,
+) -> AsyncIterator[str]:
+    """
+    Equivalente a `generate_with_ollama` para respuestas en streaming.
+    """
+    async for delta in ollama_client.stream_chat_completion(payload, request, priority):
+        yield delta
@@ -0,0 +1,50 @@
+"""
+Agrupación de peticiones idénticas en vuelo (single-flight).
+
+Si llegan varias llamadas con la misma clave mientras la primera sigue en
+curso, sólo se ejecuta una y todas reciben su resultado (o su excepción).
+La llamada corre en su propia tarea: si el cliente que la lanzó se desconecta,
+el resto de esperas no se cancelan.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    `leaders` cuenta las llamadas que realmente se ejecutan y `coalesced`
+    las que se han servido esperando a una que ya estaba en vuelo.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Task[T]] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[T]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita el aviso de "exception was never retrieved" si nadie esperaba ya.
+        if not task.cancelled():
+            task.exception()
@@ -126,3 +126,144 @@ def test_success_path(client, db_session, monkeypatch):
     ej = db_session.query(Exercise).get(body["id"])
     assert ej is not None
     assert ej.answer == data["respuesta"]
+
+
+def _exercise_response(data):
+    return {"choices": [{"message": {"content": json.dumps(data)}}]}
+
+
+EXERCISE_DATA = {
+    "tema": "Números naturales",
+    "enunciado": "¿Cuánto es 3+3?",
+    "tipo": "respuesta corta",
+    "dificultad": "fácil",
+    "respuesta": "6",
+    "explicacion": "Suma sencilla",
+}
+
+AI_BODY = {
+    "model": "profesor",
+    "response_format": {"type": "json_object"},
+    "messages": [{"role": "user", "content": 'Genera un ejercicio sobre "Números naturales" en dificultad fácil'}],
+}
+
+
+def test_identical_request_is_served_from_cache(client, db_session, monkeypatch):
+    insert_theme(db_session, name="números naturales", description="desc")
+    calls = []
+
+    async def mock_generate(payload):
+        calls.append(payload)
+        return _exercise_response(EXERCISE_DATA)
+    monkeypatch.setattr(ai_module, "generate_with_ollama", mock_generate)
+
+    first = client.post("/api/ai/request", json=AI_BODY)
+    second = client.post("/api/ai/request", json=AI_BODY)
+
+    assert first.status_code == second.status_code == 200
+    assert len(calls) == 1
+    assert second.json()["enunciado"] == EXERCISE_DATA["enunciado"]
+
+    # El acierto devuelve el ejercicio ya creado, sin insertar un duplicado.
+    from src.models import Exercise
+    assert second.json()["id"] == first.json()["id"]
+    assert db_session.query(Exercise).count() == 1
+
+
+def test_cache_hit_recreates_exercise_if_it_was_deleted(client, db_session, monkeypatch):
+    from src.models import Exercise
+
+    insert_theme(db_session, name="números naturales", description="desc")
+
+    async def mock_generate(payload):
+        return _exercise_response(EXERCISE_DATA)
+    monkeypatch.setattr(ai_module, "generate_with_ollama", mock_generate)
+
+    first = client.post("/api/ai/request", json=AI_BODY)
+    db_session.query(Exercise).delete()
+    db_session.commit()
+
+    second = client.post("/api/ai/request", json=AI_BODY)
+    assert first.status_code == second.status_code == 200
+    assert db_session.query(Exercise).count() == 1
+    assert db_session.get(Exercise, second.json()["id"]) is not None
+
+
+def test_failed_responses_are_not_cached(client, monkeypatch):
+    calls = []
+
+    async def mock_generate(payload):
+        calls.append(payload)
+        return {"choices": [{"message": {"content": "no-json"}}]}
+    monkeypatch.setattr(ai_module, "generate_with_ollama", mock_generate)
+
+    assert client.post("/api/ai/request", json=AI_BODY).status_code == 500
+    assert client.post("/api/ai/request", json=AI_BODY).status_code == 500
+    assert len(calls) == 2
+
+
+def test_cache_hit_reuses_unseen_stored_exercise(client, db_session, monkeypatch):
+    from src.models import Exercise, User, UserResponse
+
+    monkeypatch.setattr(ai_module.settings, "ai_cache_reuse_exercises", True)
+    tema = insert_theme(db_session, name="números naturales", description="desc")
+    db_session.add(User(id=1, username="ada", email="ada@example.com", password="hashed"))
+    seen = Exercise(statement="Ya respondido", type="t", difficulty="fácil", answer="1", theme_id=tema.id)
+    unseen = Exercise(statement="Pendiente", type="t", difficulty="fácil", answer="2", theme_id=tema.id)
+    db_session.add_all([seen, unseen])
+    db_session.flush()
+    db_session.add(UserResponse(user_id=1, exercise_id=seen.id, answer="1", correct=True))
+    db_session.commit()
+
+    async def mock_generate(payload):
+        return _exercise_response(EXERCISE_DATA)
+    monkeypatch.setattr(ai_module, "generate_with_ollama", mock_generate)
+
+    first = client.post("/api/ai/request", json=AI_BODY)
+    second = client.post("/api/ai/request", json=AI_BODY)
+
+    assert first.json()["enunciado"] == EXERCISE_DATA["enunciado"]
+    assert second.json()["id"] == unseen.id
+    assert db_session.query(Exercise).count() == 3
+
+
+def test_pool_next_serves_unseen_exercise_without_llm(client, db_session, monkeypatch):
+    from src.models import Exercise, User, UserResponse
+
+    async def must_not_call(payload):
+        raise AssertionError("el pool no debe llamar al LLM")
+    monkeypatch.setattr(ai_module, "generate_with_ollama", must_not_call)
+
+    tema = insert_theme(db_session, name="números naturales", description="desc")
+    db_session.add(User(id=1, username="ada", email="ada@example.com", password="hashed"))
+    seen = Exercise(statement="Ya respondido", type="test", difficulty="fácil", answer="1", theme_id=tema.id)
+    other_level = Exercise(statement="Difícil", type="test", difficulty="difícil", answer="3", theme_id=tema.id)
+    unseen = Exercise(statement="Pendiente", type="test", difficulty="fácil", answer="2", theme_id=tema.id)
+    db_session.add_all([seen, other_level, unseen])
+    db_session.flush()
+    db_session.add(UserResponse(user_id=1, exercise_id=seen.id, answer="1", correct=True))
+    db_session.commit()
+
+    resp = client.get("/api/ai/pool/next", params={"theme_id": tema.id, "dificultad": "fácil"})
+    assert resp.status_code == 200
+    assert resp.json()["id"] == unseen.id
+
+    empty = client.get("/api/ai/pool/next", params={"theme_id": tema.id, "dificultad": "fácil", "tipo": "desarrollo"})
+    assert empty.status_code == 404
+
+
+def test_pool_next_unknown_theme(client):
+    resp = client.get("/api/ai/pool/next", params={"theme_id": 999, "dificultad": "fácil"})
+    assert resp.status_code == 404
+
+
+def test_overloaded_llm_is_rejected_with_429(client, monkeypatch):
+    from src.utils.admission import LLMQueueFullError
+
+    async def overloaded(payload):
+        raise LLMQueueFullError()
+    monkeypatch.setattr(ai_module, "generate_with_ollama", overloaded)
+
+    resp = client.post("/api/ai/request", json=AI_BODY)
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "5"
@@ -7,7 +7,8 @@ from starlette import status # Para los códigos de estado HTTP
 
 import src.api.routes.auth as auth_module
 from src.models import User, RefreshToken, UserProvider # Añadido UserProvider
-from src.core.security import hash_password
+import src.core.security as security_module
+from src.core.security import LoginThrottle, hash_password
 from unittest.mock import ANY # Import ANY
 
 
@@ -34,9 +35,13 @@ def insert_user(db: Session, *, email="ada@example.com",
     return user
 
 
+REFRESH_TOKEN = "rt_" + ("x" * 30)      # no importa su forma, sólo unicidad
+
+
 def insert_refresh(db: Session, user: User,
                    *, minutes=30) -> RefreshToken:
-    token = "rt_" + ("x" * 30)          # no importa su forma, sólo unicidad
+    """En BBDD queda el hash: para usarlo en peticiones, `REFRESH_TOKEN`."""
+    token = REFRESH_TOKEN
     rt = RefreshToken(
         user_id=user.id,
         token=token,
@@ -60,6 +65,44 @@ def test_login_invalid_credentials(client: TestClient, db_session: Session):
     assert r.json()["detail"] == "Credenciales inválidas"
 
 
+def test_login_throttled_after_repeated_failures(client: TestClient, db_session: Session,
+                                                 monkeypatch):
+    monkeypatch.setattr(security_module, "_login_throttle", LoginThrottle(3, 50, 300))
+    insert_user(db_session, email="ada@example.com", password="Str0ng!Pass1")
+
+    for _ in range(3):
+        r = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "WRONG"})
+        assert r.status_code == 400
+
+    # Bloqueada incluso con la contraseña correcta, sin llegar a verificarla.
+    r = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "Str0ng!Pass1"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+
+    # Los fallos desde otra IP no impiden entrar al alumno.
+    security_module._login_throttle.clear()
+    for _ in range(3):
+        security_module._login_throttle.record_failure("ada@example.com", "203.0.113.7")
+    r = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "Str0ng!Pass1"})
+    assert r.status_code == 200
+
+
+def test_login_rehashes_password_with_outdated_cost(client: TestClient, db_session: Session):
+    from passlib.hash import bcrypt
+
+    user = insert_user(db_session, email="ada@example.com", password="Str0ng!Pass1")
+    user.password = bcrypt.using(rounds=4).hash("Str0ng!Pass1")
+    db_session.commit()
+
+    r = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "Str0ng!Pass1"})
+    assert r.status_code == 200
+
+    db_session.expire_all()
+    upgraded = db_session.get(User, user.id).password
+    assert upgraded.startswith("$2b$12$")
+    assert security_module.verify_password("Str0ng!Pass1", upgraded)
+
+
 def test_login_ok_generates_tokens(client: TestClient, db_session: Session,
                                    monkeypatch):
     user = insert_user(db_session)
@@ -93,7 +136,7 @@ def test_refresh_token_expired(client: TestClient, db_session: Session):
     rt = insert_refresh(db_session, user, minutes=-1)   # pasado
 
     r = client.post("/api/auth/refresh",
-                    json={"refresh_token": rt.token})
+                    json={"refresh_token": REFRESH_TOKEN})
 
     # Token caducado
     assert r.status_code == 400
@@ -111,15 +154,16 @@ def test_refresh_rotates_and_returns_new_tokens(client, db_session,
                         lambda: "new_refresh")
 
     r = client.post("/api/auth/refresh",
-                    json={"refresh_token": old_rt.token})
+                    json={"refresh_token": REFRESH_TOKEN})
 
     assert r.status_code == 200
     assert r.json() == {"access_token": "new_access",
                         "refresh_token": "new_refresh"}
 
-    # El token anterior debe haberse sustituido
+    # El token anterior debe haberse sustituido (en BBDD sólo está su hash)
     db_session.refresh(old_rt)
-    assert old_rt.token == "new_refresh"
+    assert old_rt.token == security_module.hash_refresh_token("new_refresh")
+    assert db_session.query(RefreshToken).filter_by(token="new_refresh").count() == 1
 
 
 # ------------- Google OAuth Tests ------------------
@@ -0,0 +1,194 @@
+import json
+
+import pytest
+
+import src.services.chat_service as chat_service_module
+from src.models import User, Subject, Theme, Exercise, ChatConversation, ChatMessage
+from src.utils.ollama_client import OllamaNotAvailableError
+
+
+# ───────────────── helpers ──────────────────────────────────────────────────
+@pytest.fixture
+def exercise(db_session):
+    """
+    Crea el usuario 1 (el del `client` simulado) y un ejercicio sobre el que chatear.
+    """
+    db_session.add(User(id=1, username="ada", email="ada@example.com", password="hashed"))
+    subject = Subject(name="Matemáticas Chat", description="Asignatura para chat")
+    db_session.add(subject)
+    db_session.flush()
+    theme = Theme(name="Sumas", description="Tema de sumas", subject_id=subject.id)
+    db_session.add(theme)
+    db_session.flush()
+    ej = Exercise(statement="¿Cuánto es 2+2?", type="respuesta corta", difficulty="fácil", answer="4", theme_id=theme.id)
+    db_session.add(ej)
+    db_session.commit()
+    db_session.refresh(ej)
+    return ej
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    """Convierte el cuerpo `text/event-stream` en una lista de (evento, datos)."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# ───────────────── tests ────────────────────────────────────────────────────
+def test_stream_relays_tokens_and_persists_reply(client, db_session, exercise, monkeypatch):
+    async def fake_stream(payload, request=None, priority=None):
+        for delta in ["Piensa ", "en ", "dos pares."]:
+            yield delta
+    monkeypatch.setattr(chat_service_module, "stream_with_ollama", fake_stream)
+
+    r = client.post("/api/chat/message/stream", json={"message": "Ayuda", "exercise_id": exercise.id})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(r.text)
+    assert [e for e, _ in events] == ["user_message", "token", "token", "token", "done"]
+    assert events[0][1]["message"] == "Ayuda"
+    assert "".join(d["content"] for e, d in events if e == "token") == "Piensa en dos pares."
+
+    done = events[-1][1]
+    assert done["sender_type"] == "ai"
+    assert done["message"] == "Piensa en dos pares."
+
+    conversation = db_session.query(ChatConversation).one()
+    assert conversation.id == events[0][1]["conversation_id"] == done["conversation_id"]
+    stored = db_session.query(ChatMessage).order_by(ChatMessage.id).all()
+    assert [(m.sender_type, m.message) for m in stored] == [("user", "Ayuda"), ("ai", "Piensa en dos pares.")]
+
+
+def test_stream_unavailable_emits_error_and_saves_fallback(client, db_session, exercise, monkeypatch):
+    async def failing_stream(payload, request=None, priority=None):
+        raise OllamaNotAvailableError()
+        yield  # pragma: no cover
+    monkeypatch.setattr(chat_service_module, "stream_with_ollama", failing_stream)
+
+    r = client.post("/api/chat/message/stream", json={"message": "Hola", "exercise_id": exercise.id})
+
+    events = parse_sse(r.text)
+    assert [e for e, _ in events] == ["user_message", "error", "done"]
+    assert events[-1][1]["message"] == chat_service_module.AI_UNAVAILABLE_MESSAGE
+
+
+def test_stream_rejects_foreign_conversation_before_streaming(client, db_session, exercise):
+    r = client.post(
+        "/api/chat/message/stream",
+        json={"message": "Hola", "exercise_id": exercise.id, "conversation_id": 999},
+    )
+    assert r.status_code == 403
+    assert db_session.query(ChatMessage).count() == 0
+
+
+def test_history_window_sends_only_latest_messages(client, db_session, exercise, monkeypatch):
+    monkeypatch.setattr(chat_service_module.settings, "ollama_history_messages_window", 3)
+
+    conversation = ChatConversation(user_id=1, exercise_id=exercise.id)
+    db_session.add(conversation)
+    db_session.flush()
+    for i in range(10):
+        db_session.add(ChatMessage(conversation_id=conversation.id, sender_type="user" if i % 2 == 0 else "ai", message=f"m{i}"))
+    db_session.commit()
+
+    sent = []
+    async def fake_stream(payload, request=None, priority=None):
+        sent.append(payload)
+        yield "ok"
+    monkeypatch.setattr(chat_service_module, "stream_with_ollama", fake_stream)
+
+    client.post(
+        "/api/chat/message/stream",
+        json={"message": "nuevo", "exercise_id": exercise.id, "conversation_id": conversation.id},
+    )
+
+    history = sent[0]["messages"][1:]
+    assert [m["content"] for m in history] == ["m8", "m9", "nuevo"]
+    assert [m["role"] for m in history] == ["user", "assistant", "user"]
+
+
+def test_post_message_returns_only_new_messages_by_default(client, db_session, exercise, monkeypatch):
+    async def fake_generate(payload, request=None, priority=None):
+        return {"choices": [{"message": {"content": "Respuesta"}}]}
+    monkeypatch.setattr(chat_service_module, "generate_with_ollama", fake_generate)
+
+    first = client.post("/api/chat/message", json={"message": "Uno", "exercise_id": exercise.id})
+    conversation_id = first.json()["id"]
+    second = client.post(
+        "/api/chat/message",
+        json={"message": "Dos", "exercise_id": exercise.id, "conversation_id": conversation_id},
+    )
+    assert [m["message"] for m in second.json()["messages"]] == ["Dos", "Respuesta"]
+
+    full = client.post(
+        "/api/chat/message",
+        params={"full": True},
+        json={"message": "Tres", "exercise_id": exercise.id, "conversation_id": conversation_id},
+    )
+    assert len(full.json()["messages"]) == 6
+
+
+def test_conversation_history_keyset_pagination(client, db_session, exercise):
+    conversation = ChatConversation(user_id=1, exercise_id=exercise.id)
+    db_session.add(conversation)
+    db_session.flush()
+    for i in range(5):
+        db_session.add(ChatMessage(conversation_id=conversation.id, sender_type="user", message=f"m{i}"))
+    db_session.commit()
+
+    url = f"/api/chat/conversation/{conversation.id}"
+    page = client.get(url, params={"limit": 2}).json()
+    assert [m["message"] for m in page["messages"]] == ["m3", "m4"]
+    assert page["has_more"] is True
+
+    page = client.get(url, params={"limit": 2, "before_id": page["messages"][0]["id"]}).json()
+    assert [m["message"] for m in page["messages"]] == ["m1", "m2"]
+
+    page = client.get(url, params={"limit": 2, "before_id": page["messages"][0]["id"]}).json()
+    assert [m["message"] for m in page["messages"]] == ["m0"]
+    assert page["has_more"] is False
+
+    # Sin `limit` (el cliente actual) llega la conversación entera.
+    everything = client.get(url).json()
+    assert [m["message"] for m in everything["messages"]] == [f"m{i}" for i in range(5)]
+    assert everything["has_more"] is False
+
+
+def test_message_timings_and_tokens_reach_metrics(client, exercise, monkeypatch):
+    from src.utils.metrics import record_stage
+
+    async def fake_generate(payload, request=None, priority=None):
+        record_stage("llm_generate", 0.2)
+        return {"choices": [{"message": {"content": "Cuenta con los dedos."}}]}
+    monkeypatch.setattr(chat_service_module, "generate_with_ollama", fake_generate)
+
+    r = client.post("/api/chat/message", json={"message": "Ayuda", "exercise_id": exercise.id})
+    assert r.status_code == 200
+    assert r.headers["X-Request-ID"]
+    assert "chat_prepare;dur=" in r.headers["Server-Timing"]
+    assert "llm_generate;dur=200.0" in r.headers["Server-Timing"]
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    body = metrics.text
+    for stage in ("chat_prepare", "llm_generate", "chat_save"):
+        assert f'tutor_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert "tutor_llm_in_flight 0" in body
+    assert 'tutor_llm_admission_total{result="admitted"}' in body
+    assert 'tutor_llm_breaker_state{backend=' in body
+    assert 'tutor_http_request_duration_seconds_count{method="POST",route="/api/chat/message",status="200"}' in body
+
+
+def test_metrics_require_token_when_configured(client, monkeypatch):
+    from src.core.config import get_settings
+
+    monkeypatch.setattr(get_settings(), "metrics_token", "scraper-secret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scraper-secret"}).status_code == 200
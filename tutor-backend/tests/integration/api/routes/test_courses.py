@@ -6,7 +6,7 @@ from starlette.testclient import TestClient
 from sqlalchemy.orm import Session
 
 import src.api.routes.courses as courses_module
-from src.models import User, Course, Subject, Theme
+from src.models import CacheVersion, User, Course, Subject, Theme
 
 
 # ───────────────── helpers ──────────────────────────────────────────────────
@@ -322,3 +322,58 @@ def test_unenroll_course_user_not_enrolled_in_course_table(client: TestClient, d
 
     r = client.delete(f"/api/courses/{course.id}/unenroll")
     assert r.status_code == 204 # Debería ser exitoso (no hay nada que hacer o limpia huérfanos)
+
+
+# ---------- Catálogo materializado ----------
+def test_catalog_matches_orm_serialization(client: TestClient, db_session: Session, sample_data):
+    user, course1, *_ , subject_A, _ = sample_data
+    from src.models.associations import user_enrollments
+    db_session.execute(user_enrollments.insert().values(user_id=1, subject_id=subject_A.id, course_id=course1.id))
+    db_session.commit()
+
+    r = client.get("/api/courses/all")
+    assert r.status_code == 200
+
+    db_session.expire_all()
+    expected = [
+        courses_module._course_to_schema(c, {course1.id: frozenset({subject_A.id})}).model_dump()
+        for c in db_session.query(Course).order_by(Course.id)
+    ]
+    assert r.json() == expected
+
+
+def test_catalog_etag_and_not_modified(client: TestClient, db_session: Session, sample_data):
+    _, course1, _, _, subject_A, _ = sample_data
+    insert_user(db_session, email="admin1@example.com", username="admin1")
+
+    first = client.get("/api/courses/all")
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/courses/all", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Matricularse cambia los flags `enrolled`: el ETag del usuario ya no vale.
+    r = client.post(f"/api/subjects/{subject_A.id}/enroll", json={"course_id": course1.id})
+    assert r.status_code == 204
+    fresh = client.get("/api/courses/all", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+
+
+def test_admin_write_invalidates_catalog(client: TestClient, db_session: Session, sample_data):
+    from src.services.catalog_service import catalog_cache
+
+    rebuilds = catalog_cache.rebuilds
+    before = client.get("/api/subjects/all").json()
+    client.get("/api/themes")
+    assert catalog_cache.rebuilds == rebuilds + 1  # una instantánea para todas las vistas
+
+    r = client.post("/api/subjects/create", json={"name": "Química", "description": "Química general"})
+    assert r.status_code == 201
+
+    after = client.get("/api/subjects/all").json()
+    assert {s["name"] for s in after} == {s["name"] for s in before} | {"Química"}
+    assert catalog_cache.rebuilds == rebuilds + 2
+    # La versión queda publicada en BBDD para el resto de workers.
+    assert db_session.get(CacheVersion, "catalog").version == 1
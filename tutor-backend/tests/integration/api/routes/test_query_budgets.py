@@ -0,0 +1,107 @@
+"""
+Presupuesto de consultas por ruta (ver `ROUTE_QUERY_BUDGETS` en el conftest).
+
+`client` ya comprueba el presupuesto y el detector de N+1 en cada petición;
+aquí se recorren, con un catálogo de varias filas por tabla, las rutas que no
+pasan por él en el resto de tests.
+"""
+import pytest
+from fastapi.routing import APIRoute
+from sqlalchemy import insert, select
+
+from conftest import MAX_REPEATED_STATEMENT, ROUTE_QUERY_BUDGETS
+from src.core.security import hash_password
+from src.main import create_app
+from src.models import Course, Exercise, Subject, Theme, User, UserResponse
+from src.models.associations import user_courses, user_enrollments
+
+
+@pytest.fixture
+def catalog(db_session):
+    """
+    Usuario 1 (el del `client`) matriculado en un catálogo de 3 cursos × 6
+    asignaturas × 2 temas; los temas de las dos últimas asignaturas tienen 3
+    ejercicios respondidos cada uno.
+    """
+    db_session.add(User(id=1, username="admin", email="admin@x.com", password=hash_password("x"), is_admin=True))
+    subjects = [Subject(name=f"Asignatura {i}", description="…") for i in range(6)]
+    for i, s in enumerate(subjects):
+        s.themes = [Theme(name=f"Tema {i}.{j}", description="…") for j in range(2)]
+    courses = [Course(title=f"Curso {i}", description="…", subjects=list(subjects)) for i in range(3)]
+    db_session.add_all(courses)
+    db_session.commit()
+    exercise = Exercise(theme_id=subjects[0].themes[0].id, statement="2+2", type="abierto", difficulty="fácil", answer="4")
+    db_session.add(exercise)
+    for t in subjects[4].themes + subjects[5].themes:
+        for k in range(3):
+            e = Exercise(theme_id=t.id, statement=f"{t.name}/{k}", type="abierto", difficulty="fácil", answer="x")
+            e.responses = [UserResponse(user_id=1, answer="x", correct=True)]
+            db_session.add(e)
+    for c in courses:
+        db_session.execute(insert(user_courses).values(user_id=1, course_id=c.id))
+        for s in subjects:
+            db_session.execute(insert(user_enrollments).values(user_id=1, course_id=c.id, subject_id=s.id))
+    db_session.commit()
+    ids = {
+        "courses": [c.id for c in courses],
+        "subjects": [s.id for s in subjects],
+        "themes": [t.id for s in subjects for t in s.themes],
+        "exercise": exercise.id,
+    }
+    db_session.expunge_all()  # las rutas no deben aprovechar objetos ya cargados por el fixture
+    return ids
+
+
+def test_every_route_declares_a_budget():
+    declared = set(ROUTE_QUERY_BUDGETS)
+    routes = {
+        (method, route.path)
+        for route in create_app().routes
+        if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    assert routes - declared == set()
+    assert declared - routes - {("GET", "/")} == set()  # nada obsoleto
+
+
+def test_repeated_statement_is_reported_as_n_plus_one(db_session, catalog, count_queries):
+    with pytest.raises(AssertionError, match="N\\+1"):
+        with count_queries.budget(100, MAX_REPEATED_STATEMENT):
+            for sid in catalog["subjects"]:
+                db_session.get(Subject, sid)
+
+
+def test_in_lists_of_any_length_share_a_shape(db_session, catalog, count_queries):
+    with pytest.raises(AssertionError, match="N\\+1"):
+        with count_queries.budget(2, max_repeats=1):
+            db_session.execute(select(Theme.id).where(Theme.id.in_(catalog["themes"][:1]))).all()
+            db_session.execute(select(Theme.id).where(Theme.id.in_(catalog["themes"]))).all()
+
+
+def test_admin_catalog_routes_stay_within_budget(client, catalog):
+    c1, c2, c3 = catalog["courses"]
+    subjects, themes = catalog["subjects"], catalog["themes"]
+
+    assert client.put(f"/api/courses/{c1}", json={"title": "Curso A", "subject_ids": subjects}).status_code == 200
+    assert client.request("DELETE", f"/api/courses/{c1}/subjects", json={"subject_ids": subjects}).status_code == 204
+    assert client.post(f"/api/subjects/courses/{c1}/subjects/add", json={"subject_id": subjects[0]}).status_code == 201
+    assert client.delete(f"/api/subjects/courses/{c1}/subjects/{subjects[0]}/remove").status_code == 204
+    assert client.delete(f"/api/courses/{c3}").status_code == 204
+
+    assert client.put(f"/api/subjects/{subjects[1]}/update", json={"name": "Otra"}).status_code == 200
+    assert client.get(f"/api/subjects/{subjects[1]}/themes").status_code == 200
+    assert client.request(
+        "DELETE", f"/api/subjects/{subjects[1]}/themes/detach", json={"theme_ids": themes}
+    ).status_code == 204
+    assert client.post(f"/api/subjects/{subjects[1]}/themes/{themes[0]}/assign").status_code == 200
+    assert client.request(
+        "DELETE", f"/api/subjects/{subjects[2]}/unenroll", json={"course_id": c2}
+    ).status_code == 204
+    assert client.delete(f"/api/themes/{themes[8]}").status_code == 204  # asignatura 4, con ejercicios
+    assert client.delete(f"/api/subjects/{subjects[5]}/delete").status_code == 204
+
+
+def test_read_routes_stay_within_budget(client, catalog):
+    for path in ("/api/stats/overview", "/api/stats/timeline", "/api/stats/by-theme",
+                 f"/api/chat/exercise/{catalog['exercise']}", "/"):
+        assert client.get(path).status_code == 200, path
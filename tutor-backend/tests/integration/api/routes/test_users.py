@@ -7,7 +7,8 @@ from starlette.status import (
     HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
 )
-from src.models import User
+from src.models import Course, Subject, User
+from src.models.associations import user_courses, user_enrollments
 from src.core.security import hash_password
 
 
@@ -19,6 +20,21 @@ def _insert_user(db, *, uname, email, is_admin=False):
     return u.id
 
 
+def _enroll_everywhere(db, user_ids):
+    """Cursos y matrículas para cada usuario: antes, cargar un `User` las traía todas."""
+    subjects = [Subject(name=f"Asignatura {i}") for i in range(3)]
+    courses = [Course(title=f"Curso {i}", subjects=subjects) for i in range(3)]
+    db.add_all(courses)
+    db.commit()
+    for uid in user_ids:
+        for c in courses:
+            db.execute(user_courses.insert().values(user_id=uid, course_id=c.id))
+            for s in subjects:
+                db.execute(user_enrollments.insert().values(user_id=uid, course_id=c.id, subject_id=s.id))
+    db.commit()
+    db.expunge_all()  # que la ruta no reutilice objetos ya cargados por el test
+
+
 # ───────── GET /api/users/me ─────────────────────────────────────────
 def test_me_ok(client, db_session):
     _insert_user(db_session, uname="alice", email="a@x.com")  # id=1 (fake_user)
@@ -45,6 +61,17 @@ def test_list_users(client, db_session):
     assert {u["username"] for u in r.json()} == {"user1", "user2"}
 
 
+def test_me_and_list_users_are_a_single_query(client, db_session, count_queries):
+    ids = [_insert_user(db_session, uname=f"user{i}", email=f"u{i}@x.com") for i in range(1, 6)]
+    _enroll_everywhere(db_session, ids)
+
+    with count_queries.budget(1):
+        assert client.get("/api/users/me").status_code == HTTP_200_OK
+    with count_queries.budget(1):
+        r = client.get("/api/users/all")
+    assert len(r.json()) == 5
+
+
 # ───────── DELETE /api/users/{id} ────────────────────────────────────
 def test_delete_user_ok(client, db_session):
     # Insertar un usuario dummy primero para asegurar que "victim" no sea id=1
@@ -17,46 +17,51 @@ def make_creds(token: str) -> HTTPAuthorizationCredentials:
 class DummyPayload(dict):
     pass
 
-def test_jwt_required_missing_token():
+@pytest.mark.asyncio
+async def test_jwt_required_missing_token():
     # Sin credenciales → 401 Missing token
     with pytest.raises(HTTPException) as exc:
-        jwt_required(credentials=None)
+        await jwt_required(credentials=None)
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "Missing token" in str(exc.value.detail)
 
-def test_jwt_required_invalid_token(monkeypatch):
+@pytest.mark.asyncio
+async def test_jwt_required_invalid_token(monkeypatch):
     # Credenciales presentes pero decode_token devuelve None → 401 Invalid or expired
     creds = make_creds("whatever")
     # ya viene parcheado para devolver None
     with pytest.raises(HTTPException) as exc:
-        jwt_required(credentials=creds)
+        await jwt_required(credentials=creds)
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "Invalid or expired token" in str(exc.value.detail)
 
-def test_jwt_required_valid_token(monkeypatch):
+@pytest.mark.asyncio
+async def test_jwt_required_valid_token(monkeypatch):
     # Token válido → devuelve el payload
     expected = DummyPayload(user_id=42, is_admin=False)
     monkeypatch.setattr(auth_dep, "decode_token", lambda token: expected)
     creds = make_creds("good-token")
-    out = jwt_required(credentials=creds)
+    out = await jwt_required(credentials=creds)
     assert out is expected
 
-def test_admin_required_non_admin(monkeypatch):
+@pytest.mark.asyncio
+async def test_admin_required_non_admin(monkeypatch):
     # Payload sin is_admin → 403
     payload = DummyPayload(user_id=1, is_admin=False)
     monkeypatch.setattr(auth_dep, "decode_token", lambda token: payload)
     creds = make_creds("t")
     # Primero invocamos jwt_required para obtener el payload
-    p = jwt_required(credentials=creds)
+    p = await jwt_required(credentials=creds)
     with pytest.raises(HTTPException) as exc:
         # admin_required espera el payload como dependency
-        admin_required(payload=p)
+        await admin_required(payload=p)
     assert exc.value.status_code == status.HTTP_403_FORBIDDEN
     assert "Admin privileges required" in str(exc.value.detail)
 
-def test_admin_required_admin(monkeypatch):
+@pytest.mark.asyncio
+async def test_admin_required_admin(monkeypatch):
     # Payload con is_admin=True → pasa
     payload = DummyPayload(user_id=1, is_admin=True)
     # directamente llamamos admin_required
-    out = admin_required(payload=payload)
+    out = await admin_required(payload=payload)
     assert out is payload
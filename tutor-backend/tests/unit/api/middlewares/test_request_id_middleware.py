@@ -46,3 +46,51 @@ def test_request_id_changes_each_request(client: TestClient):
 
     # Deben ser distintos
     assert r1.headers["X-Request-ID"] != r2.headers["X-Request-ID"]
+
+
+def test_incoming_request_id_is_kept_and_invalid_one_replaced(client: TestClient):
+    r = client.get("/ping", headers={"X-Request-ID": "edge-1234"})
+    assert r.headers["X-Request-ID"] == "edge-1234"
+    assert r.json()["request_id"] == "edge-1234"
+
+    r = client.get("/ping", headers={"X-Request-ID": "bad id\twith spaces"})
+    uuid.UUID(r.headers["X-Request-ID"])
+
+
+def test_request_id_is_bound_in_structlog_contextvars_and_stages_in_server_timing():
+    import structlog
+    from src.utils.metrics import record_stage
+
+    app = FastAPI()
+    app.add_middleware(RequestIDMiddleware)
+
+    @app.get("/work")
+    async def work(request: Request):
+        record_stage("db", 0.0125)
+        return structlog.contextvars.get_contextvars()
+
+    r = TestClient(app).get("/work")
+
+    assert r.json()["request_id"] == r.headers["X-Request-ID"]
+    timing = r.headers["Server-Timing"]
+    assert timing.startswith("app;dur=")
+    assert "db;dur=12.5" in timing
+    assert "request_id" not in structlog.contextvars.get_contextvars()
+
+
+def test_streaming_responses_pass_through_untouched():
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    app.add_middleware(RequestIDMiddleware)
+
+    @app.get("/stream")
+    async def stream(request: Request):
+        async def body():
+            for part in ("uno ", "dos ", request.state.request_id):
+                yield part
+        return StreamingResponse(body(), media_type="text/plain")
+
+    r = TestClient(app).get("/stream")
+
+    assert r.text == f"uno dos {r.headers['X-Request-ID']}"
@@ -62,17 +62,23 @@ def test_setup_logging_default_level_and_handler_and_formatter(monkeypatch):
 
     # 5) Y la lista de processors en el orden exacto
     procs = recorded["processors"]
-    # primera etapa stamp ISO
-    assert isinstance(procs[0], structlog.processors.TimeStamper)
-    assert procs[0].fmt == "ISO"
+    # primero se mezclan los contextvars (request_id del middleware)
+    assert procs[0] is structlog.contextvars.merge_contextvars
+    # muestreo y recorte, antes de cualquier formateo
+    assert isinstance(procs[1], core_logging.EventSampler)
+    assert isinstance(procs[2], core_logging.FieldTruncator)
+    # stamp ISO
+    assert isinstance(procs[3], structlog.processors.TimeStamper)
+    assert procs[3].fmt == "ISO"
     # luego add_log_level
-    assert procs[1] is structlog.processors.add_log_level
+    assert procs[4] is structlog.processors.add_log_level
     # StackInfoRenderer
-    assert isinstance(procs[2], structlog.processors.StackInfoRenderer)
+    assert isinstance(procs[5], structlog.processors.StackInfoRenderer)
     # format_exc_info
-    assert procs[3] is structlog.processors.format_exc_info
-    # JSONRenderer
-    assert isinstance(procs[4], structlog.processors.JSONRenderer)
+    assert procs[6] is structlog.processors.format_exc_info
+    # JSONRenderer con el serializador rápido
+    assert isinstance(procs[7], structlog.processors.JSONRenderer)
+    assert procs[7]._dumps is core_logging.json_dumps
 
 
 @pytest.mark.parametrize("level_name,level_const", [
@@ -133,3 +139,59 @@ def test_logging_output_format(capsys):
     # El mensaje debe empezar con "ERROR " y luego timestamp y nombre del logger
     assert captured.out.startswith("ERROR ")
     assert "mi.test: ¡Fallo!" in captured.out
+
+
+def test_event_sampler_drops_only_sampled_info_and_debug_events():
+    sampler = core_logging.EventSampler({"ruido": 0.25}, rng=lambda: 0.5)
+
+    with pytest.raises(structlog.DropEvent):
+        sampler(None, "info", {"event": "ruido"})
+    assert sampler(None, "warning", {"event": "ruido"}) == {"event": "ruido"}
+    assert sampler(None, "info", {"event": "otro"}) == {"event": "otro"}
+    assert core_logging.EventSampler({"ruido": 0.25}, rng=lambda: 0.1)(None, "info", {"event": "ruido"})
+
+
+def test_field_truncator_cuts_nested_strings_without_touching_the_original():
+    payload = {"messages": [{"role": "system", "content": "x" * 50}], "model": "profesor"}
+    event = {"event": "e" * 50, "payload": payload, "n": 3}
+
+    out = core_logging.FieldTruncator(10)(None, "info", event)
+
+    assert out["event"] == "e" * 50
+    assert out["payload"]["messages"][0]["content"] == "x" * 10 + "…[+40]"
+    assert out["payload"]["model"] == "profesor"
+    assert payload["messages"][0]["content"] == "x" * 50
+    assert out["n"] == 3
+
+
+def test_json_dumps_matches_stdlib_json():
+    import json
+    from datetime import datetime, timezone
+
+    data = {"a": 1, "b": ["ñ", None, 2.5], "c": {"d": True}}
+    assert json.loads(core_logging.json_dumps(data)) == data
+    assert core_logging.json_dumps({"big": 2**70}) == '{"big": 1180591620717411303424}'
+    when = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    assert "2025-01-02" in core_logging.json_dumps({"t": when}, default=str)
+
+
+def test_queue_mode_writes_from_background_thread_and_drops_when_full(monkeypatch):
+    import io
+
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", out)
+    core_logging.setup_logging(use_queue=True, queue_size=3)
+    handler = logging.root.handlers[0]
+    assert isinstance(handler, core_logging.AsyncLogHandler)
+
+    structlog.get_logger("t").info("primero", n=1)
+    logging.getLogger("mi.test").error("fallo %s", "x")
+    for _ in range(5):
+        structlog.get_logger("t").info("relleno")
+    assert handler.dropped == 4
+
+    core_logging.stop_logging()
+    lines = out.getvalue().splitlines()
+    assert '"event":"primero"' in lines[0]
+    assert lines[1].startswith("ERROR ") and "mi.test: fallo x" in lines[1]
+    assert len(lines) == 3
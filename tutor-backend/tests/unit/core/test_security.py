@@ -9,7 +9,12 @@ class DummySettings:
     jwt_secret = "x" * 32
     jwt_algorithm = "HS256"
     jwt_access_minutes = 2
+    jwt_cache_size = 128
     bcrypt_rounds = 4
+    password_scheme = "bcrypt"
+    argon2_time_cost = 1
+    argon2_memory_cost = 1024
+    argon2_parallelism = 1
 
 @pytest.fixture(autouse=True)
 def parchear_config(monkeypatch):
@@ -18,7 +23,9 @@ def parchear_config(monkeypatch):
     de modo que las funciones lean esta configuración fija.
     """
     monkeypatch.setattr(sec, "get_settings", lambda: DummySettings())
+    sec._verifiers.clear()
     yield
+    sec._verifiers.clear()
 
 def test_hash_and_verify_correct_password():
     pwd = "Secreto123!"
@@ -75,3 +82,179 @@ def test_create_refresh_token_has_entropy_and_uniqueness():
 
     # nunca deben coincidir
     assert tok1 != tok2
+
+
+# ───────────── PasswordService / LoginThrottle ─────────────
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_login_throttle_blocks_account_until_window_expires():
+    clock = FakeClock()
+    throttle = sec.LoginThrottle(max_per_account=3, max_per_ip=100, window_seconds=60, clock=clock)
+    for _ in range(3):
+        throttle.check("ada@example.com", "10.0.0.1")
+        throttle.record_failure("ada@example.com", "10.0.0.1")
+        clock.now += 10
+
+    with pytest.raises(sec.LoginThrottledError) as exc:
+        throttle.check("ada@example.com", "10.0.0.1")
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "30"
+
+    # Ni otra cuenta desde la misma IP ni la misma cuenta desde otra IP se ven afectadas.
+    throttle.check("bob@example.com", "10.0.0.1")
+    throttle.check("ada@example.com", "10.0.0.2")
+
+    clock.now += 30
+    throttle.check("ada@example.com", "10.0.0.1")
+
+
+def test_login_throttle_per_ip_and_success_resets_account():
+    clock = FakeClock()
+    throttle = sec.LoginThrottle(max_per_account=2, max_per_ip=3, window_seconds=60, clock=clock)
+    throttle.record_failure("ada@example.com", "10.0.0.1")
+    throttle.record_success("ada@example.com", "10.0.0.1")
+    throttle.record_failure("ada@example.com", "10.0.0.1")
+    throttle.check("ada@example.com", "10.0.0.1")
+
+    throttle.record_failure("bob@example.com", "10.0.0.1")
+    throttle.record_failure("eve@example.com", "10.0.0.1")
+    with pytest.raises(sec.LoginThrottledError):
+        throttle.check("new@example.com", "10.0.0.1")
+    throttle.check("new@example.com", "10.0.0.2")
+
+
+def test_login_throttle_global_account_ceiling_spans_ips():
+    clock = FakeClock()
+    throttle = sec.LoginThrottle(
+        max_per_account=3, max_per_ip=100, window_seconds=60, max_per_account_global=10, clock=clock
+    )
+    for i in range(10):
+        throttle.check("ada@example.com", f"10.0.0.{i}")
+        throttle.record_failure("ada@example.com", f"10.0.0.{i}")
+
+    # Repartido entre IPs, ningún par llega al límite estricto, pero la cuenta sí a su techo.
+    with pytest.raises(sec.LoginThrottledError):
+        throttle.check("ada@example.com", "10.0.0.99")
+    throttle.check("bob@example.com", "10.0.0.1")
+
+
+@pytest.mark.asyncio
+async def test_password_service_runs_off_loop_and_rejects_when_full():
+    import asyncio
+    import threading
+
+    service = sec.PasswordService(max_workers=1, max_queue=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocked(*_):
+        started.set()
+        release.wait(5)
+        return True
+
+    try:
+        first = asyncio.ensure_future(service._run(blocked))
+        second = asyncio.ensure_future(service._run(blocked))
+        await asyncio.sleep(0)
+        assert started.wait(5)
+        assert service.in_flight == 2
+
+        with pytest.raises(sec.PasswordServiceBusyError) as exc:
+            await service.verify("x", "y")
+        assert exc.value.status_code == 503
+        assert service.rejected == 1
+
+        release.set()
+        assert await first and await second
+        assert service.in_flight == 0
+
+        hashed = await service.hash("Secreto123!")
+        assert await service.verify("Secreto123!", hashed) is True
+    finally:
+        release.set()
+        service.shutdown()
+
+
+def test_hash_uses_configured_bcrypt_rounds():
+    assert sec.hash_password("Secreto123!").startswith("$2b$04$")
+
+
+def test_verify_and_update_rehashes_when_cost_changes(monkeypatch):
+    old_hash = sec.hash_password("Secreto123!")
+
+    assert sec.verify_and_update_password("Secreto123!", old_hash) == (True, None)
+
+    class Stronger(DummySettings):
+        bcrypt_rounds = 5
+
+    monkeypatch.setattr(sec, "get_settings", lambda: Stronger())
+    valid, new_hash = sec.verify_and_update_password("Secreto123!", old_hash)
+    assert valid is True
+    assert new_hash.startswith("$2b$05$")
+    assert sec.verify_password("Secreto123!", new_hash)
+
+    # Contraseña incorrecta: ni válida ni hash nuevo.
+    assert sec.verify_and_update_password("NoEsLaClave", old_hash) == (False, None)
+
+
+def test_argon2_without_backend_falls_back_to_bcrypt(monkeypatch):
+    class Argon(DummySettings):
+        password_scheme = "argon2"
+
+    monkeypatch.setattr(sec, "get_settings", lambda: Argon())
+    monkeypatch.setattr(sec, "argon2_available", lambda: False)
+    sec._build_context.cache_clear()
+    try:
+        assert sec.hash_password("Secreto123!").startswith("$2b$04$")
+    finally:
+        sec._build_context.cache_clear()
+
+
+# ───────────── Caché de tokens verificados ─────────────
+def test_token_cache_hit_skips_signature_check(monkeypatch):
+    token = sec.create_access_token(user_id=7, is_admin=False)
+    assert sec.decode_token(token)["user_id"] == 7
+
+    def no_decode(*_, **__):
+        raise AssertionError("no debería volver a verificar la firma")
+
+    monkeypatch.setattr(sec.jwt, "decode", no_decode)
+    payload = sec.decode_token(token)
+    assert payload["user_id"] == 7
+
+    # Modificar lo devuelto no altera la entrada cacheada.
+    payload["is_admin"] = True
+    assert sec.decode_token(token)["is_admin"] is False
+
+
+def test_token_cache_respects_exp_and_size():
+    clock_now = [1000.0]
+    cache = sec.TokenCache(maxsize=2, clock=lambda: clock_now[0])
+    cache.put("a", {"user_id": 1, "exp": 1010})
+    cache.put("b", {"user_id": 2, "exp": 2000})
+    assert cache.get("a") == {"user_id": 1, "exp": 1010}
+
+    cache.put("c", {"user_id": 3, "exp": 2000})  # expulsa "b", el menos usado
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    clock_now[0] = 1010
+    assert cache.get("a") is None  # caducado: fuera
+    assert len(cache) == 1
+
+    cache.put("sin-exp", {"user_id": 4})
+    assert cache.get("sin-exp") is None
+
+
+def test_tampered_or_foreign_tokens_are_not_cached():
+    token = sec.create_access_token(user_id=7, is_admin=False)
+    assert sec.decode_token(token[:-2] + "xx") is None
+    foreign = jwt.encode({"user_id": 1, "exp": 9999999999}, "y" * 32, algorithm="HS256")
+    assert sec.decode_token(foreign) is None
+    assert len(sec._verifier(DummySettings.jwt_secret, "HS256")[2]) == 0
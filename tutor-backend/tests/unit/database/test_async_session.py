@@ -0,0 +1,13 @@
+import pytest
+
+from src.database.session import get_async_url
+
+
+@pytest.mark.parametrize("sync_url,expected", [
+    ("postgresql://user:pw@db:5432/tutor", "postgresql+asyncpg://user:pw@db:5432/tutor"),
+    ("postgresql+psycopg://user:pw@db/tutor", "postgresql+asyncpg://user:pw@db/tutor"),
+    ("postgresql+psycopg2://user:pw@db/tutor", "postgresql+asyncpg://user:pw@db/tutor"),
+    ("sqlite+aiosqlite:///tmp/test.db", "sqlite+aiosqlite:///tmp/test.db"),
+])
+def test_get_async_url_switches_postgres_to_asyncpg(sync_url, expected):
+    assert get_async_url(sync_url) == expected
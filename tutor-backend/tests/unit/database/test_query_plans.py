@@ -0,0 +1,105 @@
+"""
+Comprueba con EXPLAIN QUERY PLAN que las consultas de los servicios usan los
+índices compuestos de las rutas calientes. Las sentencias se capturan tal cual
+las emite el servicio, así que un cambio en la consulta que deje de aprovechar
+el índice hace fallar el test.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.api.schemas.chat import UserMessageInput
+from src.models import ChatConversation, ChatMessage, Exercise, Subject, Theme, User, UserResponse
+from src.services import chat_service, stats_service
+from src.services.exercise_service import find_unseen_exercise
+
+
+@pytest.fixture
+def seeded(db_session):
+    db_session.add(User(id=1, username="ada", email="ada@example.com", password="hashed"))
+    subject = Subject(name="Matemáticas Plan", description="Asignatura")
+    db_session.add(subject)
+    db_session.flush()
+    theme = Theme(name="Planes", description="Tema", subject_id=subject.id)
+    db_session.add(theme)
+    db_session.flush()
+    ej = Exercise(statement="2+2", type="respuesta corta", difficulty="fácil", answer="4", theme_id=theme.id)
+    db_session.add(ej)
+    db_session.flush()
+    db_session.add(UserResponse(user_id=1, exercise_id=ej.id, answer="4", correct=True))
+    conversation = ChatConversation(user_id=1, exercise_id=ej.id)
+    db_session.add(conversation)
+    db_session.flush()
+    db_session.add(ChatMessage(conversation_id=conversation.id, sender_type="user", message="Hola"))
+    db_session.commit()
+    return ej
+
+
+@pytest.fixture
+def captured(engine, async_engine):
+    """Lista de (sql, params) de cada SELECT emitido durante el test."""
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", _capture)
+    yield statements
+    for target in targets:
+        event.remove(target, "before_cursor_execute", _capture)
+
+
+def plan_details(engine, statements, table: str) -> list[str]:
+    """Filas del plan que afectan a `table` para cada sentencia que la lee."""
+    details = []
+    with engine.connect() as conn:
+        for sql, params in statements:
+            if f"FROM {table}" not in sql:
+                continue
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+            details += [r[-1] for r in rows if f" {table} " in f"{r[-1]} "]
+    assert details, f"ninguna consulta capturada lee {table}"
+    return details
+
+
+def assert_uses_index(details: list[str], index: str) -> None:
+    assert any(index in d for d in details), details
+    assert not any(d.startswith("SCAN") for d in details), details
+
+
+def run(coro_fn, async_engine):
+    async def _run():
+        factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+        async with factory() as db:
+            return await coro_fn(db)
+    return asyncio.run(_run())
+
+
+def test_stats_window_uses_user_created_index(engine, db_session, seeded, captured):
+    stats_service.overview(db_session, user_id=1)
+    details = plan_details(engine, captured, "user_responses")
+    assert_uses_index(details, "ix_user_responses_user_created")
+
+
+def test_chat_history_uses_conversation_created_index(engine, async_engine, seeded, captured):
+    body = UserMessageInput(message="Otra", exercise_id=seeded.id)
+    run(lambda db: chat_service.prepare_user_turn(db, body, user_id=1), async_engine)
+    details = plan_details(engine, captured, "chat_messages")
+    assert_uses_index(details, "ix_chat_messages_conversation_created")
+
+
+def test_conversation_lookup_uses_user_exercise_index(engine, async_engine, seeded, captured):
+    run(lambda db: chat_service.get_user_conversations_for_exercise(db, 1, seeded.id), async_engine)
+    details = plan_details(engine, captured, "chat_conversations")
+    assert_uses_index(details, "ix_chat_conversations_user_exercise")
+
+
+def test_unseen_exercise_lookup_uses_theme_index(engine, db_session, seeded, captured):
+    find_unseen_exercise(db_session, seeded.theme_id, user_id=2, difficulty="fácil")
+    details = plan_details(engine, captured, "exercises")
+    assert_uses_index(details, "ix_exercises_theme_difficulty")
@@ -62,7 +62,7 @@ def test_relationship_students():
 
     assert rel.secondary is user_courses
     assert rel.back_populates == "courses"
-    assert rel.lazy == "selectin"
+    assert rel.lazy == "raise"  # sólo con carga explícita
 
     target = rel.entity.class_
     assert target.__name__ == "User"
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.models import CacheVersion
+from src.services.cache_invalidation import InvalidationBus, listen_dsn
+
+
+@pytest.fixture
+def session_factory(async_engine):
+    return async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def bus():
+    bus = InvalidationBus()
+    bus.received = []
+    bus.subscribe("catalog", bus.received.append)
+    return bus
+
+
+def test_publish_bumps_version_and_notifies_locally(db_session, bus):
+    assert bus.publish(db_session, "catalog") == 1
+    assert bus.publish(db_session, "catalog") == 2
+
+    assert db_session.get(CacheVersion, "catalog").version == 2
+    assert bus.received == [1, 2]
+
+
+def test_apply_ignores_already_seen_versions(bus):
+    assert bus.apply("catalog", 3) is True
+    assert bus.apply("catalog", 3) is False
+    assert bus.apply("otra", 1) is True
+    assert bus.received == [3]
+
+
+def test_notification_payload_is_applied(bus):
+    bus._on_notify(None, 0, bus.channel, "catalog:7")
+    bus._on_notify(None, 0, bus.channel, "basura")
+    assert bus.received == [7]
+
+
+@pytest.mark.asyncio
+async def test_poll_picks_up_versions_published_by_other_workers(db_session, bus, session_factory):
+    InvalidationBus().publish(db_session, "catalog")  # otro worker
+    assert await bus.poll_once(session_factory) == 1
+    assert await bus.poll_once(session_factory) == 0
+
+    db_session.execute(update(CacheVersion).values(version=CacheVersion.version + 1))
+    db_session.commit()
+    assert await bus.poll_once(session_factory) == 1
+    assert bus.received == [1, 2]
+
+
+def test_listen_only_for_postgres():
+    assert listen_dsn("sqlite:///x.db") is None
+    assert listen_dsn("postgresql+psycopg2://u:p@db:5432/tutor") == "postgresql://u:p@db:5432/tutor"
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import src.services.exercise_pool as pool_module
+from src.models import Exercise, Subject, Theme, UserResponse
+from src.utils.ollama_client import OllamaNotAvailableError
+
+
+@pytest.fixture
+def pool_settings(monkeypatch):
+    from src.core.config import get_settings
+    s = get_settings()
+    monkeypatch.setattr(s, "exercise_pool_size", 2)
+    monkeypatch.setattr(s, "exercise_pool_difficulties", ["fácil", "difícil"])
+    monkeypatch.setattr(s, "exercise_pool_max_per_cycle", 10)
+    return s
+
+
+@pytest.fixture
+def session_factory(async_engine):
+    return async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def theme(db_session):
+    subject = Subject(name="Matemáticas Pool", description="Asignatura para el pool")
+    db_session.add(subject)
+    db_session.flush()
+    tema = Theme(name="Fracciones", description="Tema de fracciones", subject_id=subject.id)
+    db_session.add(tema)
+    db_session.commit()
+    db_session.refresh(tema)
+    return tema
+
+
+def _fake_generate(calls):
+    async def fake(payload, priority=None):
+        calls.append(payload)
+        data = {
+            "tema": "Fracciones",
+            "enunciado": f"Ejercicio {len(calls)}",
+            "tipo": "respuesta corta",
+            "dificultad": "FACIL",
+            "respuesta": "1/2",
+            "explicacion": "",
+        }
+        return {"choices": [{"message": {"content": json.dumps(data)}}]}
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_refill_tops_up_each_level(db_session, theme, pool_settings, session_factory, monkeypatch):
+    # Un ejercicio ya respondido no cuenta como stock; uno sin responder sí.
+    answered = Exercise(statement="Respondido", type="t", difficulty="fácil", answer="x", theme_id=theme.id)
+    stocked = Exercise(statement="En stock", type="t", difficulty="fácil", answer="y", theme_id=theme.id)
+    db_session.add_all([answered, stocked])
+    db_session.flush()
+    db_session.add(UserResponse(user_id=1, exercise_id=answered.id, answer="x", correct=True))
+    db_session.commit()
+
+    calls = []
+    monkeypatch.setattr(pool_module, "generate_with_ollama", _fake_generate(calls))
+
+    created = await pool_module.refill_exercise_pool(pool_settings, session_factory)
+
+    assert created == 3
+    db_session.expire_all()
+    by_level = {
+        d: db_session.query(Exercise).filter_by(theme_id=theme.id, difficulty=d).count()
+        for d in ("fácil", "difícil")
+    }
+    assert by_level == {"fácil": 3, "difícil": 2}
+    assert 'dificultad difícil' in calls[-1]["messages"][0]["content"]
+
+    # Con el pool lleno, una segunda pasada no genera nada.
+    assert await pool_module.refill_exercise_pool(pool_settings, session_factory) == 0
+
+
+@pytest.mark.asyncio
+async def test_refill_respects_cycle_limit_and_stops_when_ollama_is_down(theme, pool_settings, session_factory, monkeypatch):
+    calls = []
+    monkeypatch.setattr(pool_module, "generate_with_ollama", _fake_generate(calls))
+    monkeypatch.setattr(pool_settings, "exercise_pool_max_per_cycle", 1)
+    assert await pool_module.refill_exercise_pool(pool_settings, session_factory) == 1
+
+    async def unavailable(payload, priority=None):
+        raise OllamaNotAvailableError()
+    monkeypatch.setattr(pool_module, "generate_with_ollama", unavailable)
+    monkeypatch.setattr(pool_settings, "exercise_pool_max_per_cycle", 10)
+    assert await pool_module.refill_exercise_pool(pool_settings, session_factory) == 0
@@ -1,5 +1,8 @@
+from datetime import datetime, timezone
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import sessionmaker
 
 from src.database.base import Base
@@ -8,10 +11,13 @@ from src.models.theme import Theme
 from src.models.exercise import Exercise
 from src.models.user_response import UserResponse
 from src.models.user_theme_progress import UserThemeProgress
+from src.models.user_daily_stats import UserDailyStats
+import src.services.exercise_service as exercise_service_module
 from src.services.exercise_service import (
     create_exercise_from_ai,
     register_user_answer,
 )
+from src.services.stats_service import rebuild_daily_stats, utc_day
 
 
 @pytest.fixture
@@ -134,3 +140,42 @@ def test_register_answer_updates_progress(numeros_naturales_theme, db_session):
     prog_final = db_session.query(UserThemeProgress).get((99, numeros_naturales_theme.id))
     assert prog_final.completed == 3 # Se incrementa
     assert prog_final.correct   == 2 # Se incrementa por respuesta correcta
+
+    # El agregado diario acumula las tres respuestas del día
+    daily = db_session.query(UserDailyStats).filter_by(user_id=99).one()
+    assert (daily.total, daily.correct, daily.time_sec) == (3, 2, 18)
+    assert daily.day == ur.created_at.date()
+
+
+def test_daily_row_near_midnight_matches_rebuild(numeros_naturales_theme, db_session, monkeypatch):
+    class LateDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 3, 14, 23, 30, tzinfo=timezone.utc)
+    monkeypatch.setattr(exercise_service_module, "datetime", LateDatetime)
+
+    ej = create_exercise_from_ai({
+        "enunciado": "¿Cuánto es 9 + 1?",
+        "tipo": "respuesta corta",
+        "dificultad": "fácil",
+        "respuesta": "10",
+        "explicacion": "",
+    }, numeros_naturales_theme, db_session)
+    register_user_answer(user_id=99, ej=ej, answer="10", time_sec=4, db=db_session)
+    db_session.commit()
+
+    def rows():
+        db_session.expire_all()
+        return [(d.day, d.total, d.correct, d.time_sec) for d in db_session.query(UserDailyStats).all()]
+
+    live = rows()
+    assert live == [(datetime(2026, 3, 14).date(), 1, 1, 4)]
+
+    rebuild_daily_stats(db_session)
+    db_session.commit()
+    assert rows() == live
+
+
+def test_utc_day_ignores_postgres_session_timezone():
+    sql = str(utc_day(UserResponse.created_at, "postgresql").compile(dialect=postgresql.dialect()))
+    assert sql == "date(timezone(%(timezone_1)s, user_responses.created_at))"
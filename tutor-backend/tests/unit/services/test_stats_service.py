@@ -5,12 +5,13 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from src.database.base import Base
-from src.services.stats_service import overview, timeline, by_theme
+from src.services.stats_service import overview, timeline, by_theme, rebuild_daily_stats
 
 from src.models.subject import Subject
 from src.models.theme import Theme
 from src.models.exercise import Exercise
 from src.models.user_response import UserResponse
+from src.models.user_daily_stats import UserDailyStats
 
 # Alias para que timeline() encuentre el atributo que usa el servicio
 UserResponse.respondida_en = UserResponse.created_at  # mapea respondida_en a created_at
@@ -105,6 +106,9 @@ def seed_data(session):
     )
     session.add_all([r1, r2, r3])
     session.commit()
+    # Las respuestas se insertan a mano, sin pasar por register_user_answer.
+    rebuild_daily_stats(session)
+    session.commit()
 
     return t1, t2, now
 
@@ -160,6 +164,7 @@ def test_overview_trend24h_positive(db_session):
     db_session.add(UserResponse(user_id=2, exercise_id=e3.id, answer="a", correct=True, created_at=current_period_start_time))
     db_session.add(UserResponse(user_id=2, exercise_id=e4.id, answer="a", correct=True, created_at=current_period_start_time + timedelta(hours=1)))
     db_session.commit()
+    rebuild_daily_stats(db_session)
 
     out = overview(db_session, user_id=2)
     assert out["hechos"] == 4
@@ -186,6 +191,7 @@ def test_overview_trend24h_no_data_p0(db_session):
     # P1: 1 correcta de 1 (100%)
     db_session.add(UserResponse(user_id=3, exercise_id=e1.id, answer="a", correct=True, created_at=current_period_time))
     db_session.commit()
+    rebuild_daily_stats(db_session)
 
     out = overview(db_session, user_id=3)
     assert out["hechos"] == 1
@@ -274,3 +280,21 @@ def test_by_theme(db_session):
             "ratio": 100.0,
         },
     ]
+
+
+def test_rebuild_daily_stats_is_idempotent_and_per_user(db_session):
+    """El backfill agrega por día y puede relanzarse sin duplicar filas."""
+    t1, t2, now = seed_data(db_session)
+    db_session.add(UserDailyStats(user_id=5, day=now.date(), total=9, correct=9, time_sec=0))
+    db_session.commit()
+
+    assert rebuild_daily_stats(db_session, user_id=1) == 2
+    db_session.commit()
+
+    rows = db_session.query(UserDailyStats).filter_by(user_id=1).order_by(UserDailyStats.day).all()
+    assert [(r.day, r.total, r.correct, r.time_sec) for r in rows] == [
+        ((now - timedelta(days=1)).date(), 1, 1, 5),
+        (now.date(), 2, 1, 11),
+    ]
+    # El backfill de un usuario no toca al resto.
+    assert db_session.query(UserDailyStats).filter_by(user_id=5).one().total == 9
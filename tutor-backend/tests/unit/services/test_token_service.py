@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import src.services.token_service as token_service
+from src.core.security import hash_refresh_token
+from src.models import RefreshToken, User
+
+
+@pytest.fixture
+def session_factory(async_engine):
+    return async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def user(db_session):
+    u = User(username="tokens", email="tokens@example.com", password="x")
+    db_session.add(u)
+    db_session.commit()
+    db_session.refresh(u)
+    return u
+
+
+def _add_token(db, user_id, token, *, minutes):
+    db.add(RefreshToken(user_id=user_id, token=token,
+                        expires_at=datetime.now(timezone.utc) + timedelta(minutes=minutes)))
+
+
+def test_only_the_hash_is_stored_and_lookups_use_the_plain_token(db_session, user):
+    _add_token(db_session, user.id, "plain-token-value", minutes=30)
+    db_session.commit()
+
+    stored = db_session.execute(text("SELECT token FROM refresh_tokens")).scalar_one()
+    assert stored == hash_refresh_token("plain-token-value")
+    assert len(stored) == 64
+    assert db_session.query(RefreshToken).filter_by(token="plain-token-value").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_store_caps_active_tokens_per_user(db_session, user, session_factory, monkeypatch):
+    monkeypatch.setattr(token_service.get_settings(), "refresh_tokens_per_user", 3)
+    _add_token(db_session, user.id, "caducado", minutes=-5)
+    db_session.commit()
+
+    async with session_factory() as db:
+        for i in range(5):
+            await token_service.store_refresh_token(db, user.id, f"token-{i}")
+
+    db_session.expire_all()
+    remaining = {t.token for t in db_session.query(RefreshToken).filter_by(user_id=user.id)}
+    assert remaining == {hash_refresh_token(f"token-{i}") for i in (2, 3, 4)}
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_expired_in_batches(db_session, user, session_factory):
+    for i in range(7):
+        _add_token(db_session, user.id, f"old-{i}", minutes=-1)
+    _add_token(db_session, user.id, "vigente", minutes=30)
+    db_session.commit()
+
+    purged = await token_service.purge_expired_refresh_tokens(3, session_factory)
+
+    assert purged == 7
+    db_session.expire_all()
+    assert [t.token for t in db_session.query(RefreshToken)] == [hash_refresh_token("vigente")]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.utils.admission import AdmissionController, LLMQueueFullError, LLMQueueTimeoutError, Priority
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority_then_fifo():
+    ctl = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5)
+    order = []
+
+    async def job(name, priority):
+        async with ctl.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await ctl.acquire(Priority.CHAT)  # ocupa el único hueco
+    tasks = [
+        asyncio.create_task(job("warmup", Priority.BACKGROUND)),
+        asyncio.create_task(job("gen-1", Priority.GENERATION)),
+        asyncio.create_task(job("chat", Priority.CHAT)),
+        asyncio.create_task(job("gen-2", Priority.GENERATION)),
+    ]
+    await asyncio.sleep(0)
+    assert ctl.queued == 4
+
+    ctl.release()
+    await asyncio.gather(*tasks)
+    assert order == ["chat", "gen-1", "gen-2", "warmup"]
+    assert ctl.in_flight == 0
+    assert ctl.admitted == 5
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_immediately():
+    ctl = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+    await ctl.acquire()
+    waiting = asyncio.create_task(ctl.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(LLMQueueFullError) as exc:
+        await ctl.acquire()
+    assert exc.value.status_code == 429
+    assert ctl.rejected == 1
+
+    ctl.release()
+    await waiting
+    ctl.release()
+    assert ctl.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_returns_503_and_frees_the_place():
+    ctl = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+    await ctl.acquire()
+
+    with pytest.raises(LLMQueueTimeoutError) as exc:
+        await ctl.acquire()
+    assert exc.value.status_code == 503
+    assert ctl.queued == 0 and ctl.timed_out == 1
+
+    ctl.release()
+    assert ctl.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    ctl = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=5)
+    await ctl.acquire()
+    waiter = asyncio.create_task(ctl.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert ctl.queued == 0
+
+    ctl.release()
+    assert ctl.in_flight == 0
@@ -0,0 +1,70 @@
+from src.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock):
+    return CircuitBreaker(failure_rate_threshold=0.5, window_seconds=10, min_calls=4, open_seconds=30, clock=clock)
+
+
+def test_opens_when_failure_rate_reaches_threshold():
+    clock = FakeClock()
+    cb = make_breaker(clock)
+
+    cb.record_success()
+    cb.record_failure()
+    cb.record_success()
+    assert cb.state is CircuitState.CLOSED  # aún no hay `min_calls`
+
+    cb.record_failure()
+    assert cb.state is CircuitState.OPEN
+    assert not cb.allow_request()
+    assert cb.trips == 1
+
+
+def test_old_calls_leave_the_window():
+    clock = FakeClock()
+    cb = make_breaker(clock)
+    for _ in range(3):
+        cb.record_failure()
+    clock.now = 11
+    cb.record_success()
+    cb.record_failure()
+    assert cb.state is CircuitState.CLOSED
+    assert cb.failure_rate() == 0.5
+
+
+def test_half_open_allows_one_trial_and_closes_on_success():
+    clock = FakeClock()
+    cb = make_breaker(clock)
+    for _ in range(4):
+        cb.record_failure()
+
+    clock.now = 30
+    assert cb.state is CircuitState.HALF_OPEN
+    assert cb.allow_request()
+    assert not cb.allow_request()
+
+    cb.record_success()
+    assert cb.state is CircuitState.CLOSED
+    assert cb.allow_request()
+
+
+def test_failed_trial_reopens():
+    clock = FakeClock()
+    cb = make_breaker(clock)
+    for _ in range(4):
+        cb.record_failure()
+    cb.probe_succeeded()
+    assert cb.state is CircuitState.HALF_OPEN
+    assert cb.allow_request()
+
+    cb.record_failure()
+    assert cb.state is CircuitState.OPEN
+    assert cb.trips == 2
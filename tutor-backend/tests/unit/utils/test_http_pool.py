@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.utils.http_pool import PoolStats, build_http_client, pool_usage
+
+
+POOL_KWARGS = dict(
+    connect_timeout=2,
+    read_timeout=30,
+    write_timeout=2,
+    pool_timeout=0.2,
+    max_connections=2,
+    max_keepalive_connections=2,
+    keepalive_expiry=30,
+)
+
+
+async def _start_keepalive_server():
+    """Servidor HTTP/1.1 mínimo que mantiene la conexión abierta entre peticiones."""
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                body = b'{"ok": true}'
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}", accepted
+
+
+def test_reuse_ratio():
+    assert PoolStats().reuse_ratio == 0.0
+    assert PoolStats(requests=10, connections_opened=1).reuse_ratio == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+async def test_client_reuses_one_connection_and_counts_it():
+    server, url, accepted = await _start_keepalive_server()
+    stats = PoolStats()
+    client = build_http_client(url, stats, **POOL_KWARGS)
+    try:
+        for _ in range(5):
+            r = await client.post("/api/chat/completions", json={"m": 1})
+            assert r.json() == {"ok": True}
+
+        assert stats.requests == 5
+        assert stats.connections_opened == 1
+        assert len(accepted) == 1
+        assert pool_usage(client) == (0, 1)
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+
+def test_client_uses_separate_timeouts_and_keepalive_expiry():
+    client = build_http_client("http://webui", PoolStats(), **POOL_KWARGS)
+    assert client.timeout.connect == 2
+    assert client.timeout.read == 30
+    assert client.timeout.pool == 0.2
+    pool = client._transport._pool
+    assert pool._max_connections == 2
+    assert pool._keepalive_expiry == 30
+
+
+@pytest.mark.asyncio
+async def test_mock_transport_counts_requests_without_pool():
+    stats = PoolStats()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    client = build_http_client("http://webui", stats, transport=transport, **POOL_KWARGS)
+    await client.get("/api/tags")
+    await client.aclose()
+
+    assert stats.requests == 1
+    assert pool_usage(client) == (0, 0)
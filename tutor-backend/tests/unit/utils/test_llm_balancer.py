@@ -0,0 +1,54 @@
+import pytest
+
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.llm_balancer import Backend, LoadBalancer, NoBackendAvailable, parse_tags
+
+
+def backend(url, outstanding=0, latency=None, models=None):
+    b = Backend(url, CircuitBreaker(min_calls=1, open_seconds=60))
+    b.outstanding = outstanding
+    b.ewma_latency = latency
+    b.models = models
+    return b
+
+
+def test_picks_least_outstanding_then_lowest_latency():
+    a = backend("http://a", outstanding=2, latency=0.1)
+    b = backend("http://b", outstanding=1, latency=3.0)
+    c = backend("http://c", outstanding=1, latency=0.5)
+    assert LoadBalancer([a, b, c]).pick("profesor") is c
+
+
+def test_model_affinity_and_unknown_models():
+    a = backend("http://a", models=frozenset({"llama3"}))
+    b = backend("http://b", outstanding=5, models=parse_tags({"models": [{"name": "profesor:latest"}]}))
+    unknown = backend("http://u", outstanding=9)
+    lb = LoadBalancer([a, b, unknown])
+
+    assert lb.pick("profesor") is b
+    assert lb.pick("profesor:latest") is b
+    assert lb.pick("llama3") is a
+
+
+def test_open_backends_are_skipped():
+    a = backend("http://a")
+    b = backend("http://b", outstanding=3)
+    a.breaker.record_failure()  # min_calls=1 → abierto
+    lb = LoadBalancer([a, b])
+
+    assert lb.pick("profesor") is b
+    b.breaker.record_failure()
+    assert not lb.any_available
+    with pytest.raises(NoBackendAvailable):
+        lb.pick("profesor")
+
+
+def test_ewma_smooths_latency():
+    b = backend("http://a")
+    b.observe_latency(1.0)
+    b.observe_latency(2.0)
+    assert b.ewma_latency == pytest.approx(0.3 * 2.0 + 0.7 * 1.0)
+
+
+def test_parse_tags_accepts_openai_style_listing():
+    assert parse_tags({"data": [{"id": "profesor"}]}) == frozenset({"profesor"})
@@ -0,0 +1,62 @@
+from src.utils.llm_cache import InMemoryLRUCache, NullLLMCache, request_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_request_cache_key_is_canonical():
+    a = {
+        "model": "profesor",
+        "messages": [{"role": "user", "content": "hola"}],
+        "response_format": {"type": "json_object"},
+    }
+    b = {
+        "response_format": {"type": "json_object"},
+        "messages": [{"content": "hola", "role": "user"}],
+        "model": "profesor",
+        "stream": False,  # no forma parte de la clave
+    }
+    assert request_cache_key(a) == request_cache_key(b)
+
+
+def test_request_cache_key_changes_with_prompt():
+    base = {"model": "m", "messages": [{"role": "user", "content": "tema A"}], "response_format": {}}
+    other = {**base, "messages": [{"role": "user", "content": "tema B"}]}
+    assert request_cache_key(base) != request_cache_key(other)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = InMemoryLRUCache(max_entries=10, ttl_seconds=60, clock=clock)
+    cache.set("k", {"v": 1})
+
+    clock.now = 59
+    assert cache.get("k") == {"v": 1}
+
+    clock.now = 60
+    assert cache.get("k") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InMemoryLRUCache(max_entries=2, ttl_seconds=60, clock=FakeClock())
+    cache.set("a", {"v": "a"})
+    cache.set("b", {"v": "b"})
+    cache.get("a")          # «a» pasa a ser la más reciente
+    cache.set("c", {"v": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "a"}
+    assert cache.get("c") == {"v": "c"}
+
+
+def test_null_cache_never_stores():
+    cache = NullLLMCache()
+    cache.set("k", {"v": 1})
+    assert cache.get("k") is None
@@ -0,0 +1,78 @@
+import asyncio
+import math
+
+import pytest
+
+from src.utils.metrics import (
+    Registry,
+    begin_request_timings,
+    record_stage,
+    request_timings,
+    timed_stage,
+)
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = Registry()
+    h = registry.histogram("lat_seconds", "Latencia.", buckets=(0.1, 1))
+    h.observe(0.05, stage="db")
+    h.observe(0.5, stage="db")
+    h.observe(3, stage="db")
+
+    text = registry.render()
+    assert "# TYPE lat_seconds histogram" in text
+    assert 'lat_seconds_bucket{stage="db",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{stage="db",le="1"} 2' in text
+    assert 'lat_seconds_bucket{stage="db",le="+Inf"} 3' in text
+    assert 'lat_seconds_sum{stage="db"} 3.55' in text
+    assert 'lat_seconds_count{stage="db"} 3' in text
+    assert h.count(stage="db") == 3
+    assert math.isclose(h.sum(stage="db"), 3.55)
+
+
+def test_counter_and_callback_metrics():
+    registry = Registry()
+    c = registry.counter("retries", "Reintentos.")
+    c.inc(model="profesor")
+    c.inc(2, model="profesor")
+    state = {"queued": 4}
+    registry.callback("queued", "En cola.", lambda: [({}, state["queued"])])
+    registry.callback("hits", "Aciertos.", lambda: [({"kind": 'a"b'}, 1)], type="counter")
+
+    text = registry.render()
+    assert 'retries_total{model="profesor"} 3' in text
+    assert "# TYPE queued gauge\nqueued 4" in text
+    assert 'hits_total{kind="a\\"b"} 1' in text
+
+
+def test_duplicate_metric_names_are_rejected():
+    registry = Registry()
+    registry.counter("x", "X.")
+    with pytest.raises(ValueError):
+        registry.histogram("x", "X.")
+
+
+def test_request_timings_accumulate_per_context():
+    async def request(name, stages):
+        begin_request_timings()
+        for stage in stages:
+            with timed_stage(stage):
+                await asyncio.sleep(0)
+        record_stage("llm_queue", 0.5)
+        return name, request_timings()
+
+    async def main():
+        return await asyncio.gather(request("a", ["db", "db"]), request("b", ["llm"]))
+
+    (_, a), (_, b) = asyncio.run(main())
+    assert set(a) == {"db", "llm_queue"}
+    assert set(b) == {"llm", "llm_queue"}
+    assert a["llm_queue"] == 0.5
+
+
+def test_record_stage_without_request_scope_only_feeds_histogram():
+    async def main():
+        record_stage("orphan", 0.1)
+        return request_timings()
+
+    assert asyncio.run(main()) == {}
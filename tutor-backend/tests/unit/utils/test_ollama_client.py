@@ -1,3 +1,4 @@
+import json
 import os
 
 # ——————————————————————————————————————————————————————————————————————————————————————————
@@ -16,7 +17,10 @@ import pytest
 from types import SimpleNamespace
 from fastapi import Request
 
-from src.utils.ollama_client import generate_with_ollama, settings
+from src.utils.ollama_client import OllamaClient, OllamaNotAvailableError, generate_with_ollama, settings
+
+# Referencia al AsyncClient real antes de que el fixture `no_real_http` lo sustituya
+RealAsyncClient = httpx.AsyncClient
 
 
 class DummyRequest:
@@ -93,15 +97,15 @@ async def test_timeout_then_success(monkeypatch): # Convertido a async
         "AsyncClient",  # Mockear AsyncClient
         lambda *args, **kwargs: AsyncDummyClientFactory(
             responses=[
-                httpx.ReadTimeout("timeout"),
                 httpx.ReadTimeout("timeout"),
                 resp_ok,
             ]
         )
     )
 
-    out = await generate_with_ollama(payload, request=DummyRequest("req-2")) # Añadido await
-    assert out == expected
+    # Un ReadTimeout ya ha esperado `ollama_read_timeout`: no se reintenta.
+    with pytest.raises(OllamaNotAvailableError):
+        await generate_with_ollama(payload, request=DummyRequest("req-2")) # Añadido await
 
 
 async def test_http_status_error_bubbles_up(monkeypatch): # Convertido a async
@@ -167,3 +171,344 @@ async def test_no_api_key_header(monkeypatch):
     out = await generate_with_ollama(payload) # Añadido await
     assert out == {"foo": "bar"}
     assert "Authorization" not in captured["headers"]
+
+
+def _streaming_client(handler) -> OllamaClient:
+    client = OllamaClient(base_url="http://webui")
+    client.backends[0].http = RealAsyncClient(base_url="http://webui", transport=httpx.MockTransport(handler))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_completion_yields_content_deltas():
+    captured = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured["url"] = str(request.url)
+        captured["body"] = request.read()
+        chunks = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "Hola"}}]},
+            {"choices": [{"delta": {"content": " mundo"}}]},
+        ]
+        body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + ": keep-alive\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    client = _streaming_client(handler)
+    deltas = [d async for d in client.stream_chat_completion({"model": "profesor", "messages": []})]
+
+    assert deltas == ["Hola", " mundo"]
+    assert captured["url"] == "http://webui/api/chat/completions"
+    assert json.loads(captured["body"])["stream"] is True
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_completion_http_error_raises_not_available():
+    client = _streaming_client(lambda request: httpx.Response(500, text="boom"))
+
+    with pytest.raises(OllamaNotAvailableError):
+        [d async for d in client.stream_chat_completion({"model": "profesor", "messages": []})]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_completions_are_coalesced():
+    import asyncio
+    hits = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hits.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    client = _streaming_client(handler)
+    payload = {"model": "profesor", "messages": [{"role": "user", "content": "hola"}]}
+    other = {"model": "profesor", "messages": [{"role": "user", "content": "adiós"}]}
+
+    results = await asyncio.gather(*(client.generate_chat_completion(dict(payload)) for _ in range(4)),
+                                   client.generate_chat_completion(other))
+
+    assert len(hits) == 2
+    assert all(r["choices"][0]["message"]["content"] == "ok" for r in results)
+    assert client.coalesced_requests == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_and_probe_recovers_without_new_client():
+    from src.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+    state = {"up": False, "hits": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["hits"] += 1
+        if not state["up"]:
+            raise httpx.ConnectError("down", request=request)
+        if request.url.path.endswith("/tags"):
+            return httpx.Response(200, json={"models": []})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    client = OllamaClient(base_url="http://webui", breaker=CircuitBreaker(min_calls=2, open_seconds=300))
+    client.backends[0].http = RealAsyncClient(base_url="http://webui", transport=httpx.MockTransport(handler))
+    pooled = client.backends[0].http
+
+    for i in range(2):
+        with pytest.raises(OllamaNotAvailableError):
+            await client.generate_chat_completion({"model": "profesor", "messages": [], "n": i})
+    assert client.breaker.state is CircuitState.OPEN
+    assert not client.is_enabled
+
+    hits = state["hits"]
+    with pytest.raises(OllamaNotAvailableError):
+        await client.generate_chat_completion({"model": "profesor", "messages": []})
+    assert state["hits"] == hits  # sin tocar la red
+
+    state["up"] = True
+    assert await client.check_availability()
+    assert client.breaker.state is CircuitState.HALF_OPEN
+
+    out = await client.generate_chat_completion({"model": "profesor", "messages": []})
+    assert out["choices"][0]["message"]["content"] == "ok"
+    assert client.breaker.state is CircuitState.CLOSED
+    assert client.backends[0].http is pooled
+    await client.close()
+
+
+def _multi_backend_client(handlers: dict) -> OllamaClient:
+    client = OllamaClient(base_urls=list(handlers))
+    for backend in client.backends:
+        backend.http = RealAsyncClient(base_url=backend.url, transport=httpx.MockTransport(handlers[backend.url]))
+    return client
+
+
+def _node(name, models, served):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": m} for m in models]})
+        served.append(name)
+        return httpx.Response(200, json={"choices": [{"message": {"content": name}}]})
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_requests_only_go_to_backends_that_serve_the_model():
+    served = []
+    client = _multi_backend_client({
+        "http://gpu1": _node("gpu1", ["llama3:latest"], served),
+        "http://gpu2": _node("gpu2", ["profesor:latest"], served),
+    })
+    assert await client.check_availability()
+
+    for i in range(3):
+        await client.generate_chat_completion({"model": "profesor", "messages": [], "n": i})
+    assert served == ["gpu2"] * 3
+
+    with pytest.raises(OllamaNotAvailableError):
+        await client.generate_chat_completion({"model": "mistral", "messages": []})
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_connect_error_fails_over_to_another_backend():
+    served = []
+
+    def down(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("down", request=request)
+
+    client = _multi_backend_client({"http://gpu1": down, "http://gpu2": _node("gpu2", [], served)})
+    # Sin /tags consultado, ambos nodos se consideran candidatos; gpu1 va primero.
+    out = await client.generate_chat_completion({"model": "profesor", "messages": []})
+
+    assert out["choices"][0]["message"]["content"] == "gpu2"
+    assert client.backends[0].outstanding == client.backends[1].outstanding == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_one_long_lived_client_per_backend_with_tuned_pool(monkeypatch):
+    monkeypatch.setattr(httpx, "AsyncClient", RealAsyncClient)
+    client = OllamaClient(base_urls=["http://gpu1", "http://gpu2"])
+    gpu1, gpu2 = client.backends
+
+    http = client._http(gpu1)
+    assert client._http(gpu1) is http
+    assert client._http(gpu2) is not http
+    assert http.timeout.read == settings.ollama_read_timeout
+    assert http.timeout.connect == settings.ollama_connect_timeout
+
+    stats = client.pool_stats()
+    assert [s["url"] for s in stats] == ["http://gpu1", "http://gpu2"]
+    assert stats[0]["max_connections"] == settings.ollama_max_connections
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_timeout_does_not_count_against_the_breaker():
+    from src.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.PoolTimeout("pool exhausted", request=request)
+
+    client = OllamaClient(base_url="http://webui", breaker=CircuitBreaker(min_calls=1))
+    client.backends[0].http = RealAsyncClient(base_url="http://webui", transport=httpx.MockTransport(handler))
+
+    with pytest.raises(OllamaNotAvailableError):
+        await client.generate_chat_completion({"model": "profesor", "messages": []})
+    assert client.breaker.state is CircuitState.CLOSED
+    assert client.backends[0].outstanding == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_completion_records_tokens_retries_and_stages(monkeypatch):
+    from src.utils.metrics import begin_request_timings, request_timings
+    from src.utils.ollama_client import LLM_RETRIES, LLM_TOKENS, settings
+
+    monkeypatch.setattr(settings, "ollama_model", "metricas")
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.PoolTimeout("busy", request=request)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 30},
+        })
+
+    client = _streaming_client(handler)
+    tokens_before = LLM_TOKENS.count(model="metricas", kind="completion")
+    retries_before = LLM_RETRIES.value(model="metricas")
+    begin_request_timings()
+
+    await client.generate_chat_completion({"model": "metricas", "messages": []})
+
+    assert LLM_TOKENS.count(model="metricas", kind="completion") == tokens_before + 1
+    assert LLM_RETRIES.value(model="metricas") == retries_before + 1
+    assert {"llm_queue", "llm_generate"} <= set(request_timings())
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_unknown_models_share_the_other_metric_label():
+    from src.utils.ollama_client import LLM_REQUEST_SECONDS
+
+    client = _streaming_client(lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}))
+    other_before = LLM_REQUEST_SECONDS.count(model="other", outcome="ok")
+
+    await client.generate_chat_completion({"model": "inventado-1", "messages": []})
+    await client.generate_chat_completion({"model": "inventado-2", "messages": []})
+
+    assert LLM_REQUEST_SECONDS.count(model="other", outcome="ok") == other_before + 2
+    assert LLM_REQUEST_SECONDS.count(model="inventado-1", outcome="ok") == 0
+
+    client.backends[0].models = frozenset({"inventado-1"})
+    assert client._model_label("inventado-1") == "inventado-1"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_read_timeout_releases_admission_slot_after_one_attempt():
+    import asyncio
+    from src.utils.admission import AdmissionController
+
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if json.loads(request.content)["model"] == "lento":
+            await asyncio.sleep(0.1)
+            raise httpx.ReadTimeout("slow", request=request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+    client = OllamaClient(base_url="http://webui", admission=admission)
+    client.backends[0].http = RealAsyncClient(base_url="http://webui", transport=httpx.MockTransport(handler))
+
+    slow = asyncio.ensure_future(client.generate_chat_completion({"model": "lento", "messages": []}))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(client.generate_chat_completion({"model": "rapido", "messages": []}))
+
+    with pytest.raises(OllamaNotAvailableError):
+        await slow
+    assert (await queued)["choices"]
+    # El hueco se retiene una sola lectura, no una por cada reintento.
+    assert len(calls) == 2
+    assert 0.1 <= admission.queue_wait_max < 0.2
+    assert client.breaker.failure_rate() == 0.5  # un fallo (el timeout) y un éxito
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_probe_error_on_one_backend_does_not_hide_the_others():
+    client = OllamaClient(base_urls=["http://roto", "http://sano"])
+
+    def healthy(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"models": [{"name": "profesor"}]})
+
+    client.backends[0].http = RealAsyncClient(base_url="http://roto", transport=httpx.MockTransport(healthy))
+    await client.backends[0].http.aclose()  # el cliente cerrado lanza RuntimeError, no TransportError
+    client._http = lambda backend: backend.http
+    client.backends[1].http = RealAsyncClient(base_url="http://sano", transport=httpx.MockTransport(healthy))
+
+    assert await client.check_availability() is True
+    assert client.backends[1].models == frozenset({"profesor"})
+    await client.backends[1].http.aclose()
+
+
+@pytest.mark.asyncio
+async def test_health_probe_survives_unexpected_errors(monkeypatch):
+    import asyncio
+
+    client = OllamaClient(base_url="http://webui")
+    rounds = []
+
+    async def flaky(request=None):
+        rounds.append(len(rounds))
+        if len(rounds) == 1:
+            raise RuntimeError("cliente cerrado durante una recarga")
+        return True
+    monkeypatch.setattr(client, "check_availability", flaky)
+
+    task = asyncio.ensure_future(client.run_health_probe(0))
+    for _ in range(20):
+        await asyncio.sleep(0)
+    assert not task.done()
+    assert len(rounds) >= 3
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_chat_caller_does_not_wait_behind_background_leader():
+    import asyncio
+    from src.utils.admission import AdmissionController, Priority
+
+    order = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        order.append(json.loads(request.content)["messages"][0]["content"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    admission = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5)
+    client = OllamaClient(base_url="http://webui", admission=admission)
+    client.backends[0].http = RealAsyncClient(base_url="http://webui", transport=httpx.MockTransport(handler))
+    prompt = {"model": "profesor", "messages": [{"role": "user", "content": "pool"}]}
+    other = {"model": "profesor", "messages": [{"role": "user", "content": "otro"}]}
+
+    await admission.acquire(Priority.CHAT)  # el único hueco, ocupado
+    background = asyncio.ensure_future(client.generate_chat_completion(prompt, priority=Priority.BACKGROUND))
+    generation = asyncio.ensure_future(client.generate_chat_completion(other, priority=Priority.GENERATION))
+    chat = asyncio.ensure_future(client.generate_chat_completion(prompt, priority=Priority.CHAT))
+    for _ in range(20):
+        await asyncio.sleep(0)
+    assert admission.queued == 3  # el CHAT hace cola por su cuenta, no se une al BACKGROUND
+    admission.release()
+
+    await asyncio.gather(background, generation, chat)
+    # El CHAT no se une al BACKGROUND en vuelo: pasa el primero con su propia prioridad.
+    assert order == ["pool", "otro", "pool"]
+    await client.close()
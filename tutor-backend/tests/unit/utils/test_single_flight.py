@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    sf = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"ok": calls}
+
+    waiters = [asyncio.create_task(sf.do("k", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert len(sf) == 1
+    release.set()
+
+    results = await asyncio.gather(*waiters)
+    assert calls == 1
+    assert results == [{"ok": 1}] * 5
+    assert (sf.leaders, sf.coalesced) == (1, 4)
+    assert len(sf) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_remembered():
+    sf = SingleFlight()
+    release = asyncio.Event()
+
+    async def boom():
+        await release.wait()
+        raise ValueError("fallo")
+
+    waiters = [asyncio.create_task(sf.do("k", boom)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def ok():
+        return 1
+    assert await sf.do("k", ok) == 1
+    assert sf.leaders == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_leader_does_not_cancel_followers():
+    sf = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "hecho"
+
+    leader = asyncio.create_task(sf.do("k", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(sf.do("k", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    release.set()
+    assert await follower == "hecho"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
@@ -82,8 +82,12 @@ export const useChat = ({ exerciseId, currentUserId }: UseChatProps): UseChatRet
     try {
       const updatedConversation = await apiSendMessage(userMessageInput);
       setConversation(updatedConversation);
-      const sortedMessages = updatedConversation.messages.sort((a, b) => new Date(a.created_at).getTime() - new Date(b.created_at).getTime());
-      setMessages(sortedMessages);
+      // La respuesta solo trae el par nuevo (usuario + IA): sustituye al mensaje optimista.
+      const newMessages = updatedConversation.messages.sort((a, b) => new Date(a.created_at).getTime() - new Date(b.created_at).getTime());
+      setMessages(prevMessages => [
+        ...prevMessages.filter(msg => msg.id !== optimisticUserMessage.id),
+        ...newMessages,
+      ]);
     } catch (err: any) {
       setError(err.response?.data?.detail || err.message || 'Failed to send message.');
       setMessages(prevMessages => prevMessages.filter(msg => msg.id !== optimisticUserMessage.id));